@@ -0,0 +1,49 @@
+"""
+Export every Article of a large catalog as JSON lines and report the
+time taken and the peak memory used.
+
+    $ python benchmarks/bench_export.py
+
+``BENCH_ARTICLES`` sets the catalog size (default 500,000) and
+``BENCH_MEMORY_CEILING_MB`` the peak memory growth allowed (default 64).
+"""
+import os
+import resource
+import subprocess
+import sys
+
+import common
+
+
+def max_rss_mb():
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main():
+    articles = int(os.environ.get('BENCH_ARTICLES', 500000))
+    ceiling = float(os.environ.get('BENCH_MEMORY_CEILING_MB', 64))
+    common.configure('periodicals_bench_%d.sqlite3' % articles)
+    if sys.argv[1:] == ['--seed']:
+        common.seed(articles=articles)
+        return
+    # seed in another process so it doesn't count towards peak memory
+    subprocess.check_call([sys.executable, __file__, '--seed'])
+
+    from periodicals.exporter import iter_catalog, render_jsonl
+
+    before = max_rss_mb()
+    records = size = 0
+    with common.timed("export %d articles" % articles):
+        for line in render_jsonl(iter_catalog()):
+            records += 1
+            size += len(line)
+    growth = max_rss_mb() - before
+    print("%d records, %.1fMB of JSON" % (records, size / 1048576.0))
+    print("peak memory growth %.1fMB (ceiling %.1fMB)" % (growth, ceiling))
+    if growth > ceiling:
+        sys.exit("memory ceiling exceeded")
+
+
+if __name__ == '__main__':
+    main()
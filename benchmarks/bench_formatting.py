@@ -0,0 +1,54 @@
+"""
+Time the display and slug formatting of Authors, Periodicals and Issues
+with the compiled formats against formatting the whole model_to_dict()
+of the instance as earlier versions did.
+
+    $ python benchmarks/bench_formatting.py
+
+``BENCH_CALLS`` sets the number of calls timed (default 100,000).
+"""
+import os
+import timeit
+from datetime import date
+
+import common
+
+
+def main():
+    calls = int(os.environ.get('BENCH_CALLS', 100000))
+    common.configure()
+
+    from django.conf import settings
+    from django.forms.models import model_to_dict
+    from django.utils.translation import ugettext_lazy as _
+    from periodicals.models import Author, Periodical, Issue, format_fields
+
+    def instance_fields(instance):
+        return model_to_dict(instance,
+                             fields=[field.name for field in
+                                     instance._meta.fields])
+
+    cases = [
+        ("Author display", settings.PERIODICALS_AUTHOR_FORMAT,
+         Author(first_name="Alfred", middle_name="E.", last_name="Neuman",
+                website="http://example.com/")),
+        ("Periodical display", settings.PERIODICALS_PERIODICAL_FORMAT,
+         Periodical(name="Mad Magazine", logo="mad/logo.png")),
+        ("Issue slug", settings.PERIODICALS_ISSUE_SLUG_FORMAT,
+         Issue(volume=1, issue=2, pub_date=date(1952, 10, 1),
+               printed_cover="mad/issues/1952-oct-print.jpg")),
+    ]
+    for label, format, instance in cases:
+        assert _(format) % instance_fields(instance) == \
+            format_fields(format, instance)
+        before = timeit.timeit(
+            lambda: _(format) % instance_fields(instance), number=calls)
+        after = timeit.timeit(lambda: format_fields(format, instance),
+                              number=calls)
+        print("%-20s model_to_dict %6.2fus  compiled %6.2fus  %5.1fx" %
+              (label, before / calls * 1e6, after / calls * 1e6,
+               before / after))
+
+
+if __name__ == '__main__':
+    main()
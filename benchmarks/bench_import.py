@@ -0,0 +1,120 @@
+"""
+Import a synthetic back catalog with ``import_catalog`` and report the
+time taken, compared to saving a sample of the same records one object
+at a time.
+
+    $ python benchmarks/bench_import.py
+
+``BENCH_ARTICLES`` sets the catalog size (default 100,000),
+``BENCH_IMPORT_TARGET`` the seconds the import may take (default 180)
+and ``BENCH_SAVE_SAMPLE`` the number of records saved one at a time
+(default 1,000).
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import common
+
+AUTHORS = 5000
+ARTICLES_PER_ISSUE = 50
+
+
+def records(articles, offset=0):
+    for a in range(offset, offset + articles):
+        number = a // ARTICLES_PER_ISSUE
+        year, month = 1950 + number // 12, number % 12 + 1
+        yield dict(periodical="Periodical %d" % (a % 2),
+                   volume=year - 1949,
+                   issue=month,
+                   pub_date="%d-%02d-01" % (year, month),
+                   series=common.SERIES[a % len(common.SERIES)],
+                   # repeated titles exercise slug numbering
+                   title="Article %d" % (a % 1000),
+                   description="Description of article %d" % a,
+                   page=a % ARTICLES_PER_ISSUE + 1,
+                   tags="tag%d tag%d" % (a % 50, a % 7),
+                   authors=["Last%d, First%d" % (n, n) for n in
+                            (a % AUTHORS, (a + 1) % AUTHORS)])
+
+
+def save_one_at_a_time(records):
+    from periodicals.models import Author, Periodical, Issue, Article
+
+    for record in records:
+        periodical = Periodical.objects.filter(
+            name=record['periodical'] + " saved")[:1]
+        if periodical:
+            periodical = periodical[0]
+        else:
+            periodical = Periodical(name=record['periodical'] + " saved")
+            periodical.save()
+        issue = Issue.objects.filter(periodical=periodical,
+                                     volume=record['volume'],
+                                     issue=record['issue'])[:1]
+        if issue:
+            issue = issue[0]
+        else:
+            issue = Issue(periodical=periodical, volume=record['volume'],
+                          issue=record['issue'],
+                          pub_date=record['pub_date'])
+            issue.save()
+        article = Article(issue=issue, series=record['series'],
+                          title=record['title'],
+                          description=record['description'],
+                          page=record['page'], tags=record['tags'])
+        article.save()
+        for name in record['authors']:
+            last_name, first_name = name.split(', ')
+            author = Author.objects.filter(first_name=first_name,
+                                           last_name=last_name)[:1]
+            if author:
+                author = author[0]
+            else:
+                author = Author(first_name=first_name, last_name=last_name)
+                author.save()
+            article.authors.add(author)
+
+
+def main():
+    articles = int(os.environ.get('BENCH_ARTICLES', 100000))
+    target = float(os.environ.get('BENCH_IMPORT_TARGET', 180))
+    sample = int(os.environ.get('BENCH_SAVE_SAMPLE', 1000))
+    database = os.path.join(tempfile.gettempdir(),
+                            'periodicals_import_bench.sqlite3')
+    if os.path.exists(database) and 'BENCH_DB_NAME' not in os.environ:
+        os.remove(database)
+    common.configure(database)
+
+    from periodicals.importer import import_catalog, read_records
+
+    fd, path = tempfile.mkstemp(suffix='.jsonl')
+    with os.fdopen(fd, 'w') as catalog:
+        for record in records(articles):
+            catalog.write(json.dumps(record) + "\n")
+    try:
+        start = time.time()
+        with open(path, 'rb') as catalog:
+            counts = import_catalog(read_records(catalog, 'jsonl'))
+        elapsed = time.time() - start
+    finally:
+        os.remove(path)
+    print("imported %(articles)d articles, %(issues)d issues, "
+          "%(authors)d authors" % counts)
+    print("%-50s %8.3fs (%d articles/s)" %
+          ("import_catalog", elapsed, articles / elapsed))
+
+    start = time.time()
+    save_one_at_a_time(records(sample, offset=articles))
+    saved = time.time() - start
+    print("%-50s %8.3fs (%d articles/s)" %
+          ("save() %d articles" % sample, saved, sample / saved))
+    print("target %.0fs" % target)
+    if elapsed > target:
+        sys.exit("import target exceeded")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Time saving Articles while Haystack's RealtimeSignalProcessor updates
+the Whoosh index on every save against queueing them with
+QueuedSignalProcessor, then applying the queue in batches.
+
+    $ python benchmarks/bench_index_queue.py
+
+``BENCH_SAVES`` sets the number of Articles saved (default 500).
+"""
+import os
+
+import common
+
+
+def main():
+    saves = int(os.environ.get('BENCH_SAVES', 500))
+    common.configure()
+    common.seed(articles=max(saves, 10000))
+
+    from haystack import connection_router, connections
+    from haystack.signals import RealtimeSignalProcessor
+    from periodicals.indexqueue import QueuedSignalProcessor, process_queue
+    from periodicals.models import Article, IndexUpdate
+
+    articles = list(Article.objects.order_by('pk')[:saves])
+    connections['default'].get_backend().clear()
+    IndexUpdate.objects.all().delete()
+    for label, processor_class in (("realtime", RealtimeSignalProcessor),
+                                   ("queued", QueuedSignalProcessor)):
+        processor = processor_class(connections, connection_router)
+        with common.timed("save %d articles, %s" % (saves, label)):
+            for article in articles:
+                article.save()
+        processor.teardown()
+    with common.timed("apply the queue"):
+        while process_queue():
+            pass
+
+
+if __name__ == '__main__':
+    main()
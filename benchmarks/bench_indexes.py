@@ -0,0 +1,101 @@
+"""
+Show the query plans and timings of the app's hot queries with and
+without the composite indexes declared in the models' Meta.
+
+    $ python benchmarks/bench_indexes.py
+
+Runs against SQLite by default; see ``common.py`` for PostgreSQL. Only
+SQLite databases have the composite indexes dropped (and recreated) to
+show the plan change.
+"""
+import time
+
+import common
+
+RUNS = 200
+
+
+def query_shapes():
+    from django.contrib.contenttypes.models import ContentType
+    from periodicals.models import Issue, Article, LinkItem
+
+    issue = Issue.objects.order_by('pk')[Issue.objects.count() // 2]
+    article = Article.objects.filter(issue=issue).order_by('page')[0]
+    article_type = ContentType.objects.get_for_model(Article)
+    return [
+        ("issue archive by periodical/pub_date",
+         Issue.objects.filter(periodical=issue.periodical_id,
+                              pub_date__gt=issue.pub_date).
+         order_by('pub_date')[:1]),
+        ("issue by periodical/slug",
+         Issue.objects.filter(periodical=issue.periodical_id,
+                              slug=issue.slug)),
+        ("articles of issue by page",
+         Article.objects.filter(issue=issue, page__gt=article.page).
+         order_by('page')[:1]),
+        ("series articles of periodical",
+         Article.objects.filter(issue__periodical=issue.periodical_id,
+                                series=article.series).
+         order_by('-issue__pub_date')[:20]),
+        ("active links of article",
+         LinkItem.objects.filter(content_type=article_type,
+                                 object_id=article.pk,
+                                 status=LinkItem.STATUS_ACTIVE)),
+    ]
+
+
+def explain(queryset):
+    from django.db import connection
+
+    sql, params = queryset.query.sql_with_params()
+    prefix = connection.vendor == 'sqlite' and 'EXPLAIN QUERY PLAN ' or 'EXPLAIN '
+    cursor = connection.cursor()
+    cursor.execute(prefix + sql, params)
+    return [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+
+
+def run(label):
+    print("\n== %s" % label)
+    for name, queryset in query_shapes():
+        start = time.time()
+        for i in range(RUNS):
+            list(queryset._clone())
+        elapsed = (time.time() - start) / RUNS * 1000
+        print("%-40s %8.3fms" % (name, elapsed))
+        for line in explain(queryset):
+            print("    %s" % line)
+
+
+def composite_indexes():
+    from django.db import connection
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                   "AND tbl_name LIKE 'periodicals_%%' AND sql IS NOT NULL")
+    return [(name, sql) for name, sql in cursor.fetchall() if ',' in sql]
+
+
+def main():
+    from django.db import connection
+
+    common.configure()
+    common.seed()
+    if connection.vendor != 'sqlite':
+        run("with composite indexes")
+        return
+    connection.cursor().execute('ANALYZE')
+    run("with composite indexes")
+    indexes = composite_indexes()
+    for name, sql in indexes:
+        connection.cursor().execute('DROP INDEX "%s"' % name)
+    # don't reuse statements prepared against the old schema
+    connection.close()
+    try:
+        run("without composite indexes")
+    finally:
+        for name, sql in indexes:
+            connection.cursor().execute(sql)
+
+
+if __name__ == '__main__':
+    main()
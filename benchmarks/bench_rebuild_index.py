@@ -0,0 +1,60 @@
+"""
+Index a seeded catalog and report documents per second, rendering the
+documents without the index queryset's select_related/prefetch_related
+as earlier versions did, with them, and with a pool of processes.
+
+    $ python benchmarks/bench_rebuild_index.py
+
+``BENCH_ARTICLES`` sets the catalog size (default 20,000) and
+``BENCH_WORKERS`` the processes of the parallel rebuild (default one per
+CPU).
+"""
+import multiprocessing
+import os
+import time
+
+import common
+
+
+def main():
+    articles = int(os.environ.get('BENCH_ARTICLES', 20000))
+    workers = int(os.environ.get('BENCH_WORKERS',
+                                 multiprocessing.cpu_count()))
+    # a dummy cache so no run reuses article_result fragments
+    common.configure('periodicals_bench_%d.sqlite3' % articles,
+                     CACHES={'default': {
+                         'BACKEND':
+                         'django.core.cache.backends.dummy.DummyCache'}})
+    common.seed(articles=articles)
+
+    from haystack import connections
+    from periodicals.models import Article
+    from periodicals.reindex import BATCH_SIZE, article_index, rebuild_index
+
+    index = article_index()
+    backend = connections['default'].get_backend()
+
+    def unprefetched():
+        backend.clear(models=[Article])
+        queryset = Article.objects.filter(pk__in=index.index_queryset().
+                                          values_list('pk', flat=True))
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), BATCH_SIZE):
+            backend.update(index, list(Article.objects.filter(
+                pk__in=pks[start:start + BATCH_SIZE])))
+        return len(pks)
+
+    runs = (("without prefetching", unprefetched),
+            ("prefetched, 1 process", lambda: rebuild_index(workers=1)),
+            ("prefetched, %d processes" % workers,
+             lambda: rebuild_index(workers=workers)))
+    for label, run in runs:
+        start = time.time()
+        with common.timed("index %s" % label):
+            documents = run()
+        print("%d documents, %.0f/s" % (documents,
+                                        documents / (time.time() - start)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Generate every page of every sitemap section over a large catalog and
+report the time taken and the peak memory used.
+
+    $ python benchmarks/bench_sitemaps.py
+
+``BENCH_ARTICLES`` sets the catalog size (default 500,000) and
+``BENCH_MEMORY_CEILING_MB`` the peak memory growth allowed (default 64).
+"""
+import os
+import resource
+import subprocess
+import sys
+
+import common
+
+
+def max_rss_mb():
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main():
+    articles = int(os.environ.get('BENCH_ARTICLES', 500000))
+    ceiling = float(os.environ.get('BENCH_MEMORY_CEILING_MB', 64))
+    common.configure('periodicals_bench_%d.sqlite3' % articles)
+    if sys.argv[1:] == ['--seed']:
+        common.seed(articles=articles)
+        return
+    # seed in another process so it doesn't count towards peak memory
+    subprocess.check_call([sys.executable, __file__, '--seed'])
+
+    from django.contrib.sites.models import Site
+    from periodicals.sitemaps import (sitemaps, sitemap_pages,
+                                      iter_sitemap_urls, render_urlset)
+
+    site = Site(domain='example.com')
+    before = max_rss_mb()
+    urls = pages = size = 0
+    with common.timed("render %d article sitemaps" % articles):
+        for section, page in sitemap_pages(sitemaps):
+            pages += 1
+            for chunk in render_urlset(iter_sitemap_urls(sitemaps[section],
+                                                         page, site, 'http')):
+                size += len(chunk)
+                urls += chunk.count('<url>')
+    growth = max_rss_mb() - before
+    print("%d urls in %d pages, %.1fMB of XML" % (urls, pages, size / 1048576.0))
+    print("peak memory growth %.1fMB (ceiling %.1fMB)" % (growth, ceiling))
+    if growth > ceiling:
+        sys.exit("memory ceiling exceeded")
+
+
+if __name__ == '__main__':
+    main()
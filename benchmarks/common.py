@@ -0,0 +1,158 @@
+"""
+Shared setup for the benchmark scripts.
+
+Configures Django against a scratch database (SQLite by default, set
+``BENCH_DB_ENGINE``/``BENCH_DB_NAME`` etc. to use PostgreSQL) and seeds it
+with a synthetic catalog using ``bulk_create``.
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERIES = ['Editorial', 'Humor', 'Training', 'Health', 'Letters',
+          'Reviews', 'Interview', 'News', 'Puzzles', 'Travel']
+
+
+def configure(database='periodicals_bench.sqlite3', **extra):
+    from django.conf import settings
+
+    if settings.configured:
+        return
+    name = os.environ.get('BENCH_DB_NAME',
+                          os.path.join(tempfile.gettempdir(), database))
+    options = dict(
+        DEBUG=False,
+        USE_TZ=True,
+        DATABASES={
+            'default': {
+                'ENGINE': os.environ.get('BENCH_DB_ENGINE',
+                                         'django.db.backends.sqlite3'),
+                'NAME': name,
+                'USER': os.environ.get('BENCH_DB_USER', ''),
+                'PASSWORD': os.environ.get('BENCH_DB_PASSWORD', ''),
+                'HOST': os.environ.get('BENCH_DB_HOST', ''),
+            }
+        },
+        ROOT_URLCONF='periodicals.urls',
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'django.contrib.sites',
+            'haystack',
+            'tagging',
+            'captcha',
+            'periodicals',
+        ],
+        SITE_ID=1,
+        RECAPTCHA_PUBLIC_KEY='public',
+        RECAPTCHA_PRIVATE_KEY='private',
+        HAYSTACK_CONNECTIONS={
+            'default': {
+                'ENGINE': 'haystack.backends.whoosh_backend.WhooshEngine',
+                'PATH': os.path.join(tempfile.gettempdir(),
+                                     'periodicals_bench_whoosh'),
+            },
+        },
+    )
+    options.update(extra)
+    settings.configure(**options)
+
+    from django.core.management import call_command
+    call_command('syncdb', interactive=False, verbosity=0)
+
+
+@contextmanager
+def timed(label):
+    start = time.time()
+    yield
+    print("%-50s %8.3fs" % (label, time.time() - start))
+
+
+def seed(articles=100000, articles_per_issue=50, periodicals=2,
+         authors_per_article=2, links=10000):
+    """
+    Populate an empty database with ``articles`` Articles spread over
+    ``periodicals`` Periodicals. Does nothing when Articles exist.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from periodicals.models import (Author, Periodical, Issue, Article,
+                                    LinkItem, recount_authors)
+
+    if Article.objects.exists():
+        return
+    with timed("seed %d articles" % articles):
+        Periodical.objects.bulk_create(
+            [Periodical(name="Periodical %d" % p, slug="periodical-%d" % p)
+             for p in range(periodicals)])
+        periodical_ids = list(Periodical.objects.values_list('pk', flat=True))
+
+        issue_count = max(1, articles // articles_per_issue)
+        issues = []
+        for i in range(issue_count):
+            number = i // len(periodical_ids)
+            year, month = 1950 + number // 12, number % 12 + 1
+            issues.append(Issue(periodical_id=periodical_ids[i % len(periodical_ids)],
+                                volume=year - 1949,
+                                issue=month,
+                                pub_date=date(year, month, 1),
+                                slug="%d-%d" % (year - 1949, month)))
+        Issue.objects.bulk_create(issues)
+        issue_ids, issue_paths = [], {}
+        for pk, slug, periodical_slug in Issue.objects.values_list(
+                'pk', 'slug', 'periodical__slug'):
+            issue_ids.append(pk)
+            issue_paths[pk] = "%s/%s/" % (periodical_slug, slug)
+
+        author_count = max(1, articles // 20)
+        Author.objects.bulk_create(
+            [Author(first_name="First%d" % a, last_name="Last%d" % a,
+                    slug="last%d-first%d" % (a, a))
+             for a in range(author_count)])
+        author_ids = list(Author.objects.values_list('pk', flat=True))
+
+        batch = []
+        for a in range(articles):
+            issue_id = issue_ids[a // articles_per_issue % len(issue_ids)]
+            batch.append(Article(issue_id=issue_id,
+                                 series=SERIES[a % len(SERIES)],
+                                 title="Article %d" % a,
+                                 description="Description of article %d" % a,
+                                 page=a % articles_per_issue + 1,
+                                 slug="article-%d" % a,
+                                 url_path="%sarticle-%d/" % (issue_paths[issue_id], a)))
+            if len(batch) == 10000:
+                Article.objects.bulk_create(batch)
+                batch = []
+        Article.objects.bulk_create(batch)
+
+        through = Article.authors.through
+        batch = []
+        for position, article_id in enumerate(
+                Article.objects.values_list('pk', flat=True).iterator()):
+            for n in range(authors_per_article):
+                batch.append(through(
+                    article_id=article_id,
+                    author_id=author_ids[(position + n) % len(author_ids)]))
+            if len(batch) >= 10000:
+                through.objects.bulk_create(batch)
+                batch = []
+        through.objects.bulk_create(batch)
+        recount_authors(Author.objects.all())
+
+        article_type = ContentType.objects.get_for_model(Article)
+        statuses = [LinkItem.STATUS_ACTIVE, LinkItem.STATUS_SUBMITTED,
+                    LinkItem.STATUS_DELETED]
+        first_article = Article.objects.order_by('pk').values_list('pk', flat=True)[0]
+        LinkItem.objects.bulk_create(
+            [LinkItem(content_type=article_type,
+                      object_id=first_article + l % articles,
+                      status=statuses[l % len(statuses)],
+                      url="http://example.com/%d" % l,
+                      title="Link %d" % l)
+             for l in range(links)])
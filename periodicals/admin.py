@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 from django.contrib import admin
 from django.contrib.contenttypes import generic
-from .models import Author, Periodical, Issue, Article, LinkItem
+from .models import (Author, Periodical, Issue, Article, LinkItem, LinkCheck,
+                     Series)
 
 
 class AuthorAdmin(admin.ModelAdmin):
@@ -16,7 +17,8 @@ class AuthorAdmin(admin.ModelAdmin):
                     'email',
                     'website',
                     'blog',
-                    'alt_website')
+                    'alt_website',
+                    'article_count')
     ordering = ('last_name', 'first_name')
     search_fields = ['last_name']
     save_on_top = True
@@ -34,6 +36,21 @@ class LinkItemAdmin(admin.ModelAdmin):
     save_on_top = True
 
 
+class LinkCheckAdmin(admin.ModelAdmin):
+    list_display = ('url', 'status', 'error', 'failures', 'checked')
+    list_filter = ('status',)
+    readonly_fields = ('url', 'status', 'error', 'failures', 'checked')
+    search_fields = ('url',)
+
+
+class SeriesAdmin(admin.ModelAdmin):
+    list_display = ('name', 'periodical', 'article_count', 'latest_pub_date')
+    list_filter = ('periodical',)
+    readonly_fields = ('periodical', 'name', 'slug', 'article_count',
+                       'latest_pub_date')
+    search_fields = ['name']
+
+
 class LinkItemInline(generic.GenericTabularInline):
     model = LinkItem
 
@@ -71,7 +88,9 @@ class ArticleAdmin(admin.ModelAdmin):
 
 
 admin.site.register(LinkItem, LinkItemAdmin)
+admin.site.register(LinkCheck, LinkCheckAdmin)
 admin.site.register(Author, AuthorAdmin)
 admin.site.register(Periodical, PeriodicalAdmin)
 admin.site.register(Issue, IssueAdmin)
 admin.site.register(Article, ArticleAdmin)
+admin.site.register(Series, SeriesAdmin)
@@ -0,0 +1,172 @@
+"""
+Conditional GET support for the periodical and author pages.
+
+``Periodical.modified`` is updated whenever anything shown on the pages
+of the Periodical changes and ``Author.modified`` whenever the Author's
+Articles change, so the Last-Modified and ETag of a page are found with
+one indexed query and unchanged pages are answered with a 304. Every
+page also shows the number of Articles of all the Periodicals, so its
+Last-Modified is never earlier than the last time that changed.
+"""
+import hashlib
+
+from django.db.models.signals import (m2m_changed, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+
+from .counters import article_counts_changed
+from .models import Author, Periodical, Issue, Article, LinkItem
+from .signals import pages_changed
+
+
+def periodical_modified(request, periodical_slug, **kwargs):
+    """
+    Last-Modified of the pages of the Periodical.
+    """
+    return _modified(request, Periodical.objects.filter(slug=periodical_slug))
+
+
+def author_modified(request, author_slug, **kwargs):
+    """
+    Last-Modified of the page of the Author.
+    """
+    return _modified(request, Author.objects.filter(slug=author_slug))
+
+
+def conditional_page(last_modified_func):
+    """
+    View decorator answering conditional GETs from ``last_modified_func``
+    which is only called once per request.
+    """
+    def modified_func(request, *args, **kwargs):
+        modified = last_modified_func(request, *args, **kwargs)
+        if modified is None:
+            return None
+        # the base template shows the number of Articles
+        return max(modified, article_counts_changed())
+
+    def etag_func(request, *args, **kwargs):
+        modified = modified_func(request, *args, **kwargs)
+        if modified is None:
+            return None
+        return hashlib.md5(('%s %s' % (modified.isoformat(),
+                                       get_language())).encode('utf-8')).\
+            hexdigest()
+    return condition(etag_func=etag_func, last_modified_func=modified_func)
+
+
+def _modified(request, queryset):
+    # both the ETag and Last-Modified functions ask for it
+    if not hasattr(request, '_periodicals_modified'):
+        modified = list(queryset.values_list('modified', flat=True)[:1])
+        request._periodicals_modified = modified and modified[0] or None
+    return request._periodicals_modified
+
+
+def touch_periodicals(periodicals):
+    _touch(Periodical, periodicals)
+
+
+def touch_authors(authors):
+    _touch(Author, authors)
+
+
+def _touch(model, queryset):
+    # joins through Articles repeat each row
+    slugs = list(queryset.order_by().values_list('slug', flat=True).
+                 distinct())
+    if slugs:
+        model.objects.filter(slug__in=slugs).update(modified=timezone.now())
+        pages_changed.send(sender=model, slugs=slugs)
+
+
+# touched before and after changes to cover rows moved between parents
+@receiver(pre_save, sender=Issue)
+@receiver(pre_delete, sender=Issue)
+def _issue_changing(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        touch_periodicals(Periodical.objects.filter(issue=instance.pk))
+
+
+@receiver(post_save, sender=Issue)
+def _issue_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_periodicals(Periodical.objects.filter(
+            pk=instance.periodical_id))
+        # the Issue is named in the Authors' Article listings
+        touch_authors(Author.objects.filter(articles__issue=instance.pk))
+
+
+@receiver(post_save, sender=Periodical)
+def _periodical_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_authors(Author.objects.filter(
+            articles__issue__periodical=instance.pk))
+
+
+@receiver(pre_save, sender=Article)
+@receiver(pre_delete, sender=Article)
+def _article_changing(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        touch_periodicals(Periodical.objects.filter(
+            issue__articles=instance.pk))
+        touch_authors(Author.objects.filter(articles=instance.pk))
+
+
+@receiver(post_save, sender=Article)
+def _article_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_periodicals(Periodical.objects.filter(issue=instance.issue_id))
+
+
+@receiver(post_save, sender=Author)
+@receiver(pre_delete, sender=Author)
+def _author_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_periodicals(Periodical.objects.filter(
+            issue__articles__authors=instance.pk))
+
+
+@receiver(m2m_changed, sender=Article.authors.through)
+def _authors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('pre_clear', 'post_add', 'post_remove'):
+        return
+    if reverse:
+        articles = Article.objects.filter(authors=instance.pk)
+        if pk_set:
+            articles = Article.objects.filter(pk__in=pk_set)
+        touch_authors(Author.objects.filter(pk=instance.pk))
+    else:
+        articles = Article.objects.filter(pk=instance.pk)
+        authors = Author.objects.filter(articles=instance.pk)
+        if pk_set:
+            authors = Author.objects.filter(pk__in=pk_set)
+        touch_authors(authors)
+    touch_periodicals(Periodical.objects.filter(issue__articles__in=articles))
+
+
+@receiver(pre_save, sender=LinkItem)
+@receiver(pre_delete, sender=LinkItem)
+def _link_changing(sender, instance, raw=False, **kwargs):
+    # submitted and deleted links aren't shown
+    if instance.pk and not raw and LinkItem.active.filter(
+            pk=instance.pk).exists():
+        _touch_linked(instance)
+
+
+@receiver(post_save, sender=LinkItem)
+def _link_changed(sender, instance, raw=False, **kwargs):
+    if not raw and instance.status == LinkItem.STATUS_ACTIVE:
+        _touch_linked(instance)
+
+
+def _touch_linked(link):
+    model = link.content_type.model_class()
+    if model is Issue:
+        touch_periodicals(Periodical.objects.filter(issue=link.object_id))
+    elif model is Article:
+        touch_periodicals(Periodical.objects.filter(
+            issue__articles=link.object_id))
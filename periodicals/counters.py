@@ -0,0 +1,122 @@
+"""
+Article counts kept in the cache and adjusted as Articles are created and
+deleted, so pages showing them don't count the articles table on each
+request.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Issue, Article
+from .versions import bump, get_versions, version_time
+
+# on PostgreSQL tables estimated by the planner to hold more rows than
+# this are not counted exactly
+settings.PERIODICALS_COUNT_ESTIMATE_OVER = \
+    getattr(settings, "PERIODICALS_COUNT_ESTIMATE_OVER", 100000)
+
+COUNT_KEY = 'periodicals:article_count'
+VERSION_KEY = 'periodicals:article_count_version'
+# replaced whenever an Article is created or deleted
+CHANGED_KEY = 'periodicals:article_count_changed'
+
+
+def article_count(periodical=None):
+    """
+    Number of Articles, in ``periodical`` when given.
+    """
+    key = _count_key(periodical)
+    count = cache.get(key)
+    if count is None:
+        if periodical is None:
+            count = _estimated_count()
+            if count is None:
+                count = Article.objects.count()
+        else:
+            count = Article.objects.filter(
+                issue__periodical=periodical).count()
+        cache.set(key, count, settings.PERIODICALS_CACHE_TIMEOUT)
+    return count
+
+
+def article_counts_changed():
+    """
+    When the number of Articles last changed, for the Last-Modified of
+    pages showing it.
+    """
+    return version_time(get_versions([CHANGED_KEY])[CHANGED_KEY])
+
+
+def invalidate_article_counts():
+    """
+    Discard the cached counts, e.g. after bulk creating or deleting
+    Articles which doesn't send signals.
+    """
+    cache.delete(COUNT_KEY)
+    bump([VERSION_KEY, CHANGED_KEY])
+
+
+def _count_key(periodical=None):
+    if periodical is None:
+        return COUNT_KEY
+    version = get_versions([VERSION_KEY])[VERSION_KEY]
+    pk = getattr(periodical, 'pk', periodical)
+    return '%s:%s:%s' % (COUNT_KEY, version, pk)
+
+
+def _bump_version():
+    bump([VERSION_KEY])
+
+
+def _estimated_count():
+    if not settings.PERIODICALS_COUNT_ESTIMATE_OVER:
+        return None
+    connection = connections[router.db_for_read(Article)]
+    if connection.vendor != 'postgresql':
+        return None
+    cursor = connection.cursor()
+    cursor.execute("SELECT reltuples FROM pg_class "
+                   "WHERE oid = %s::regclass", [Article._meta.db_table])
+    row = cursor.fetchone()
+    if row is None or row[0] < settings.PERIODICALS_COUNT_ESTIMATE_OVER:
+        return None
+    return int(row[0])
+
+
+def _adjust(article, delta):
+    bump([CHANGED_KEY])
+    keys = [COUNT_KEY]
+    if cache.get(VERSION_KEY) is not None:
+        # only look up the Periodical when its count may be cached
+        keys.append(_count_key(article.issue.periodical_id))
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # not cached, counted on next use
+            pass
+
+
+@receiver(post_save, sender=Article)
+def _article_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        invalidate_article_counts()
+    elif created:
+        _adjust(instance, 1)
+    else:
+        # the Article may have moved to another Periodical's Issue
+        _bump_version()
+
+
+@receiver(post_delete, sender=Article)
+def _article_deleted(sender, instance, **kwargs):
+    _adjust(instance, -1)
+
+
+@receiver(post_save, sender=Issue)
+def _issue_saved(sender, instance, created=False, raw=False, **kwargs):
+    if not created:
+        # the Issue may have moved to another Periodical
+        _bump_version()
@@ -0,0 +1,164 @@
+"""
+Streaming export of the catalog.
+
+Writes one record per Article, in the format read by
+``periodicals.importer``, with its Issue, Periodical, Authors, tags and
+the active links of the Article and of its Issue. Articles are read in
+chunks ordered by primary key, each chunk's Authors and links with one
+query each, so memory use doesn't grow with the size of the catalog.
+
+Issues without Articles and the fields the importer doesn't read aren't
+exported; the Articles' slugs and links are, though the importer ignores
+them.
+"""
+import csv
+import io
+import json
+
+from django.contrib.auth.decorators import user_passes_test
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .models import Issue, Article, LinkItem
+
+CHUNK_SIZE = 1000
+
+# record field, Article lookup
+ARTICLE_VALUES = (
+    ('periodical', 'issue__periodical__name'),
+    ('periodical_slug', 'issue__periodical__slug'),
+    ('volume', 'issue__volume'),
+    ('issue', 'issue__issue'),
+    ('pub_date', 'issue__pub_date'),
+    ('issue_title', 'issue__title'),
+    ('issue_slug', 'issue__slug'),
+    ('series', 'series'),
+    ('title', 'title'),
+    ('slug', 'slug'),
+    ('description', 'description'),
+    ('page', 'page'),
+    ('tags', 'tags'),
+    ('buy_print', 'buy_print'),
+    ('buy_digital', 'buy_digital'),
+    ('read_online', 'read_online'),
+)
+AUTHOR_FIELDS = ('title', 'first_name', 'middle_name', 'last_name',
+                 'postnomial', 'slug')
+FIELDS = tuple(field for field, lookup in ARTICLE_VALUES) + \
+    ('authors', 'links', 'issue_links')
+
+
+def iter_catalog(articles=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield a record for each Article of the queryset, all of them by
+    default.
+    """
+    if articles is None:
+        articles = Article.objects.all()
+    lookups = ['pk', 'issue'] + [lookup for field, lookup in ARTICLE_VALUES]
+    last = None
+    while True:
+        chunk = articles.order_by('pk')
+        if last is not None:
+            chunk = chunk.filter(pk__gt=last)
+        rows = list(chunk.values_list(*lookups)[:chunk_size])
+        if not rows:
+            return
+        last = rows[-1][0]
+        pks = [row[0] for row in rows]
+        authors = _authors(pks)
+        links = _active_links(Article, pks)
+        issue_links = _active_links(Issue, set(row[1] for row in rows))
+        for row in rows:
+            record = dict((field, value) for (field, lookup), value in
+                          zip(ARTICLE_VALUES, row[2:]))
+            record['authors'] = authors.get(row[0], [])
+            record['links'] = links.get(row[0], [])
+            record['issue_links'] = issue_links.get(row[1], [])
+            yield record
+        if len(rows) < chunk_size:
+            return
+
+
+def render_jsonl(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+
+
+def render_csv(records):
+    """
+    CSV lines with a header. Authors are written as ``Last, First
+    Middle`` separated by ``;`` and links as their space separated urls.
+    """
+    yield _csv_line(FIELDS)
+    for record in records:
+        record = dict(record,
+                      authors='; '.join(_author_name(author)
+                                        for author in record['authors']),
+                      links=' '.join(link['url']
+                                     for link in record['links']),
+                      issue_links=' '.join(link['url']
+                                           for link in record['issue_links']))
+        yield _csv_line([record[field] for field in FIELDS])
+
+
+RENDERERS = {
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (render_jsonl, 'application/x-ndjson'),
+}
+
+
+@user_passes_test(lambda user: user.is_active and user.is_staff)
+def export(request, format):
+    """
+    Streaming download of the whole catalog for staff.
+    """
+    render, content_type = RENDERERS[format]
+    response = StreamingHttpResponse(render(iter_catalog()),
+                                     content_type=content_type)
+    response['Content-Disposition'] = \
+        'attachment; filename=catalog.%s' % format
+    return response
+
+
+def _authors(articles):
+    authors = {}
+    for values in Article.authors.through.objects.\
+            filter(article__in=articles).order_by('pk').\
+            values_list('article', *['author__' + field
+                                     for field in AUTHOR_FIELDS]):
+        authors.setdefault(values[0], []).append(
+            dict(zip(AUTHOR_FIELDS, values[1:])))
+    return authors
+
+
+def _active_links(model, ids):
+    links = {}
+    for object_id, url, title in LinkItem.active.\
+            filter(content_type=ContentType.objects.get_for_model(model),
+                   object_id__in=ids).order_by('pk').\
+            values_list('object_id', 'url', 'title'):
+        links.setdefault(object_id, []).append(dict(url=url, title=title))
+    return links
+
+
+def _author_name(author):
+    given = ' '.join(name for name in (author['first_name'],
+                                       author['middle_name']) if name)
+    return given and '%s, %s' % (author['last_name'], given) or \
+        author['last_name']
+
+
+def _csv_line(values):
+    line = io.BytesIO()
+    csv.writer(line).writerow([_encode(value) for value in values])
+    return line.getvalue()
+
+
+def _encode(value):
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
@@ -0,0 +1,155 @@
+"""
+Rendered article_result HTML cached per Article. Keys include
+``Article.modified``, a version of the Article's Issue replaced whenever
+the Issue or its Periodical is saved and a version of the Article's
+Authors replaced whenever they are changed or saved, so stale fragments
+are never looked up again and simply expire.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils.translation import get_language
+
+from .models import Author, Periodical, Issue, Article
+from .versions import bump, get_versions
+
+KEY_PREFIX = 'periodicals:article_result'
+ISSUE_VERSION_PREFIX = 'periodicals:article_result_issue'
+AUTHORS_VERSION_PREFIX = 'periodicals:article_result_authors'
+
+
+def article_result_key(article, autoescape, versions=None):
+    """
+    Cache key of the fragment for the Article, None when unsaved.
+    ``versions`` are those returned by fragment_versions() for a list
+    including the Article, looked up when not given.
+    """
+    if article.pk is None or article.modified is None:
+        return None
+    if versions is None:
+        versions = fragment_versions([article])
+    return '%s:%s:%s:%s.%s:%s:%d' % (
+        KEY_PREFIX,
+        article.pk,
+        article.modified.strftime('%Y%m%d%H%M%S%f'),
+        versions[_issue_key(article.issue_id)],
+        versions[_authors_key(article.pk)],
+        get_language(),
+        autoescape and 1 or 0)
+
+
+def fragment_versions(articles):
+    """
+    The versions of the Articles' Issues and Authors, looked up with one
+    cache request.
+    """
+    keys = set()
+    for article in articles:
+        keys.add(_issue_key(article.issue_id))
+        keys.add(_authors_key(article.pk))
+    return get_versions(list(keys))
+
+
+def invalidate_issues(issue_ids):
+    """
+    Discard the cached fragments of the Articles in the Issues.
+    """
+    bump([_issue_key(issue_id) for issue_id in issue_ids])
+
+
+def invalidate_articles(article_ids):
+    """
+    Discard the cached fragments of the Articles, e.g. when their
+    Authors change.
+    """
+    bump([_authors_key(article_id) for article_id in article_ids])
+
+
+def prefetch_article_results(articles, autoescape):
+    """
+    Look up the versions of the Articles' Issues and Authors, then the
+    cached fragments of all the Articles, with one cache request each
+    and remember them, or their absence, on each Article.
+    """
+    articles = [article for article in articles if article.pk is not None]
+    versions = fragment_versions(articles)
+    keyed = {}
+    for article in articles:
+        article._fragment_versions = versions
+        key = article_result_key(article, autoescape, versions)
+        if key is not None:
+            keyed[key] = article
+    cached = cache.get_many(list(keyed))
+    for key, article in keyed.items():
+        results = article.__dict__.setdefault('_article_results', {})
+        results[key] = cached.get(key)
+
+
+def cached_article_result(article, autoescape, render):
+    """
+    The fragment for the Article, calling ``render`` and caching its
+    result when it isn't cached.
+    """
+    key = article_result_key(article, autoescape,
+                             getattr(article, '_fragment_versions', None))
+    if key is None:
+        return render(article, autoescape)
+    results = getattr(article, '_article_results', {})
+    if key in results:
+        result = results[key]
+    else:
+        result = cache.get(key)
+    if result is None:
+        result = render(article, autoescape)
+        cache.set(key, result, settings.PERIODICALS_CACHE_TIMEOUT)
+    return result
+
+
+def _issue_key(issue_id):
+    return '%s:%s' % (ISSUE_VERSION_PREFIX, issue_id)
+
+
+def _authors_key(article_id):
+    return '%s:%s' % (AUTHORS_VERSION_PREFIX, article_id)
+
+
+def _authors_articles(author):
+    return Article.objects.filter(authors=author).values_list('pk',
+                                                              flat=True)
+
+
+@receiver(post_save, sender=Author)
+def _author_saved(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        invalidate_articles(_authors_articles(instance))
+
+
+@receiver(pre_delete, sender=Author)
+def _author_deleted(sender, instance, **kwargs):
+    invalidate_articles(_authors_articles(instance))
+
+
+@receiver(post_save, sender=Issue)
+def _issue_saved(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        invalidate_issues([instance.pk])
+
+
+@receiver(post_save, sender=Periodical)
+def _periodical_saved(sender, instance, created=False, raw=False,
+                      **kwargs):
+    if not created and not raw:
+        invalidate_issues(Issue.objects.filter(periodical=instance).
+                          values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Article.authors.through)
+def _authors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_articles([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_articles(_authors_articles(instance))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_articles(pk_set)
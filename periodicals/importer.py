@@ -0,0 +1,472 @@
+"""
+Bulk import of a back catalog of Issues, Articles and Authors.
+
+Records are read one at a time from CSV or JSON, one record per Article::
+
+    periodical, periodical_slug, volume, issue, pub_date, issue_title,
+    issue_slug, series, title, description, page, tags, buy_print,
+    buy_digital, read_online, authors
+
+Only ``periodical``, ``volume``, ``issue``, ``pub_date`` and ``title`` are
+required. In JSON ``authors`` is a list of names or of dictionaries with
+the Author's fields, in CSV a ``;`` separated list of names written as
+``Last, First Middle``.
+
+Instead of saving each object, every batch of records is written with a
+few queries inside a transaction: existing Periodicals, Issues and
+Authors are looked up at once, slugs are made unique in memory and the
+new rows are inserted with ``bulk_create``. Since no signals are sent the
+stored neighbors, author counts, series and caches are brought up to date
+once the import is finished. Records matching an Article that was in the
+Issue before the import (same title and page) are skipped, one record
+per Article, so an interrupted import can be run again; the derived data
+of the skipped records is brought up to date too, as the interrupted run
+never finished.
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.db import connections, router, transaction
+from django.template.defaultfilters import slugify
+from django.utils import timezone
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+
+from autoslug.utils import crop_slug
+from tagging.models import Tag, TaggedItem
+
+from .models import (Author, Periodical, Issue, Article, format_fields,
+                     recount_authors, refresh_series, relink_articles,
+                     relink_issues)
+from .conditional import touch_authors, touch_periodicals
+from .counters import invalidate_article_counts
+from .tagcloud import invalidate_tag_cloud, tag_names
+
+BATCH_SIZE = 1000
+# rows per IN (...) lookup, below SQLite's limit of query parameters
+CHUNK_SIZE = 500
+
+AUTHOR_FIELDS = ('title', 'first_name', 'middle_name', 'last_name',
+                 'postnomial')
+ARTICLE_FIELDS = ('series', 'description', 'buy_print', 'buy_digital',
+                  'read_online')
+
+
+class CatalogError(ValueError):
+    """
+    A record that can't be imported, ``line`` is its position in the
+    input.
+    """
+    def __init__(self, message, line=None):
+        if line is not None:
+            message = "record %d: %s" % (line, message)
+        super(CatalogError, self).__init__(message)
+        self.line = line
+
+
+def read_records(fileobj, format):
+    """
+    Yield the records of ``fileobj`` as dictionaries. ``format`` is
+    ``csv``, ``json`` (a list of records) or ``jsonl`` (one record per
+    line).
+    """
+    if format == 'csv':
+        for row in csv.DictReader(fileobj):
+            yield dict((_text(key), _text(value))
+                       for key, value in row.items() if key)
+    elif format == 'jsonl':
+        for line in fileobj:
+            if line.strip():
+                yield json.loads(_text(line))
+    elif format == 'json':
+        for record in json.load(fileobj):
+            yield record
+    else:
+        raise ValueError("Unknown format %r" % format)
+
+
+def import_catalog(records, batch_size=BATCH_SIZE):
+    """
+    Import the iterable of records, writing ``batch_size`` Articles per
+    transaction. Returns the number of ``periodicals``, ``issues``,
+    ``authors`` and ``articles`` created and of records ``skipped``.
+    """
+    importer = CatalogImporter()
+    batch = []
+    for line, record in enumerate(records, 1):
+        batch.append((line, record))
+        if len(batch) >= batch_size:
+            importer.import_batch(batch)
+            batch = []
+    if batch:
+        importer.import_batch(batch)
+    importer.finish()
+    return importer.counts
+
+
+class CatalogImporter(object):
+
+    def __init__(self):
+        self.counts = dict(periodicals=0, issues=0, authors=0, articles=0,
+                           skipped=0)
+        self.periodicals = {}
+        self.issues = {}
+        self.authors = {}
+        # periodical and issue slugs made from the slug formats
+        self.slug_formats = {}
+        # slugs known to be taken, slugs looked up and slugs whose
+        # numbered variants were looked up
+        self.slugs = {Author: (set(), set(), set()),
+                      Article: (set(), set(), set())}
+        # what needs rebuilding once all batches are written
+        self.changed_periodicals = set()
+        self.changed_issues = set()
+        self.changed_authors = set()
+        self.tagged = False
+        # Articles written by this import per (issue, title, page)
+        self.imported = {}
+
+    def import_batch(self, batch):
+        rows = [self.parse(line, record) for line, record in batch]
+        with _atomic():
+            self.resolve_periodicals(rows)
+            self.resolve_issues(rows)
+            self.resolve_authors(rows)
+            self.create_articles(rows)
+
+    def finish(self):
+        with _atomic():
+            for periodical in self.changed_periodicals:
+                relink_issues(periodical)
+                refresh_series(periodical)
+            for issue in self.changed_issues:
+                relink_articles(issue)
+            for pks in _chunks(sorted(self.changed_authors)):
+                recount_authors(Author.objects.filter(pk__in=pks))
+        invalidate_article_counts()
+        if self.tagged:
+            invalidate_tag_cloud()
+        for pks in _chunks(sorted(self.changed_periodicals)):
+            touch_periodicals(Periodical.objects.filter(pk__in=pks))
+        for pks in _chunks(sorted(self.changed_authors)):
+            touch_authors(Author.objects.filter(pk__in=pks))
+
+    def parse(self, line, record):
+        # plain values, model instances are only made for new rows
+        record = dict((key, value) for key, value in record.items()
+                      if value not in (None, ''))
+        for field in ('periodical', 'volume', 'issue', 'pub_date', 'title'):
+            if field not in record:
+                raise CatalogError("missing %s" % field, line)
+        try:
+            issue = dict(volume=int(record['volume']),
+                         issue=int(record['issue']),
+                         pub_date=datetime.strptime(record['pub_date'][:10],
+                                                    '%Y-%m-%d').date(),
+                         title=record.get('issue_title', ''))
+            page = int(record['page']) \
+                if record.get('page') not in (None, '') else None
+        except (TypeError, ValueError) as e:
+            raise CatalogError(str(e), line)
+        article = dict((field, record.get(field, ''))
+                       for field in ARTICLE_FIELDS + ('tags',))
+        article.update(title=record['title'], page=page)
+        try:
+            authors = [_author(author) for author in
+                       _split_authors(record.get('authors', []))]
+        except (TypeError, ValueError, AttributeError) as e:
+            raise CatalogError("invalid authors: %s" % e, line)
+        return dict(periodical=record['periodical'],
+                    periodical_slug=record.get('periodical_slug') or
+                    self.periodical_slug(record['periodical']),
+                    issue=issue,
+                    issue_slug=record.get('issue_slug') or
+                    self.issue_slug(issue),
+                    article=article,
+                    authors=authors)
+
+    def periodical_slug(self, name):
+        if name not in self.slug_formats:
+            periodical = Periodical(name=name)
+            self.slug_formats[name] = slugify(
+                format_fields(settings.PERIODICALS_PERIODICAL_SLUG_FORMAT,
+                              periodical))
+        return self.slug_formats[name]
+
+    def issue_slug(self, fields):
+        key = tuple(sorted(fields.items()))
+        if key not in self.slug_formats:
+            # as Issue.save()
+            if fields['title']:
+                slug = slugify(fields['title'])
+            else:
+                slug = slugify(format_fields(
+                    settings.PERIODICALS_ISSUE_SLUG_FORMAT, Issue(**fields)))
+            self.slug_formats[key] = slug
+        return self.slug_formats[key]
+
+    def resolve_periodicals(self, rows):
+        for row in rows:
+            slug = row['periodical_slug']
+            if slug not in self.periodicals:
+                existing = Periodical.objects.filter(slug=slug).\
+                    values_list('pk', flat=True)
+                if existing:
+                    self.periodicals[slug] = existing[0]
+                else:
+                    # few of them, saved normally
+                    periodical = Periodical(name=row['periodical'],
+                                            slug=slug)
+                    periodical.save()
+                    self.periodicals[slug] = periodical.pk
+                    self.counts['periodicals'] += 1
+            row['periodical_id'] = self.periodicals[slug]
+
+    def resolve_issues(self, rows):
+        wanted = {}
+        for row in rows:
+            key = (row['periodical_id'], row['issue_slug'])
+            if key not in self.issues:
+                wanted.setdefault(key, row['issue'])
+        if wanted:
+            self.load_issues(wanted)
+            new = [Issue(periodical_id=key[0], slug=key[1], **fields)
+                   for key, fields in sorted(wanted.items())
+                   if key not in self.issues]
+            if new:
+                Issue.objects.bulk_create(new)
+                self.load_issues(wanted)
+                self.counts['issues'] += len(new)
+                self.changed_periodicals.update(
+                    issue.periodical_id for issue in new)
+        for row in rows:
+            row['issue_id'], path = \
+                self.issues[(row['periodical_id'], row['issue_slug'])]
+            row['issue_path'] = path
+
+    def load_issues(self, wanted):
+        for periodical in set(key[0] for key in wanted):
+            slugs = [slug for key, slug in wanted if key == periodical]
+            for chunk in _chunks(slugs):
+                for pk, slug, periodical_slug in Issue.objects.\
+                        filter(periodical=periodical, slug__in=chunk).\
+                        values_list('pk', 'slug', 'periodical__slug'):
+                    self.issues[(periodical, slug)] = \
+                        (pk, "%s/%s/" % (periodical_slug, slug))
+
+    def resolve_authors(self, rows):
+        wanted = {}
+        for row in rows:
+            for author in row['authors']:
+                key = _author_key(author)
+                if key not in self.authors:
+                    wanted.setdefault(key, author)
+        if wanted:
+            self.load_authors(wanted)
+            new = [Author(**fields) for key, fields in sorted(wanted.items())
+                   if key not in self.authors]
+            if new:
+                slugs = [author.slug or slugify(format_fields(
+                    settings.PERIODICALS_AUTHOR_SLUG_FORMAT, author))
+                    for author in new]
+                for author, slug in zip(new,
+                                        self.unique_slugs(Author, slugs)):
+                    author.slug = slug
+                Author.objects.bulk_create(new)
+                self.load_authors(wanted)
+                self.counts['authors'] += len(new)
+
+    def load_authors(self, wanted):
+        last_names = sorted(set(key[3] for key in wanted))
+        for chunk in _chunks(last_names):
+            for values in Author.objects.filter(last_name__in=chunk).\
+                    values_list('pk', *AUTHOR_FIELDS):
+                if values[1:] in wanted:
+                    self.authors[values[1:]] = values[0]
+
+    def create_articles(self, rows):
+        # Articles in the Issues before the import, each matching one
+        # record; distinct records with the same title and page are all
+        # written
+        existing = {}
+        issues = sorted(set(row['issue_id'] for row in rows))
+        for chunk in _chunks(issues):
+            for key in Article.objects.filter(issue__in=chunk).\
+                    values_list('issue', 'title', 'page'):
+                existing[key] = existing.get(key, 0) + 1
+        for key in existing:
+            existing[key] -= self.imported.get(key, 0)
+        new = []
+        for row in rows:
+            fields = row['article']
+            key = (row['issue_id'], fields['title'], fields['page'])
+            if existing.get(key, 0) > 0:
+                existing[key] -= 1
+                self.counts['skipped'] += 1
+                # written by an interrupted import that never finished
+                self.changed(row)
+                continue
+            self.imported[key] = self.imported.get(key, 0) + 1
+            new.append(row)
+        if not new:
+            return
+        field = Article._meta.get_field('slug')
+        slugs = self.unique_slugs(
+            Article, [field.slugify(row['article']['title']) or 'article'
+                      for row in new])
+        now = timezone.now()
+        articles = []
+        for row, slug in zip(new, slugs):
+            articles.append(Article(issue_id=row['issue_id'],
+                                    slug=slug,
+                                    url_path=row['issue_path'] + slug + '/',
+                                    created=now,
+                                    modified=now,
+                                    **row['article']))
+        _insert(Article, articles)
+        pks = {}
+        for chunk in _chunks(slugs):
+            pks.update(Article.objects.filter(slug__in=chunk).
+                       values_list('slug', 'pk'))
+        through = Article.authors.through
+        authorships = {}
+        for row, article in zip(new, articles):
+            article.pk = pks[article.slug]
+            for author in row['authors']:
+                author_pk = self.authors[_author_key(author)]
+                # an author may be listed twice for one article
+                authorships[(article.pk, author_pk)] = \
+                    through(article_id=article.pk, author_id=author_pk)
+            self.changed(row)
+        through.objects.bulk_create(list(authorships.values()))
+        self.tag(articles)
+        self.counts['articles'] += len(new)
+
+    def changed(self, row):
+        self.changed_authors.update(self.authors[_author_key(author)]
+                                    for author in row['authors'])
+        self.changed_issues.add(row['issue_id'])
+        self.changed_periodicals.add(row['periodical_id'])
+
+    def tag(self, articles):
+        names = dict((article.pk, tag_names(article.tags))
+                     for article in articles)
+        wanted = set()
+        for article_names in names.values():
+            wanted.update(article_names)
+        if not wanted:
+            return
+        self.tagged = True
+        tags = {}
+        for chunk in _chunks(sorted(wanted)):
+            tags.update(Tag.objects.filter(name__in=chunk).
+                        values_list('name', 'pk'))
+        missing = wanted.difference(tags)
+        if missing:
+            Tag.objects.bulk_create(
+                [Tag(name=name) for name in sorted(missing)])
+            for chunk in _chunks(sorted(missing)):
+                tags.update(Tag.objects.
+                            filter(name__in=chunk).values_list('name', 'pk'))
+        content_type = ContentType.objects.get_for_model(Article)
+        # left behind by deleted Articles whose ids are reused
+        for chunk in _chunks(sorted(names)):
+            TaggedItem.objects.filter(content_type=content_type,
+                                      object_id__in=chunk).delete()
+        TaggedItem.objects.bulk_create(
+            [TaggedItem(tag_id=tags[name], content_type=content_type,
+                        object_id=pk)
+             for pk, article_names in sorted(names.items())
+             for name in sorted(article_names)])
+
+    def unique_slugs(self, model, slugs):
+        """
+        Make each slug unique in the table and among the slugs, numbering
+        them as ``AutoSlugField`` does: ``slug``, ``slug-2``, ``slug-3``...
+        """
+        field = model._meta.get_field('slug')
+        separator = getattr(field, 'index_sep', '-')
+        slugs = [crop_slug(field, slug) for slug in slugs]
+        taken, looked_up, numbered = self.slugs[model]
+        bases = sorted(set(slugs).difference(looked_up))
+        for chunk in _chunks(bases):
+            taken.update(model.objects.filter(slug__in=chunk).
+                         values_list('slug', flat=True))
+            looked_up.update(chunk)
+        unique = []
+        for base in slugs:
+            slug = base
+            if slug in taken and base not in numbered:
+                # the first collision, look for earlier numbered ones
+                prefix = base[:field.max_length - 10]
+                if prefix == base:
+                    prefix += separator
+                taken.update(model.objects.
+                             filter(slug__startswith=prefix).
+                             values_list('slug', flat=True))
+                numbered.add(base)
+            index = 1
+            while slug in taken:
+                index += 1
+                tail = '%s%d' % (separator, index)
+                slug = base[:field.max_length - len(tail)] + tail
+            taken.add(slug)
+            unique.append(slug)
+        return unique
+
+
+def _atomic():
+    # transaction.atomic is new in Django 1.6
+    atomic = getattr(transaction, 'atomic', None) or \
+        transaction.commit_on_success
+    return atomic()
+
+
+def _insert(model, objs):
+    """
+    bulk_create() without calling the fields' pre_save(), which for the
+    Article slug would query the table for each row to make it unique.
+    """
+    fields = [f for f in model._meta.local_fields if not f.primary_key]
+    using = router.db_for_write(model)
+    ops = connections[using].ops
+    size = max(ops.bulk_batch_size(fields, objs), 1)
+    for start in range(0, len(objs), size):
+        model._base_manager._insert(objs[start:start + size], fields=fields,
+                                    using=using, raw=True)
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
+
+
+def _split_authors(authors):
+    if isinstance(authors, basestring):
+        return [name for name in authors.split(';') if name.strip()]
+    return authors
+
+
+def _author(author):
+    if isinstance(author, dict):
+        return dict((field, author.get(field) or '')
+                    for field in AUTHOR_FIELDS + ('slug',))
+    # "Last, First Middle"
+    last_name, _sep, given = author.partition(',')
+    given = given.split(None, 1)
+    return dict(title='', postnomial='', slug='',
+                last_name=last_name.strip(),
+                first_name=given and given[0] or '',
+                middle_name=len(given) > 1 and given[1].strip() or '')
+
+
+def _author_key(author):
+    return tuple(author[field] for field in AUTHOR_FIELDS)
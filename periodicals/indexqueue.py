@@ -0,0 +1,194 @@
+"""
+Queued updates of the Articles' search index documents.
+
+Updating the index as each Article is saved makes every save wait for
+the search backend, and with Whoosh for its index lock. Instead
+``QueuedSignalProcessor`` records the ids of the Articles whose
+documents change, including through their Authors, Issue and
+Periodical, as IndexUpdates and ``process_queue``, run by the
+update_index_queue command, applies them in batches. Articles that aren't
+published yet are removed from the index and queued again for their
+publication date.
+
+The documents removed are deleted together, with Whoosh through one
+writer and one commit, skipped when none of them are in the index.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.utils import timezone
+from haystack.constants import DEFAULT_ALIAS, ID
+from haystack.signals import BaseSignalProcessor
+
+from .models import Author, Periodical, Issue, Article, IndexUpdate
+from .signals import search_index_changed
+
+BATCH_SIZE = 100
+
+
+def queue_articles(ids):
+    """
+    Queue the Articles with the ids for updating in the search index.
+    """
+    IndexUpdate.objects.bulk_create([IndexUpdate(article_id=article_id)
+                                     for article_id in ids])
+
+
+def process_queue(batch_size=BATCH_SIZE, using=DEFAULT_ALIAS):
+    """
+    Update or remove the documents of up to ``batch_size`` queued
+    Articles with a single backend update and remove them from the
+    queue. Returns the number of Articles processed.
+    """
+    # imported here as haystack loads this module while setting up
+    from haystack import connections
+
+    queued = list(IndexUpdate.objects.
+                  filter(Q(due__isnull=True) | Q(due__lte=timezone.now())).
+                  values_list('pk', 'article_id').order_by('pk')[:batch_size])
+    if not queued:
+        return 0
+    ids = set(article_id for pk, article_id in queued)
+    index = connections[using].get_unified_index().get_index(Article)
+    backend = connections[using].get_backend()
+    articles = list(index.index_queryset(using=using).filter(pk__in=ids))
+    if articles:
+        backend.update(index, articles)
+    # deleted or not yet published
+    missing = ids.difference(article.pk for article in articles)
+    if missing:
+        remove_articles(missing, using)
+        IndexUpdate.objects.bulk_create(
+            [IndexUpdate(article_id=article_id, due=_published(pub_date))
+             for article_id, pub_date in Article.objects.
+             filter(pk__in=missing).values_list('pk', 'issue__pub_date')])
+    # only the rows read, others may have been queued since
+    IndexUpdate.objects.filter(pk__in=[pk for pk, article_id in queued]).\
+        delete()
+    search_index_changed.send(sender=Article, using=using)
+    return len(ids)
+
+
+def remove_articles(ids, using=DEFAULT_ALIAS):
+    """
+    Remove the documents of the Articles with the ids from the index,
+    committing once. Returns the number of documents removed, or None
+    when the backend doesn't tell.
+    """
+    from haystack import connections
+    from haystack.utils import get_identifier
+
+    backend = connections[using].get_backend()
+    identifiers = [get_identifier(Article(pk=pk)) for pk in sorted(ids)]
+    if not identifiers:
+        return 0
+    if _is_whoosh(backend):
+        return _remove_whoosh(backend, identifiers)
+    for identifier in identifiers[:-1]:
+        backend.remove(identifier, commit=False)
+    backend.remove(identifiers[-1])
+    return None
+
+
+def _is_whoosh(backend):
+    try:
+        from haystack.backends.whoosh_backend import WhooshSearchBackend
+    except ImportError:
+        # Whoosh isn't installed
+        return False
+    return isinstance(backend, WhooshSearchBackend)
+
+
+def _remove_whoosh(backend, identifiers):
+    # backend.remove() commits the index for every document
+    if not backend.setup_complete:
+        backend.setup()
+    backend.index = backend.index.refresh()
+    writer = backend.index.writer()
+    removed = 0
+    try:
+        for identifier in identifiers:
+            removed += writer.delete_by_term(ID, identifier)
+    except Exception:
+        writer.cancel()
+        raise
+    if removed:
+        writer.commit()
+    else:
+        # none of them are indexed, e.g. Articles queued again until
+        # their publication date
+        writer.cancel()
+    return removed
+
+
+def _published(pub_date):
+    # when ArticleIndex.index_queryset() starts including the Article,
+    # it compares the date with the current date in the default time zone
+    published = datetime.datetime.combine(pub_date, datetime.time())
+    if settings.USE_TZ:
+        published = timezone.make_aware(published,
+                                        timezone.get_default_timezone())
+    return published
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Queues the Articles changed for the update_index_queue command
+    instead of updating the index during the request. Enable it in
+    ``settings.py`` with::
+
+        HAYSTACK_SIGNAL_PROCESSOR = \\
+            'periodicals.indexqueue.QueuedSignalProcessor'
+    """
+    def setup(self):
+        post_save.connect(self.article_saved, sender=Article)
+        post_delete.connect(self.article_saved, sender=Article)
+        post_save.connect(self.author_saved, sender=Author)
+        pre_delete.connect(self.author_saved, sender=Author)
+        post_save.connect(self.issue_saved, sender=Issue)
+        post_save.connect(self.periodical_saved, sender=Periodical)
+        m2m_changed.connect(self.authors_changed,
+                            sender=Article.authors.through)
+
+    def teardown(self):
+        post_save.disconnect(self.article_saved, sender=Article)
+        post_delete.disconnect(self.article_saved, sender=Article)
+        post_save.disconnect(self.author_saved, sender=Author)
+        pre_delete.disconnect(self.author_saved, sender=Author)
+        post_save.disconnect(self.issue_saved, sender=Issue)
+        post_save.disconnect(self.periodical_saved, sender=Periodical)
+        m2m_changed.disconnect(self.authors_changed,
+                               sender=Article.authors.through)
+
+    def article_saved(self, sender, instance, **kwargs):
+        queue_articles([instance.pk])
+
+    def author_saved(self, sender, instance, created=False, **kwargs):
+        if not created:
+            queue_articles(Article.objects.filter(authors=instance).
+                           values_list('pk', flat=True))
+
+    def issue_saved(self, sender, instance, created=False, **kwargs):
+        if not created:
+            queue_articles(Article.objects.filter(issue=instance).
+                           values_list('pk', flat=True))
+
+    def periodical_saved(self, sender, instance, created=False, **kwargs):
+        if not created:
+            queue_articles(Article.objects.
+                           filter(issue__periodical=instance).
+                           values_list('pk', flat=True))
+
+    def authors_changed(self, sender, instance, action, reverse, pk_set,
+                        **kwargs):
+        if not reverse:
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                queue_articles([instance.pk])
+        elif action == 'pre_clear':
+            queue_articles(Article.objects.filter(authors=instance).
+                           values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            queue_articles(pk_set)
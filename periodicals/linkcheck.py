@@ -0,0 +1,176 @@
+"""
+Checks of the external urls of LinkItems, Issues and Articles.
+
+Urls are requested by a pool of threads, spacing the requests to each
+host ``host_delay`` seconds apart, while the calling thread records the
+result of each check in a LinkCheck as they arrive. LinkItems whose url
+fails several checks in a row can then be deleted.
+"""
+import httplib
+import socket
+import threading
+import time
+import urllib2
+import urlparse
+from Queue import Empty, Queue
+
+from django.utils import timezone
+
+from .models import Issue, Article, LinkItem, LinkCheck
+
+WORKERS = 10
+TIMEOUT = 10
+HOST_DELAY = 1.0
+# consecutive failed checks before a LinkItem is deleted
+FAILURES = 3
+USER_AGENT = 'django-periodicals link checker'
+
+URL_FIELDS = (
+    (Issue, ('buy_print', 'buy_digital', 'read_online')),
+    (Article, ('buy_print', 'buy_digital', 'read_online')),
+)
+
+
+def link_urls():
+    """
+    The distinct http(s) urls of the LinkItems that aren't deleted and
+    of the Issues and Articles, interleaved by host.
+    """
+    urls = set(LinkItem.objects.exclude(status=LinkItem.STATUS_DELETED).
+               values_list('url', flat=True))
+    for model, fields in URL_FIELDS:
+        for field in fields:
+            urls.update(model.objects.exclude(**{field: ''}).
+                        values_list(field, flat=True).distinct())
+    return _interleave(url for url in urls
+                       if urlparse.urlsplit(url).scheme in ('http', 'https'))
+
+
+def is_dead(status):
+    return status is None or status >= 400
+
+
+def check_url(url, timeout=TIMEOUT):
+    """
+    The HTTP status of a HEAD request of the url, or of a GET when the
+    server doesn't allow HEAD, and the error when there is no response.
+    """
+    for method in ('HEAD', 'GET'):
+        request = urllib2.Request(url, headers={'User-Agent': USER_AGENT})
+        request.get_method = lambda method=method: method
+        try:
+            response = urllib2.urlopen(request, timeout=timeout)
+        except urllib2.HTTPError as e:
+            if method == 'HEAD' and e.code in (405, 501):
+                continue
+            return e.code, ''
+        except (urllib2.URLError, socket.error, httplib.HTTPException,
+                ValueError) as e:
+            return None, _error(e)
+        response.close()
+        return response.getcode(), ''
+
+
+def check_links(urls, workers=WORKERS, timeout=TIMEOUT,
+                host_delay=HOST_DELAY):
+    """
+    Check the urls with ``workers`` threads, yielding ``(url, status,
+    error)`` as each check completes.
+    """
+    pending, results = Queue(), Queue()
+    for url in urls:
+        pending.put(url)
+    count = pending.qsize()
+    throttle = HostThrottle(host_delay)
+
+    def work():
+        while True:
+            try:
+                url = pending.get_nowait()
+            except Empty:
+                return
+            throttle.wait(url)
+            try:
+                status, error = check_url(url, timeout)
+            except Exception as e:
+                status, error = None, _error(e)
+            results.put((url, status, error))
+
+    threads = [threading.Thread(target=work)
+               for i in range(min(workers, count))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for i in range(count):
+        yield results.get()
+    for thread in threads:
+        thread.join()
+
+
+class HostThrottle(object):
+    """
+    Spaces the requests to each host ``delay`` seconds apart.
+    """
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.next_request = {}
+
+    def wait(self, url):
+        host = urlparse.urlsplit(url).netloc.lower()
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_request.get(host, now))
+            self.next_request[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+
+def record_check(url, status, error):
+    """
+    Store the result of checking the url in its LinkCheck.
+    """
+    try:
+        check = LinkCheck.objects.get(url=url)
+    except LinkCheck.DoesNotExist:
+        check = LinkCheck(url=url)
+    check.status = status
+    check.error = error[:200]
+    check.failures = is_dead(status) and check.failures + 1 or 0
+    check.checked = timezone.now()
+    check.save()
+    return check
+
+
+def delete_dead_links(failures=FAILURES):
+    """
+    Set the status of the LinkItems whose url failed the last
+    ``failures`` checks to deleted. Returns the LinkItems deleted.
+    """
+    dead = LinkCheck.objects.filter(failures__gte=failures).\
+        values_list('url', flat=True)
+    links = list(LinkItem.objects.exclude(status=LinkItem.STATUS_DELETED).
+                 filter(url__in=dead))
+    for link in links:
+        # saved one by one so the pages showing them are updated
+        link.status = LinkItem.STATUS_DELETED
+        link.save()
+    return links
+
+
+def _interleave(urls):
+    # consecutive urls on different hosts don't wait for each other
+    by_host = {}
+    for url in sorted(urls):
+        by_host.setdefault(urlparse.urlsplit(url).netloc.lower(),
+                           []).append(url)
+    queues = [by_host[host] for host in sorted(by_host)]
+    interleaved = []
+    for i in range(max([len(queue) for queue in queues] or [0])):
+        interleaved.extend(queue[i] for queue in queues if i < len(queue))
+    return interleaved
+
+
+def _error(e):
+    reason = getattr(e, 'reason', None) or e
+    return (u'%s' % reason or e.__class__.__name__)[:200]
@@ -0,0 +1,57 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from periodicals.linkcheck import (FAILURES, HOST_DELAY, TIMEOUT, WORKERS,
+                                   check_links, delete_dead_links, is_dead,
+                                   link_urls, record_check)
+
+
+class Command(NoArgsCommand):
+    help = ("Check the urls of the links and of the Issues' and Articles' "
+            "buy and read online urls, recording the results.")
+    option_list = NoArgsCommand.option_list + (
+        make_option('--workers',
+                    type='int',
+                    default=WORKERS,
+                    help="Urls checked at the same time."),
+        make_option('--timeout',
+                    type='float',
+                    default=TIMEOUT,
+                    help="Seconds to wait for each response."),
+        make_option('--host-delay',
+                    type='float',
+                    default=HOST_DELAY,
+                    help="Seconds between requests to the same host."),
+        make_option('--delete-dead',
+                    action='store_true',
+                    default=False,
+                    help="Delete the links whose url failed the last "
+                         "--failures checks."),
+        make_option('--failures',
+                    type='int',
+                    default=FAILURES,
+                    help="Failed checks in a row before a link is "
+                         "deleted."),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        checked = dead = 0
+        for url, status, error in check_links(
+                link_urls(),
+                workers=options['workers'],
+                timeout=options['timeout'],
+                host_delay=options['host_delay']):
+            record_check(url, status, error)
+            checked += 1
+            if is_dead(status):
+                dead += 1
+                if verbosity > 1:
+                    self.stdout.write("%s %s" % (status or error, url))
+        if verbosity:
+            self.stdout.write("Checked %d urls, %d dead" % (checked, dead))
+        if options['delete_dead']:
+            links = delete_dead_links(options['failures'])
+            if verbosity:
+                self.stdout.write("Deleted %d dead links" % len(links))
@@ -0,0 +1,45 @@
+import os
+import sys
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from periodicals.exporter import CHUNK_SIZE, RENDERERS, iter_catalog
+
+
+class Command(BaseCommand):
+    help = ("Write every Article with its Issue, Periodical, Authors, tags "
+            "and active links as JSON lines or CSV.")
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+                    choices=sorted(RENDERERS),
+                    help="Format to write, by default from the output "
+                         "file's extension or jsonl."),
+        make_option('--output',
+                    help="File to write to instead of standard output."),
+        make_option('--chunk-size',
+                    type='int',
+                    default=CHUNK_SIZE,
+                    help="Articles read per query."),
+    )
+
+    def handle(self, *args, **options):
+        path = options['output']
+        format = options['format']
+        if not format and path:
+            format = os.path.splitext(path)[1][1:].lower()
+        format = format or 'jsonl'
+        if format not in RENDERERS:
+            raise CommandError("Unknown format, use --format=%s" %
+                               "|".join(sorted(RENDERERS)))
+        render = RENDERERS[format][0]
+        records = iter_catalog(chunk_size=options['chunk_size'])
+        if path:
+            with open(path, 'wb') as output:
+                for chunk in render(records):
+                    output.write(chunk)
+        else:
+            # self.stdout would end each chunk with a newline
+            output = options.get('stdout') or sys.stdout
+            for chunk in render(records):
+                output.write(chunk)
@@ -0,0 +1,40 @@
+from optparse import make_option
+
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand, CommandError
+
+from periodicals.sitemaps import sitemaps_at, write_sitemaps
+
+
+class Command(BaseCommand):
+    args = "<directory> <url>"
+    help = ("Write gzipped sitemaps and a sitemap.xml index to <directory> "
+            "which is served at <url>. Only sections with changes since "
+            "the last run are rewritten.")
+    option_list = BaseCommand.option_list + (
+        make_option('--root',
+                    default='/periodicals',
+                    help="URL the periodicals application is included at."),
+        make_option('--protocol',
+                    default='http',
+                    help="Protocol of the urls in the sitemaps."),
+        make_option('--force',
+                    action='store_true',
+                    default=False,
+                    help="Rewrite every section."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 2:
+            raise CommandError("Usage: generate_sitemaps %s" % self.args)
+        directory, url = args
+        written = write_sitemaps(sitemaps_at(options['root']),
+                                 directory,
+                                 url,
+                                 Site.objects.get_current(),
+                                 protocol=options['protocol'],
+                                 force=options['force'])
+        if int(options.get('verbosity', 1)):
+            self.stdout.write("Wrote %d sitemap sections%s" %
+                              (len(written),
+                               written and ": " + ", ".join(written) or ""))
@@ -0,0 +1,45 @@
+import os
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from periodicals.importer import (BATCH_SIZE, CatalogError, import_catalog,
+                                  read_records)
+
+FORMATS = ('csv', 'json', 'jsonl')
+
+
+class Command(BaseCommand):
+    args = "<file>"
+    help = ("Import Issues, Articles and Authors from a CSV, JSON or JSON "
+            "lines file with one record per Article.")
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+                    choices=FORMATS,
+                    help="Format of the file, by default from its "
+                         "extension."),
+        make_option('--batch-size',
+                    type='int',
+                    default=BATCH_SIZE,
+                    help="Articles written per transaction."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("Usage: import_catalog %s" % self.args)
+        path = args[0]
+        format = options['format'] or os.path.splitext(path)[1][1:].lower()
+        if format not in FORMATS:
+            raise CommandError("Unknown format, use --format=%s" %
+                               "|".join(FORMATS))
+        try:
+            with open(path, 'rb') as fileobj:
+                counts = import_catalog(read_records(fileobj, format),
+                                        batch_size=options['batch_size'])
+        except (IOError, CatalogError) as e:
+            raise CommandError(str(e))
+        if int(options.get('verbosity', 1)):
+            self.stdout.write("Imported %(articles)d articles, %(issues)d "
+                              "issues, %(authors)d authors and "
+                              "%(periodicals)d periodicals, skipped "
+                              "%(skipped)d existing articles" % counts)
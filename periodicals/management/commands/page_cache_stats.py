@@ -0,0 +1,25 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from periodicals.pagecache import page_cache_stats, reset_page_cache_stats
+
+
+class Command(NoArgsCommand):
+    help = "Show the number of page cache hits and misses."
+    option_list = NoArgsCommand.option_list + (
+        make_option('--reset',
+                    action='store_true',
+                    dest='reset',
+                    default=False,
+                    help='Reset the counts after showing them.'),
+    )
+
+    def handle_noargs(self, **options):
+        stats = page_cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = total and 100.0 * stats['hits'] / total or 0
+        self.stdout.write("hits: %d misses: %d hit ratio: %.1f%%" %
+                          (stats['hits'], stats['misses'], ratio))
+        if options['reset']:
+            reset_page_cache_stats()
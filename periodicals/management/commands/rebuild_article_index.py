@@ -0,0 +1,51 @@
+from optparse import make_option
+
+from django.core.management.base import CommandError, NoArgsCommand
+from haystack.constants import DEFAULT_ALIAS
+
+from periodicals.reindex import BATCH_SIZE, rebuild_index
+
+
+class Command(NoArgsCommand):
+    help = ("Rebuild the Articles' search index, rendering the documents "
+            "with a pool of processes.")
+    option_list = NoArgsCommand.option_list + (
+        make_option('--workers',
+                    type='int',
+                    default=None,
+                    help="Processes rendering documents, one per CPU by "
+                         "default. 1 renders them in this process."),
+        make_option('--batch-size',
+                    type='int',
+                    default=BATCH_SIZE,
+                    help="Range of Article ids rendered at a time."),
+        make_option('--using',
+                    default=DEFAULT_ALIAS,
+                    help="The Haystack connection to rebuild."),
+        make_option('--noinput',
+                    action='store_false',
+                    dest='interactive',
+                    default=True,
+                    help="Don't ask before rebuilding the index."),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        if options.get('interactive', True):
+            answer = raw_input("This indexes every Article in the '%s' "
+                               "search index again and removes the ones no "
+                               "longer indexed. Continue? [y/N] " %
+                               options['using'])
+            if answer.lower() not in ('y', 'yes'):
+                raise CommandError("Rebuild cancelled.")
+
+        def progress(done, total):
+            if verbosity:
+                self.stdout.write("Indexed %d of %d articles" % (done, total))
+
+        done = rebuild_index(workers=options['workers'],
+                             batch_size=options['batch_size'],
+                             using=options['using'],
+                             progress=progress)
+        if verbosity:
+            self.stdout.write("Indexed %d articles" % done)
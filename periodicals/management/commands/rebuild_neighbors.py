@@ -0,0 +1,20 @@
+from django.core.management.base import NoArgsCommand
+
+from periodicals.models import (Periodical, Issue,
+                                relink_issues, relink_articles)
+
+
+class Command(NoArgsCommand):
+    help = "Rebuild the previous/next links between Issues and Articles."
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        periodicals = Periodical.objects.values_list('pk', flat=True)
+        for periodical in periodicals:
+            relink_issues(periodical)
+        issues = Issue.objects.values_list('pk', flat=True)
+        for issue in issues:
+            relink_articles(issue)
+        if verbosity:
+            self.stdout.write("Relinked %d periodicals and %d issues" %
+                              (len(periodicals), len(issues)))
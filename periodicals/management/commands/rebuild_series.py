@@ -0,0 +1,15 @@
+from django.core.management.base import NoArgsCommand
+
+from periodicals.models import Periodical, refresh_series
+
+
+class Command(NoArgsCommand):
+    help = "Rebuild the Series of each Periodical from its Articles."
+
+    def handle_noargs(self, **options):
+        periodicals = Periodical.objects.all()
+        for periodical in periodicals:
+            refresh_series(periodical)
+        if int(options.get('verbosity', 1)):
+            self.stdout.write("Rebuilt the series of %d periodicals" %
+                              len(periodicals))
@@ -0,0 +1,12 @@
+from django.core.management.base import NoArgsCommand
+
+from periodicals.models import Article, refresh_url_paths
+
+
+class Command(NoArgsCommand):
+    help = "Rebuild the stored URL paths of Articles."
+
+    def handle_noargs(self, **options):
+        refreshed = refresh_url_paths(Article.objects.all())
+        if int(options.get('verbosity', 1)):
+            self.stdout.write("Rebuilt %d article URL paths" % refreshed)
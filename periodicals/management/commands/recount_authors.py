@@ -0,0 +1,12 @@
+from django.core.management.base import NoArgsCommand
+
+from periodicals.models import Author, recount_authors
+
+
+class Command(NoArgsCommand):
+    help = "Recount the stored number of Articles of each Author."
+
+    def handle_noargs(self, **options):
+        recounted = recount_authors(Author.objects.all())
+        if int(options.get('verbosity', 1)):
+            self.stdout.write("Recounted %d authors" % recounted)
@@ -0,0 +1,43 @@
+import logging
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.db import connections
+
+from periodicals.notifications import send_link_digest
+
+logger = logging.getLogger(__name__)
+
+
+class Command(NoArgsCommand):
+    help = ("Mail the managers a digest of the links submitted since the "
+            "last run.")
+    option_list = NoArgsCommand.option_list + (
+        make_option('--interval',
+                    type='int',
+                    default=0,
+                    help="Keep running, sending a digest every INTERVAL "
+                         "seconds."),
+    )
+
+    def handle_noargs(self, **options):
+        if not options['interval']:
+            self.send(options)
+            return
+        while True:
+            try:
+                self.send(options)
+            except Exception:
+                # the links stay queued for the next digest
+                logger.exception("Sending the link digest failed")
+            finally:
+                # not held, possibly broken, while sleeping
+                for connection in connections.all():
+                    connection.close()
+            time.sleep(options['interval'])
+
+    def send(self, options):
+        sent = send_link_digest()
+        if int(options.get('verbosity', 1)):
+            self.stdout.write("Sent %d link notifications" % sent)
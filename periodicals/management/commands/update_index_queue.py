@@ -0,0 +1,58 @@
+import logging
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.db import connections
+from haystack.constants import DEFAULT_ALIAS
+
+from periodicals.indexqueue import BATCH_SIZE, process_queue
+
+logger = logging.getLogger(__name__)
+
+
+class Command(NoArgsCommand):
+    help = ("Update the search index documents of the Articles queued by "
+            "QueuedSignalProcessor, in batches.")
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size',
+                    type='int',
+                    default=BATCH_SIZE,
+                    help="Articles updated with each index commit."),
+        make_option('--interval',
+                    type='int',
+                    default=0,
+                    help="Keep running, checking the queue every INTERVAL "
+                         "seconds once it's empty."),
+        make_option('--using',
+                    default=DEFAULT_ALIAS,
+                    help="The Haystack connection to update."),
+    )
+
+    def handle_noargs(self, **options):
+        if not options['interval']:
+            self.update(options)
+            return
+        while True:
+            try:
+                self.update(options)
+            except Exception:
+                # the Articles stay queued for the next run
+                logger.exception("Updating the search index failed")
+            finally:
+                # not held, possibly broken, while sleeping
+                for connection in connections.all():
+                    connection.close()
+            time.sleep(options['interval'])
+
+    def update(self, options):
+        updated = 0
+        while True:
+            processed = process_queue(options['batch_size'],
+                                      options['using'])
+            if not processed:
+                break
+            updated += processed
+        if int(options.get('verbosity', 1)) and (
+                updated or not options['interval']):
+            self.stdout.write("Updated %d articles" % updated)
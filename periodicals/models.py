@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
 import datetime
 import os
+import re
 from django.db import models
-from django.db.models import permalink
-from django.utils.translation import ugettext_lazy as _
+from django.db.models import permalink, Count, Max, Q
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils.translation import get_language, ugettext, ugettext_lazy as _
 from django.template.defaultfilters import slugify
 from django.conf import settings
+from django.core.urlresolvers import reverse, get_script_prefix, get_urlconf
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
-from django.forms.models import model_to_dict
 
 from autoslug.fields import AutoSlugField
 try:
@@ -38,12 +42,38 @@ settings.PERIODICALS_ISSUE_FORMAT = \
 settings.PERIODICALS_ISSUE_SLUG_FORMAT = \
     getattr(settings, "PERIODICALS_ISSUE_SLUG_FORMAT", "%(volume)s %(issue)s")
 
+# seconds data derived from the models is cached for
+settings.PERIODICALS_CACHE_TIMEOUT = \
+    getattr(settings, "PERIODICALS_CACHE_TIMEOUT", 60 * 60 * 24)
+
 
 class ActiveLinkManager(models.Manager):
     def get_query_set(self):
         return super(ActiveLinkManager, self).get_query_set().\
             filter(status=self.model.STATUS_ACTIVE)
 
+    def attach(self, instances):
+        """
+        Load the active links of all the Issue/Article instances with one
+        query and store them on each instance for its active_links().
+        """
+        instances_by_key = {}
+        for instance in instances:
+            content_type = ContentType.objects.get_for_model(instance)
+            instances_by_key[(content_type.pk, instance.pk)] = instance
+            instance._active_links = []
+        if not instances_by_key:
+            return
+        object_ids = {}
+        for content_type_id, object_id in instances_by_key:
+            object_ids.setdefault(content_type_id, []).append(object_id)
+        condition = Q()
+        for content_type_id, ids in object_ids.items():
+            condition |= Q(content_type=content_type_id, object_id__in=ids)
+        for link in self.get_query_set().filter(condition):
+            instance = instances_by_key[(link.content_type_id, link.object_id)]
+            instance._active_links.append(link)
+
 
 class LinkItem(models.Model):
     """
@@ -81,11 +111,64 @@ class LinkItem(models.Model):
 
     class Meta:
         ordering = ['title']
+        # active_links
+        index_together = [('content_type', 'object_id', 'status')]
 
     def __unicode__(self):
         return self.title
 
 
+class LinkCheck(models.Model):
+    """
+    The result of the last check of a url of a LinkItem, Issue or
+    Article, see the check_links command.
+    """
+    url = models.URLField(_("url"), unique=True)
+    # None when the request failed without a response
+    status = models.PositiveIntegerField(_("status"), null=True)
+    error = models.CharField(_("error"), max_length=200, blank=True)
+    # consecutive checks finding the url dead
+    failures = models.PositiveIntegerField(_("failures"), default=0)
+    checked = models.DateTimeField(_("checked"))
+
+    class Meta:
+        ordering = ('url',)
+
+    def __unicode__(self):
+        return self.url
+
+
+class LinkNotification(models.Model):
+    """
+    A submitted LinkItem the managers haven't been told about yet. Sent
+    in digests by the send_link_notifications command.
+    """
+    link = models.ForeignKey(LinkItem, related_name='+')
+    # of the Issue/Article the link was added to and its admin page
+    page_url = models.TextField()
+    admin_url = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('created', 'pk')
+
+
+class IndexUpdate(models.Model):
+    """
+    An Article whose search index document is out of date, queued by
+    ``periodicals.indexqueue.QueuedSignalProcessor`` and applied by the
+    update_index_queue command.
+    """
+    # not a ForeignKey so deleted Articles stay queued for removal
+    article_id = models.PositiveIntegerField(db_index=True)
+    queued = models.DateTimeField(auto_now_add=True)
+    # set when the Article isn't published yet, left in the queue until
+    due = models.DateTimeField(null=True, db_index=True)
+
+    class Meta:
+        ordering = ('pk',)
+
+
 class Author(models.Model):
     """
     The author of an Article.
@@ -120,6 +203,10 @@ class Author(models.Model):
     email = models.EmailField(_("email"), blank=True)
     slug = models.SlugField(_("slug"), max_length=200, unique=True)
     modified = models.DateTimeField(auto_now=True)
+    # maintained from Article.authors changes, see recount_authors()
+    article_count = models.PositiveIntegerField(_("article count"),
+                                                default=0,
+                                                editable=False)
 
     class Meta:
         verbose_name = _('author')
@@ -132,22 +219,29 @@ class Author(models.Model):
         ordering = ('last_name', 'first_name')
 
     def __unicode__(self):
-        return _(settings.PERIODICALS_AUTHOR_FORMAT) % _instanceFields(self)
+        return format_fields(settings.PERIODICALS_AUTHOR_FORMAT, self)
 
     @permalink
     def get_absolute_url(self):
         return ('periodicals_author_detail', (), {'author_slug': self.slug})
 
-    def save(self, force_insert=False, force_update=False):
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
         if not self.id and not self.slug:  # use the user's slug if supplied
             # don't transmogrify slug/URL on update
-            self.slug = slugify(_(settings.PERIODICALS_AUTHOR_SLUG_FORMAT)
-                                % _instanceFields(self))
-        super(Author, self).save(force_insert, force_update)
+            self.slug = slugify(format_fields(settings.PERIODICALS_AUTHOR_SLUG_FORMAT, self))
+        if not self._state.adding and not force_insert and update_fields is None:
+            # article_count is updated in place as Articles' authors change,
+            # writing back the value loaded would undo concurrent changes
+            update_fields = [field.name for field in self._meta.fields
+                             if not field.primary_key and
+                             field.name != 'article_count']
+        super(Author, self).save(force_insert, force_update, using,
+                                 update_fields)
 
     def display_name(self):
         if self.first_name or self.middle_name or self.postnomial:
-            return _(settings.PERIODICALS_AUTHOR_FORMAT) % _instanceFields(self)
+            return format_fields(settings.PERIODICALS_AUTHOR_FORMAT, self)
         else:
             return self.last_name  # no comma
 
@@ -174,13 +268,16 @@ class Periodical(models.Model):
     email = models.EmailField(_("email"), blank=True)
     phone = models.CharField(_("phone"), max_length=20, blank=True)
     slug = models.SlugField(_("slug"), max_length=200, unique=True)
+    # also updated when the Periodical's Issues, Articles, their Authors
+    # or active links change, see periodicals.conditional
+    modified = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = _('periodical')
         verbose_name_plural = _('periodicals')
 
     def __unicode__(self):
-        return _(settings.PERIODICALS_PERIODICAL_FORMAT) % _instanceFields(self)
+        return format_fields(settings.PERIODICALS_PERIODICAL_FORMAT, self)
 
     @permalink
     def get_absolute_url(self):
@@ -191,11 +288,11 @@ class Periodical(models.Model):
     def save(self, force_insert=False, force_update=False):
         # don't transmogrify slug/URL on update
         if not self.id and not self.slug:  # use the user's slug if supplied
-                self.slug = slugify(_(settings.PERIODICALS_PERIODICAL_SLUG_FORMAT) % _instanceFields(self))
+                self.slug = slugify(format_fields(settings.PERIODICALS_PERIODICAL_SLUG_FORMAT, self))
         super(Periodical, self).save(force_insert, force_update)
 
     def display_name(self):
-        return _(settings.PERIODICALS_PERIODICAL_FORMAT) % _instanceFields(self)
+        return format_fields(settings.PERIODICALS_PERIODICAL_FORMAT, self)
 
 
 class Issue(models.Model):
@@ -250,11 +347,28 @@ class Issue(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     modified = models.DateTimeField(auto_now=True)
     links = generic.GenericRelation(LinkItem)
+    # maintained by relink_issues
+    previous_issue = models.ForeignKey('self',
+                                       null=True,
+                                       editable=False,
+                                       related_name='+',
+                                       on_delete=models.SET_NULL)
+    next_issue = models.ForeignKey('self',
+                                   null=True,
+                                   editable=False,
+                                   related_name='+',
+                                   on_delete=models.SET_NULL)
 
     class Meta:
         verbose_name = _('issue')
         verbose_name_plural = _('issues')
         unique_together = ("periodical", "volume", "issue", "slug")
+        index_together = [
+            # archive pages and previous/next issue
+            ("periodical", "pub_date"),
+            # issue urls
+            ("periodical", "slug"),
+        ]
         ordering = ('-pub_date',)
 
     def __unicode__(self):
@@ -278,14 +392,25 @@ class Issue(models.Model):
                 self.slug = slugify(self.title)
             else:
                 # regular issues
-                self.slug = slugify(_(settings.PERIODICALS_ISSUE_SLUG_FORMAT) % _instanceFields(self))
+                self.slug = slugify(format_fields(settings.PERIODICALS_ISSUE_SLUG_FORMAT, self))
         super(Issue, self).save(force_insert, force_update)
 
     def display_name(self):
         if self.title:
             return self.title
         else:
-            return _(settings.PERIODICALS_ISSUE_FORMAT) % _instanceFields(self)
+            return format_fields(settings.PERIODICALS_ISSUE_FORMAT, self)
+
+    @classmethod
+    def display_fields(cls):
+        """
+        Names of the fields display_name() and display_year() read, for
+        loading Issues with ``only()``.
+        """
+        fields = set(field.name for field in cls._meta.fields)
+        names = _compiled_format(settings.PERIODICALS_ISSUE_FORMAT).names
+        return ['title', 'pub_date'] + [name for name in names
+                                        if name in fields]
 
     def display_date(self):
         return self.display_year() + " - " + self.display_month()
@@ -297,8 +422,7 @@ class Issue(models.Model):
         return self.pub_date.strftime("%b")
 
     def active_links(self):
-        return [link for link in self.links.all()
-                if link.status == LinkItem.STATUS_ACTIVE]
+        return _active_links(self)
 
 
 class Article(models.Model):
@@ -346,30 +470,403 @@ class Article(models.Model):
                          help_text=_("Automatically generated when saved"),
                          blank=True)
     links = generic.GenericRelation(LinkItem)
+    # "<periodical slug>/<issue slug>/<slug>/" maintained on save
+    url_path = models.TextField(editable=False, blank=True)
+    # maintained by relink_articles
+    previous_article = models.ForeignKey('self',
+                                         null=True,
+                                         editable=False,
+                                         related_name='+',
+                                         on_delete=models.SET_NULL)
+    next_article = models.ForeignKey('self',
+                                     null=True,
+                                     editable=False,
+                                     related_name='+',
+                                     on_delete=models.SET_NULL)
 
     class Meta:
         verbose_name = _('article')
         verbose_name_plural = _('articles')
         ordering = ['issue', 'page', ]
+        index_together = [
+            # articles of an issue and previous/next article
+            ('issue', 'page'),
+            # series pages, joined to issue for the periodical
+            ('series', 'issue'),
+        ]
 
     def __unicode__(self):
         # may only have a series name and not a title
         title = self.title
         return unicode(self.issue) + (title and ' - ' + title or '')
 
-    @permalink
     def get_absolute_url(self):
-        return ('periodicals_article_detail', (),
-                {'periodical_slug': self.issue.periodical.slug,
-                 'issue_slug': self.issue.slug,
-                 'article_slug': self.slug})
+        # called for every article in listings, search results and
+        # sitemaps so avoid reverse() and loading the issue/periodical
+        return _url_root() + (self.url_path or self.build_url_path())
+
+    def build_url_path(self):
+        return "%s/%s/%s/" % (self.issue.periodical.slug,
+                              self.issue.slug,
+                              self.slug)
+
+    def save(self, *args, **kwargs):
+        super(Article, self).save(*args, **kwargs)
+        # the slug is only known once AutoSlugField has populated it
+        url_path = self.build_url_path()
+        if url_path != self.url_path:
+            Article.objects.filter(pk=self.pk).update(url_path=url_path)
+            self.url_path = url_path
 
     def active_links(self):
-        return [link for link in self.links.all()
-                if link.status == LinkItem.STATUS_ACTIVE]
+        return _active_links(self)
+
+
+class Series(models.Model):
+    """
+    A series/category of Articles in a Periodical. Maintained from the
+    ``series`` of the Periodical's Articles, see refresh_series().
+    """
+    periodical = models.ForeignKey('Periodical', related_name='series')
+    name = models.CharField(_("name"), max_length=100)
+    slug = models.SlugField(_("slug"), max_length=200)
+    article_count = models.PositiveIntegerField(_("article count"),
+                                                default=0)
+    latest_pub_date = models.DateField(_("latest publication date"),
+                                       null=True)
+
+    class Meta:
+        verbose_name = _('series')
+        verbose_name_plural = _('series')
+        unique_together = (("periodical", "name"),
+                           ("periodical", "slug"))
+        ordering = ('name',)
+
+    def __unicode__(self):
+        return self.name
+
+    @permalink
+    def get_absolute_url(self):
+        return ('periodicals_series_detail', (),
+                {'periodical_slug': self.periodical.slug,
+                 'series_slug': self.slug})
 
 
 # utilities
-def _instanceFields(instance):
-    return model_to_dict(instance,
-                         fields=[field.name for field in instance._meta.fields])
+class _CompiledFormat(object):
+    """
+    A ``%(field)s`` format from settings which only reads the fields it
+    uses and translates the format once per language.
+    """
+    def __init__(self, format):
+        self.format = format
+        self.names = tuple(sorted(set(re.findall(r'%\((\w+)\)', format))))
+        self.translated = {}
+        self.attnames = {}
+
+    def __call__(self, instance):
+        language = get_language()
+        format = self.translated.get(language)
+        if format is None:
+            format = self.translated[language] = ugettext(self.format)
+        model = type(instance)
+        attnames = self.attnames.get(model)
+        if attnames is None:
+            # the field values model_to_dict() gave, i.e. ids of relations
+            fields = dict((field.name, field.attname)
+                          for field in model._meta.fields)
+            attnames = self.attnames[model] = \
+                [(name, fields[name]) for name in self.names if name in fields]
+        return format % dict((name, getattr(instance, attname))
+                             for name, attname in attnames)
+
+
+_formats = {}
+
+
+def _compiled_format(format):
+    try:
+        return _formats[format]
+    except KeyError:
+        compiled = _formats[format] = _CompiledFormat(format)
+        return compiled
+
+
+def format_fields(format, instance):
+    """
+    The instance's fields formatted with the translated ``format``.
+    """
+    return _compiled_format(format)(instance)
+
+
+def _active_links(instance):
+    # attached by LinkItem.active.attach() or loaded once per instance
+    if not hasattr(instance, '_active_links'):
+        prefetched = getattr(instance, '_prefetched_objects_cache', {})
+        if 'links' in prefetched:
+            links = [link for link in prefetched['links']
+                     if link.status == LinkItem.STATUS_ACTIVE]
+        else:
+            links = list(instance.links.filter(
+                status=LinkItem.STATUS_ACTIVE))
+        instance._active_links = links
+    return instance._active_links
+
+
+_url_roots = {}
+
+
+def _url_root():
+    """
+    The URL the periodicals urls are included at, e.g. '/periodicals/'.
+    Resolved once per URLconf and script prefix.
+    """
+    key = (get_script_prefix(), get_urlconf() or settings.ROOT_URLCONF)
+    if key not in _url_roots:
+        _url_roots[key] = reverse('periodicals_list')
+    return _url_roots[key]
+
+
+def refresh_url_paths(articles):
+    """
+    Rewrite the stored url_path of each Article in the queryset that
+    no longer matches its periodical, issue and article slugs.
+    """
+    refreshed = 0
+    for article in articles.select_related('issue__periodical').\
+            only('slug', 'url_path', 'issue__slug',
+                 'issue__periodical__slug').iterator():
+        url_path = article.build_url_path()
+        if url_path != article.url_path:
+            Article.objects.filter(pk=article.pk).update(url_path=url_path)
+            refreshed += 1
+    return refreshed
+
+
+def relink_issues(periodical):
+    """
+    Update the previous/next Issue of every Issue in the periodical
+    ordered by publication date.
+    """
+    _relink(Issue.objects.filter(periodical=periodical),
+            'pub_date', 'previous_issue', 'next_issue')
+
+
+def relink_articles(issue):
+    """
+    Update the previous/next Article of every Article in the issue
+    ordered by page. Articles without a page number have no neighbors.
+    """
+    _relink(Article.objects.filter(issue=issue),
+            'page', 'previous_article', 'next_article')
+
+
+def recount_authors(authors):
+    """
+    Update the stored article_count of each Author in the queryset
+    that no longer matches its number of Articles.
+    """
+    counts = dict(Article.authors.through.objects.
+                  filter(author__in=authors).values_list('author').
+                  annotate(Count('article')).order_by())
+    recounted = 0
+    for pk, article_count in authors.values_list('pk', 'article_count').\
+            iterator():
+        if counts.get(pk, 0) != article_count:
+            Author.objects.filter(pk=pk).update(
+                article_count=counts.get(pk, 0))
+            recounted += 1
+    return recounted
+
+
+def refresh_series(periodical, names=None):
+    """
+    Update the Series of the periodical with the given names, or all of
+    them, from the series of its Articles. Series without Articles are
+    deleted.
+    """
+    articles = Article.objects.filter(issue__periodical=periodical).\
+        exclude(series='')
+    series = Series.objects.filter(periodical=periodical)
+    if names is not None:
+        names = [name for name in set(names) if name]
+        if not names:
+            return
+        articles = articles.filter(series__in=names)
+        series = series.filter(name__in=names)
+    found = dict((row['series'], row) for row in
+                 articles.order_by().values('series').
+                 annotate(article_count=Count('pk'),
+                          latest_pub_date=Max('issue__pub_date')))
+    existing = dict((s.name, s) for s in series)
+    for name, s in existing.items():
+        if name not in found:
+            s.delete()
+        elif (s.article_count, s.latest_pub_date) != \
+                (found[name]['article_count'],
+                 found[name]['latest_pub_date']):
+            Series.objects.filter(pk=s.pk).update(
+                article_count=found[name]['article_count'],
+                latest_pub_date=found[name]['latest_pub_date'])
+    new_names = [name for name in found if name not in existing]
+    if new_names:
+        slugs = set(Series.objects.filter(periodical=periodical).
+                    values_list('slug', flat=True))
+        for name in sorted(new_names):
+            slug = base = slugify(name) or 'series'
+            n = 1
+            while slug in slugs:
+                n += 1
+                slug = '%s-%d' % (base, n)
+            slugs.add(slug)
+            Series.objects.create(
+                periodical_id=getattr(periodical, 'pk', periodical),
+                name=name,
+                slug=slug,
+                article_count=found[name]['article_count'],
+                latest_pub_date=found[name]['latest_pub_date'])
+
+
+def _relink(queryset, key, previous_field, next_field):
+    rows = list(queryset.order_by(key, 'pk').
+                values_list('pk', key, previous_field, next_field))
+    # neighbors are the nearest rows with a strictly smaller/larger key
+    first, last, values = {}, {}, []
+    for pk, value, previous_pk, next_pk in rows:
+        if value is None:
+            continue
+        first.setdefault(value, pk)
+        last[value] = pk
+        if not values or values[-1] != value:
+            values.append(value)
+    position = dict((value, i) for i, value in enumerate(values))
+    for pk, value, previous_pk, next_pk in rows:
+        new_previous = new_next = None
+        if value:
+            i = position[value]
+            if i > 0:
+                new_previous = last[values[i - 1]]
+            if i < len(values) - 1:
+                new_next = first[values[i + 1]]
+        if (previous_pk, next_pk) != (new_previous, new_next):
+            queryset.model.objects.filter(pk=pk).update(
+                **{previous_field: new_previous, next_field: new_next})
+
+
+@receiver([post_save, post_delete], sender=Issue)
+def _issue_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # also relink the periodical an issue was moved away from
+    moved_from = Issue.objects.filter(Q(previous_issue=instance.pk) |
+                                      Q(next_issue=instance.pk)).\
+        exclude(periodical=instance.periodical_id).\
+        values_list('periodical', flat=True)
+    for periodical in set(moved_from) | set([instance.periodical_id]):
+        relink_issues(periodical)
+
+
+@receiver([post_save, post_delete], sender=Article)
+def _article_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    moved_from = Article.objects.filter(Q(previous_article=instance.pk) |
+                                        Q(next_article=instance.pk)).\
+        exclude(issue=instance.issue_id).\
+        values_list('issue', flat=True)
+    for issue in set(moved_from) | set([instance.issue_id]):
+        relink_articles(issue)
+
+
+@receiver(post_save, sender=Issue)
+def _issue_url_changed(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+    prefix = "%s/%s/" % (instance.periodical.slug, instance.slug)
+    refresh_url_paths(Article.objects.filter(issue=instance).
+                      exclude(url_path__startswith=prefix))
+
+
+@receiver(post_save, sender=Periodical)
+def _periodical_url_changed(sender, instance, created=False, raw=False,
+                            **kwargs):
+    if created or raw:
+        return
+    refresh_url_paths(Article.objects.filter(issue__periodical=instance).
+                      exclude(url_path__startswith=instance.slug + '/'))
+
+
+@receiver(m2m_changed, sender=Article.authors.through)
+def _authors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            recount_authors(Author.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        instance._cleared_authors = list(
+            instance.authors.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if action == 'post_clear':
+            pk_set = instance.__dict__.pop('_cleared_authors', [])
+        recount_authors(Author.objects.filter(pk__in=pk_set))
+
+
+@receiver(pre_delete, sender=Article)
+def _remember_authors(sender, instance, **kwargs):
+    # the authorship rows are deleted without sending m2m_changed
+    instance._deleted_authors = list(
+        instance.authors.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Article)
+def _article_deleted(sender, instance, **kwargs):
+    authors = instance.__dict__.pop('_deleted_authors', [])
+    if authors:
+        recount_authors(Author.objects.filter(pk__in=authors))
+
+
+@receiver(pre_save, sender=Article)
+def _remember_series(sender, instance, raw=False, **kwargs):
+    instance._saved_series = None
+    if instance.pk and not raw:
+        instance._saved_series = list(
+            Article.objects.filter(pk=instance.pk).
+            values_list('issue__periodical', 'series'))
+
+
+@receiver([post_save, post_delete], sender=Article)
+def _article_series_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    changed = set(instance.__dict__.pop('_saved_series', None) or [])
+    for periodical in Issue.objects.filter(pk=instance.issue_id).\
+            values_list('periodical', flat=True):
+        changed.add((periodical, instance.series))
+    for periodical, name in changed:
+        refresh_series(periodical, [name])
+
+
+@receiver(pre_save, sender=Issue)
+def _remember_issue_periodical(sender, instance, raw=False, **kwargs):
+    instance._saved_periodical = None
+    if instance.pk and not raw:
+        for periodical in Issue.objects.filter(pk=instance.pk).\
+                values_list('periodical', flat=True):
+            instance._saved_periodical = periodical
+
+
+@receiver(post_save, sender=Issue)
+def _issue_series_changed(sender, instance, created=False, raw=False,
+                          **kwargs):
+    # publication dates and periodicals of the series' Articles
+    if created or raw:
+        return
+    names = list(instance.articles.values_list('series', flat=True))
+    periodicals = set([instance.periodical_id,
+                       instance.__dict__.pop('_saved_periodical', None)])
+    for periodical in periodicals - set([None]):
+        refresh_series(periodical, names)
+
+
+# connect the signal handlers maintaining the app's caches
+from . import (conditional, counters, fragments, pagecache,  # noqa
+               searchcache, tagcloud)
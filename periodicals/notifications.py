@@ -0,0 +1,51 @@
+"""
+Manager notifications of the links visitors submit.
+
+Instead of mailing the managers while the visitor waits, each submitted
+link is recorded as a LinkNotification and the send_link_notifications
+command mails everything recorded since its last run as one digest.
+"""
+from django.contrib.sites.models import Site
+from django.core.mail import mail_managers
+
+from .models import LinkNotification
+
+
+def notify_link_added(link, instance, admin_url=""):
+    """
+    Queue the notification of ``link`` added to the Issue or Article
+    ``instance`` for the next digest.
+    """
+    LinkNotification.objects.create(link=link,
+                                    page_url=instance.get_absolute_url(),
+                                    admin_url=admin_url)
+
+
+def send_link_digest():
+    """
+    Mail the managers one message listing the queued links and remove
+    them from the queue. Returns the number of links listed.
+    """
+    notifications = list(LinkNotification.objects.select_related('link'))
+    if not notifications:
+        return 0
+    domain = Site.objects.get_current().domain
+    entries = []
+    for notification in notifications:
+        entry = "%s\n%s\nLink added to: http://%s%s" % (
+            notification.link.title,
+            notification.link.url,
+            domain,
+            notification.page_url)
+        if notification.admin_url:
+            entry += " admin: http://%s%s" % (domain, notification.admin_url)
+        entries.append(entry)
+    if len(notifications) == 1:
+        subject = "New Link Added"
+    else:
+        subject = "%d New Links Added" % len(notifications)
+    # queued again by the next run if sending fails
+    mail_managers(subject, "\n\n".join(entries))
+    LinkNotification.objects.filter(
+        pk__in=[notification.pk for notification in notifications]).delete()
+    return len(notifications)
@@ -0,0 +1,212 @@
+"""
+Cache of whole rendered pages for anonymous visitors.
+
+Each cached page is stored under a key including the version of the
+Periodical or Author it shows. The versions are replaced whenever
+``periodicals.signals.pages_changed`` reports content of a Periodical or
+Author changed, so all of their pages (issues, years, neighbors, series,
+articles, links) are rendered again on the next request. Every key also
+includes the version of the article count shown on all pages, see
+periodicals.counters. Hits and misses are counted for monitoring, see
+page_cache_stats().
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.http import parse_etags, parse_http_date_safe
+from django.utils.translation import get_language
+
+from .counters import CHANGED_KEY
+from .models import Author, Periodical
+from .signals import pages_changed
+from .versions import bump, get_versions
+
+# seconds pages are cached for, 0 disables the page cache
+settings.PERIODICALS_PAGE_CACHE_TIMEOUT = \
+    getattr(settings, "PERIODICALS_PAGE_CACHE_TIMEOUT", 0)
+
+KEY_PREFIX = 'periodicals:page'
+HITS_KEY = 'periodicals:page_hits'
+MISSES_KEY = 'periodicals:page_misses'
+CSRF_PLACEHOLDER = '__periodicals_csrf_token__'
+
+
+def periodical_pages(request, periodical_slug, **kwargs):
+    return ['periodical:%s' % periodical_slug]
+
+
+def author_pages(request, author_slug, **kwargs):
+    return ['author:%s' % author_slug]
+
+
+def cached_page(tags_func):
+    """
+    View decorator caching the responses of anonymous GET requests.
+    ``tags_func`` is called with the view's arguments and returns the
+    names of the versions the page depends on.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+            key = _page_key(request, tags_func(request, *args, **kwargs))
+            cached = cache.get(key)
+            if cached is not None:
+                _count(HITS_KEY)
+                return _restore(request, cached)
+            _count(MISSES_KEY)
+            response = view(request, *args, **kwargs)
+            store = lambda response: _store(key, request, response)
+            if hasattr(response, 'add_post_render_callback'):
+                # TemplateResponse, rendered by the handler
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+        return wrapped
+    return decorator
+
+
+def page_cache_stats():
+    """
+    Dictionary with the number of page cache ``hits`` and ``misses``.
+    """
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': counts.get(HITS_KEY, 0),
+            'misses': counts.get(MISSES_KEY, 0)}
+
+
+def reset_page_cache_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def invalidate_pages(tags):
+    """
+    Discard the cached pages depending on any of the tags.
+    """
+    bump([_version_key(tag) for tag in tags])
+
+
+def _cacheable(request):
+    if not settings.PERIODICALS_PAGE_CACHE_TIMEOUT:
+        return False
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    user = getattr(request, 'user', None)
+    return user is None or not user.is_authenticated()
+
+
+def _version_key(tag):
+    return 'periodicals:page_version:%s' % \
+        hashlib.md5(tag.encode('utf-8')).hexdigest()
+
+
+def _page_key(request, tags):
+    # every page shows the article count, see base_periodicals.html
+    version_keys = [_version_key(tag) for tag in tags] + [CHANGED_KEY]
+    versions = get_versions(version_keys)
+    page = hashlib.md5(('%s %s' % (request.get_full_path(),
+                                   get_language())).encode('utf-8'))
+    return '%s:%s:%s' % (KEY_PREFIX, page.hexdigest(), '.'.join(
+        str(versions[version_key]) for version_key in version_keys))
+
+
+def _store(key, request, response):
+    if response.status_code != 200 or response.streaming or \
+            response.cookies:
+        return
+    content = response.content
+    token = request.META.get('CSRF_COOKIE')
+    csrf = bool(request.META.get('CSRF_COOKIE_USED') and token)
+    if csrf:
+        # the page has a form, substitute each visitor's own token
+        content = content.replace(token.encode(), CSRF_PLACEHOLDER.encode())
+    cache.set(key,
+              {'content': content,
+               'status': response.status_code,
+               'headers': list(response.items()),
+               'csrf': csrf},
+              settings.PERIODICALS_PAGE_CACHE_TIMEOUT)
+
+
+def _restore(request, cached):
+    headers = dict((header.lower(), value)
+                   for header, value in cached['headers'])
+    etag = headers.get('etag')
+    last_modified = headers.get('last-modified')
+    if _not_modified(request, etag, last_modified):
+        response = HttpResponse(status=304)
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = last_modified
+        return response
+    content = cached['content']
+    if cached['csrf']:
+        content = content.replace(CSRF_PLACEHOLDER.encode(),
+                                  get_token(request).encode())
+    response = HttpResponse(content, status=cached['status'])
+    for header, value in cached['headers']:
+        response[header] = value
+    return response
+
+
+def _not_modified(request, etag, last_modified):
+    # the conditional GET of django.views.decorators.http.condition,
+    # cached pages skip the view and the decorator with it
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if_modified_since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE') or '')
+    if not (if_none_match or if_modified_since):
+        return False
+    if if_none_match:
+        try:
+            if not (etag and etag.strip('"') in parse_etags(if_none_match)):
+                return False
+        except ValueError:
+            return False
+    if if_modified_since:
+        modified = last_modified and parse_http_date_safe(last_modified)
+        if not (modified and modified <= if_modified_since):
+            return False
+    return True
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, settings.PERIODICALS_CACHE_TIMEOUT):
+            cache.incr(key)
+
+
+@receiver(pages_changed)
+def _pages_changed(sender, slugs, **kwargs):
+    name = sender is Author and 'author' or 'periodical'
+    invalidate_pages(['%s:%s' % (name, slug) for slug in slugs])
+
+
+@receiver(pre_save, sender=Periodical)
+@receiver(pre_save, sender=Author)
+@receiver(pre_delete, sender=Periodical)
+@receiver(pre_delete, sender=Author)
+def _slug_changing(sender, instance, raw=False, **kwargs):
+    # pages at the previous slug's urls are no longer valid
+    if instance.pk and not raw:
+        slugs = sender.objects.filter(pk=instance.pk).\
+            values_list('slug', flat=True)
+        _pages_changed(sender, list(slugs))
+
+
+@receiver(post_save, sender=Periodical)
+@receiver(post_save, sender=Author)
+def _slug_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _pages_changed(sender, [instance.slug])
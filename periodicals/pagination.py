@@ -0,0 +1,179 @@
+"""
+Keyset (cursor) pagination for the list views.
+
+Instead of an OFFSET and a COUNT(*) each page is selected with a WHERE
+clause on the ordering columns of the last row of the previous page, so
+deep pages cost the same as the first one. Page numbers are replaced by
+opaque cursors in the ``page`` parameter and the total number of pages
+is not known.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+
+settings.PERIODICALS_KEYSET_PAGINATION = \
+    getattr(settings, 'PERIODICALS_KEYSET_PAGINATION', False)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, values):
+    data = json.dumps([direction, values], cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(data.encode('utf-8')).\
+        decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        cursor = str(cursor)
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(data.decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor(cursor)
+    if direction not in ('n', 'p') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+class KeysetPaginator(object):
+    """
+    Pages through ``object_list`` ordered by ``ordering``, which must
+    end with a unique field such as the primary key.
+    """
+    def __init__(self, object_list, per_page, ordering):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        # unknown without counting, shown by templates when available
+        self.num_pages = None
+        self.count = None
+
+    def page(self, cursor=None):
+        """
+        The page following (or preceding) the row the cursor was made
+        from, the first page when there is no cursor.
+        """
+        direction, values = 'n', None
+        if cursor:
+            direction, values = decode_cursor(cursor)
+            if len(values) != len(self.ordering):
+                raise InvalidCursor(cursor)
+        ordering = self.ordering
+        if direction == 'p':
+            ordering = tuple(_reverse(field) for field in ordering)
+        object_list = self.object_list.order_by(*ordering)
+        if values is not None:
+            object_list = object_list.filter(_after(ordering, values))
+        rows = list(object_list[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'p':
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=more)
+        return KeysetPage(rows, self, has_next=more,
+                          has_previous=values is not None)
+
+    def key(self, row):
+        return [_value(row, field.lstrip('-')) for field in self.ordering]
+
+
+class KeysetPage(object):
+    """
+    Page of a KeysetPaginator. ``previous_page_number()`` and
+    ``next_page_number()`` return cursors so templates written for
+    Django's Page can link to them unchanged.
+    """
+    number = None
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+
+    def __repr__(self):
+        return '<Keyset page of %d>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_page_number(self):
+        return encode_cursor('n', self.paginator.key(self.object_list[-1]))
+
+    def previous_page_number(self):
+        return encode_cursor('p', self.paginator.key(self.object_list[0]))
+
+
+class KeysetPaginationMixin(object):
+    """
+    ListView mixin paginating by keyset when
+    ``settings.PERIODICALS_KEYSET_PAGINATION`` is enabled, ordered by
+    ``keyset_ordering``.
+    """
+    keyset_ordering = None
+
+    def paginate_queryset(self, queryset, page_size):
+        if not (settings.PERIODICALS_KEYSET_PAGINATION and
+                self.keyset_ordering):
+            return super(KeysetPaginationMixin, self).\
+                paginate_queryset(queryset, page_size)
+        page_kwarg = getattr(self, 'page_kwarg', 'page')
+        cursor = self.kwargs.get(page_kwarg) or \
+            self.request.GET.get(page_kwarg)
+        if cursor in ('1', 'first'):
+            # links to the first page of numbered pagination
+            cursor = None
+        paginator = KeysetPaginator(queryset, page_size,
+                                    self.keyset_ordering)
+        try:
+            page = paginator.page(cursor)
+        except InvalidCursor:
+            raise Http404("Invalid page.")
+        if not page.object_list and cursor is not None:
+            raise Http404("Empty page.")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+
+def _reverse(field):
+    if field.startswith('-'):
+        return field[1:]
+    return '-' + field
+
+
+def _after(ordering, values):
+    # (a, b, c) > (x, y, z) as a > x OR (a = x AND b > y) OR ...
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = field.startswith('-') and '__lt' or '__gt'
+        term = Q(**{name + lookup: values[i]})
+        for previous, value in zip(ordering[:i], values):
+            term &= Q(**{previous.lstrip('-'): value})
+        condition |= term
+    return condition
+
+
+def _value(row, name):
+    if isinstance(row, dict):
+        return row[name]
+    for attr in name.split('__'):
+        row = getattr(row, attr)
+    return row
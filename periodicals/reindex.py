@@ -0,0 +1,133 @@
+"""
+Rebuilding the Articles' search index with a pool of processes.
+
+The Articles are split into ranges of ids. Worker processes load and
+render the documents of each range, the expensive part, while the
+calling process writes them to the backend as they arrive, so only one
+process writes to the index. Haystack's own ``update_index --workers``
+has every process write, which backends like Whoosh that lock the
+index don't support.
+
+The documents are replaced in place and those of Articles no longer
+indexed are removed afterwards with a single commit, so searches keep
+working while the index is rebuilt.
+"""
+import multiprocessing
+
+from django.db import connections as db_connections
+from django.db.models import Max, Min
+from haystack.constants import DEFAULT_ALIAS
+
+from .indexqueue import remove_articles
+from .models import Article
+from .signals import search_index_changed
+
+BATCH_SIZE = 1000
+
+
+class _PreparedIndex(object):
+    """
+    Stands in for the ArticleIndex when handing documents prepared by
+    the workers to ``backend.update``.
+    """
+    def __init__(self, index):
+        self.index = index
+
+    def full_prepare(self, document):
+        return document
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+
+def article_index(using=DEFAULT_ALIAS):
+    # imported here as haystack loads the indexes while setting up
+    from haystack import connections
+    return connections[using].get_unified_index().get_index(Article)
+
+
+def id_ranges(queryset, size=BATCH_SIZE):
+    """
+    ``(start, end)`` ranges of ``size`` ids covering the queryset.
+    """
+    bounds = queryset.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return []
+    return [(start, start + size)
+            for start in range(bounds['first'], bounds['last'] + 1, size)]
+
+
+def prepare_range(bits):
+    """
+    The documents of the indexed Articles with ids in ``[start, end)``.
+    """
+    start, end, using = bits
+    index = article_index(using)
+    return [index.full_prepare(article) for article in
+            index.index_queryset(using=using).filter(pk__gte=start,
+                                                     pk__lt=end)]
+
+
+def rebuild_index(workers=None, batch_size=BATCH_SIZE, using=DEFAULT_ALIAS,
+                  progress=None):
+    """
+    Replace the Articles' documents with ``workers`` processes rendering
+    them, one per CPU by default, or in this process when ``workers`` is
+    1. ``progress`` is called with the number of documents written and
+    the total after each range. Returns the number of documents.
+    """
+    from haystack import connections
+
+    index = article_index(using)
+    backend = connections[using].get_backend()
+    queryset = index.index_queryset(using=using)
+    total = queryset.count()
+    ranges = [(start, end, using)
+              for start, end in id_ranges(queryset, batch_size)]
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers > 1:
+        # the workers open their own connections rather than sharing
+        # the one inherited from this process
+        for connection in db_connections.all():
+            connection.close()
+        pool = multiprocessing.Pool(workers)
+        batches = pool.imap_unordered(prepare_range, ranges)
+    else:
+        pool = None
+        batches = (prepare_range(bits) for bits in ranges)
+    prepared, indexed = _PreparedIndex(index), set()
+    try:
+        for documents in batches:
+            if documents:
+                backend.update(prepared, documents)
+            indexed.update(document['django_id'] for document in documents)
+            if progress is not None:
+                progress(len(indexed), total)
+        remove_articles(stale_ids(indexed, batch_size, using), using)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        search_index_changed.send(sender=Article, using=using)
+    return len(indexed)
+
+
+def stale_ids(indexed, batch_size=BATCH_SIZE, using=DEFAULT_ALIAS):
+    """
+    Ids of the Articles in the index that aren't in the set of
+    ``indexed`` ids, read ``batch_size`` results at a time.
+    """
+    from haystack.query import SearchQuerySet
+
+    stale, start = [], 0
+    while True:
+        # a new query each time so results read aren't kept, in slices
+        # of the same size as backends like Whoosh page results
+        page = list(SearchQuerySet(using=using).models(Article)
+                    [start:start + batch_size])
+        stale.extend(result.pk for result in page
+                     if result.pk not in indexed)
+        if len(page) < batch_size:
+            return stale
+        start += batch_size
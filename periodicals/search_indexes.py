@@ -1,4 +1,4 @@
-import datetime
+from django.utils import timezone
 from haystack import indexes
 from periodicals.models import Article
 
@@ -15,4 +15,8 @@ class ArticleIndex(indexes.SearchIndex, indexes.Indexable):
         return Article
 
     def index_queryset(self, using=None):
-        return self.get_model().objects.filter(issue__pub_date__lte=datetime.datetime.now())
+        # everything the templates show, so each batch takes two queries
+        return self.get_model().objects.\
+            filter(issue__pub_date__lte=timezone.now()).\
+            select_related('issue__periodical').\
+            prefetch_related('authors')
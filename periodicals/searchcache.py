@@ -0,0 +1,123 @@
+"""
+Search results cached per query.
+
+The ids of the Articles found, in order, and the number found are cached
+under the normalized query, so repeating a search or paging through its
+results doesn't query the search backend and each page's Articles are
+loaded with one query. ``periodicals.signals.search_index_changed``,
+sent when the queued or rebuilt documents are written, and saving or
+deleting an Article, which Haystack's signal processors may index
+straight away, discard the cached results. Otherwise they expire after
+``PERIODICALS_SEARCH_CACHE_TIMEOUT`` seconds.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Article
+from .signals import search_index_changed
+from .versions import bump, get_versions
+
+settings.PERIODICALS_SEARCH_CACHE_TIMEOUT = \
+    getattr(settings, "PERIODICALS_SEARCH_CACHE_TIMEOUT", 60 * 15)
+# the ids of this many results are cached, later pages are searched for
+settings.PERIODICALS_SEARCH_CACHE_HITS = \
+    getattr(settings, "PERIODICALS_SEARCH_CACHE_HITS", 200)
+
+KEY_PREFIX = 'periodicals:search'
+VERSION_KEY = 'periodicals:search_version'
+
+
+def normalize_query(query):
+    """
+    The query with case and spacing that don't change its results
+    removed.
+    """
+    return u' '.join(query.lower().split())
+
+
+def search_key(query, models=()):
+    versions = get_versions([VERSION_KEY],
+                            settings.PERIODICALS_SEARCH_CACHE_TIMEOUT)
+    version = versions[VERSION_KEY]
+    key = u'%s|%s' % (normalize_query(query), u','.join(sorted(models)))
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+    return '%s:%s:%s' % (KEY_PREFIX, version, digest)
+
+
+def cached_hits(key, searchqueryset):
+    """
+    The cached ``(ids, count)`` of the search, running it when they
+    aren't cached.
+    """
+    hits = cache.get(key)
+    if hits is None:
+        results = searchqueryset[:settings.PERIODICALS_SEARCH_CACHE_HITS]
+        hits = ([int(result.pk) for result in results],
+                searchqueryset.count())
+        cache.set(key, hits, settings.PERIODICALS_SEARCH_CACHE_TIMEOUT)
+    return hits
+
+
+def invalidate_search_results():
+    """
+    Discard the cached results, e.g. after running Haystack's
+    update_index.
+    """
+    bump([VERSION_KEY], settings.PERIODICALS_SEARCH_CACHE_TIMEOUT)
+
+
+class SearchHit(object):
+    """
+    An Article found, with the ``pk`` and ``object`` of a SearchResult.
+    """
+    def __init__(self, article):
+        self.pk = article.pk
+        self.object = article
+
+
+class SearchHits(object):
+    """
+    The results of a search for a Paginator, loading the Articles of
+    each page sliced from the cached ids.
+    """
+    def __init__(self, ids, count, searchqueryset):
+        self.ids = ids
+        self.total = count
+        self.searchqueryset = searchqueryset
+        self._pages = {}
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = min(self.total if index.stop is None else index.stop,
+                   self.total)
+        if (start, stop) not in self._pages:
+            if stop <= len(self.ids):
+                ids = self.ids[start:stop]
+            else:
+                ids = [int(result.pk) for result in
+                       self.searchqueryset[start:stop]]
+            articles = Article.objects.select_related('issue__periodical').\
+                in_bulk(ids)
+            # Articles deleted since the search are left out
+            self._pages[start, stop] = [SearchHit(articles[pk])
+                                        for pk in ids if pk in articles]
+        return self._pages[start, stop]
+
+
+@receiver(search_index_changed)
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def _search_index_changed(sender, **kwargs):
+    invalidate_search_results()
@@ -0,0 +1,12 @@
+"""
+Signals sent by django-periodicals.
+"""
+from django.dispatch import Signal
+
+# sent by Periodical or Author with the slugs of those whose pages
+# changed, e.g. because one of their Articles was edited
+pages_changed = Signal(providing_args=['slugs'])
+
+# sent with the Haystack connection alias when the Articles' search
+# index was updated by update_index_queue or rebuild_article_index
+search_index_changed = Signal(providing_args=['using'])
@@ -1,19 +1,72 @@
 # -*- coding: utf-8 -*-
+import gzip
+import json
+import os
+
+from django.conf import settings
 from django.contrib.sitemaps import GenericSitemap
+from django.contrib.sitemaps.views import x_robots_tag
+from django.contrib.sites.models import get_current_site
+from django.core import urlresolvers
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db.models import Count, Max
+from django.http import Http404, StreamingHttpResponse
+from django.utils.html import escape
+from django.utils.timezone import template_localtime
 from .models import Author, Periodical, Issue, Article
 from tagging.models import Tag
 
+settings.PERIODICALS_SITEMAP_LIMIT = getattr(settings, 'PERIODICALS_SITEMAP_LIMIT', 10000)
+
 
-class SlugSitemap(GenericSitemap):
+class PagedSitemap(GenericSitemap):
     """
-    Use for objects that don't implement get_absolute_url
-    but have a slug field used in creating their url.
+    GenericSitemap split into pages of PERIODICALS_SITEMAP_LIMIT urls
+    which can be generated one url at a time.
     """
+    limit = settings.PERIODICALS_SITEMAP_LIMIT
+
     def __init__(self, info_dict, priority=None, changefreq=None):
         GenericSitemap.__init__(self,
                                 info_dict,
                                 priority=priority,
                                 changefreq=changefreq)
+        # compared by sitemap_mark when there is no date_field
+        self.mark_field = info_dict.get('mark_field')
+
+    def items(self):
+        # pages must not overlap so order by something unique
+        return self.queryset.order_by('pk')
+
+    def iter_urls(self, page=1, site=None, protocol=None):
+        """
+        Like get_urls but returns an iterator that loads and formats
+        the page's items one at a time.
+        """
+        protocol = self.protocol or protocol or 'http'
+        items = self.paginator.page(page).object_list
+        return (self.url_info(item, protocol, site.domain)
+                for item in items.iterator())
+
+    def url_info(self, item, protocol, domain):
+        return {'location': "%s://%s%s" % (protocol,
+                                           domain,
+                                           self.location(item)),
+                'lastmod': self.lastmod(item),
+                'changefreq': self.changefreq,
+                'priority': self.priority}
+
+
+class SlugSitemap(PagedSitemap):
+    """
+    Use for objects that don't implement get_absolute_url
+    but have a slug field used in creating their url.
+    """
+    def __init__(self, info_dict, priority=None, changefreq=None):
+        PagedSitemap.__init__(self,
+                              info_dict,
+                              priority=priority,
+                              changefreq=changefreq)
         self.url = info_dict.get('url', '/')
         self.slugfield = info_dict['slugfield']
         self.suffix = info_dict.get('suffix', '')
@@ -22,16 +75,16 @@ class SlugSitemap(GenericSitemap):
         return "%s%s%s" % (self.url, getattr(obj, self.slugfield), self.suffix)
 
 
-class SuffixedSitemap(GenericSitemap):
+class SuffixedSitemap(PagedSitemap):
     """
     Use for sitemap entries based on objects that implement
     get_absolute_url but append a suffix in creating their url.
     """
     def __init__(self, info_dict, priority=None, changefreq=None):
-        GenericSitemap.__init__(self,
-                                info_dict,
-                                priority=priority,
-                                changefreq=changefreq)
+        PagedSitemap.__init__(self,
+                              info_dict,
+                              priority=priority,
+                              changefreq=changefreq)
         self.suffix = info_dict.get('suffix', '')
 
     def location(self, obj):
@@ -39,31 +92,35 @@ class SuffixedSitemap(GenericSitemap):
         return "%s%s" % (url, self.suffix)
 
 
+# only load the columns needed to build each url
 sitemaps = {
-    'author_detail': GenericSitemap({'queryset': Author.objects,
-                                     'date_field': 'modified'},
-                                    changefreq='monthly',
-                                    priority='0.5'),
-    'tag_detail': SlugSitemap({'queryset': Tag.objects,
+    'author_detail': PagedSitemap({'queryset': Author.objects.only('slug', 'modified'),
+                                   'date_field': 'modified'},
+                                  changefreq='monthly',
+                                  priority='0.5'),
+    'tag_detail': SlugSitemap({'queryset': Tag.objects.only('name'),
                                'url': '/tag/',
                                'slugfield': 'name',
                                'suffix': '/'},
                               changefreq='monthly',
                               priority='0.5'),
-    'periodical_detail': GenericSitemap({'queryset': Periodical.objects},
-                                        changefreq='monthly',
-                                        priority='0.5'),
-    'periodicals_read_online': SuffixedSitemap({'queryset': Periodical.objects,
-                                                'suffix': 'online/'},
+    'periodical_detail': PagedSitemap({'queryset': Periodical.objects.only('slug'),
+                                       'mark_field': 'modified'},
+                                      changefreq='monthly',
+                                      priority='0.5'),
+    'periodicals_read_online': SuffixedSitemap({'queryset': Periodical.objects.only('slug'),
+                                                'suffix': 'online/',
+                                                'mark_field': 'modified'},
                                                changefreq='monthly',
                                                priority='0.5'),
-    'periodicals_issue_detail': GenericSitemap(
-        {'queryset': Issue.objects.select_related(),
+    'periodicals_issue_detail': PagedSitemap(
+        {'queryset': Issue.objects.select_related('periodical').
+         only('slug', 'modified', 'periodical__slug'),
          'date_field': 'modified'},
         changefreq='monthly',
         priority='0.6'),
-    'periodicals_article_detail': GenericSitemap(
-        {'queryset': Article.objects.select_related(),
+    'periodicals_article_detail': PagedSitemap(
+        {'queryset': Article.objects.only('url_path', 'slug', 'issue', 'modified'),
          'date_field': 'modified'},
         changefreq='monthly',
         priority='0.7'),
@@ -76,3 +133,184 @@ def sitemaps_at(root='/periodicals'):
             # SlugSitemap - append location at which we are rooting the periodicals application
             site_map.url = root + site_map.url
     return sitemaps
+
+
+def sitemap_pages(sitemaps):
+    """
+    Yield (section, page) for every page of every section.
+    """
+    for section in sorted(sitemaps):
+        site_map = sitemaps[section]
+        if callable(site_map):
+            site_map = site_map()
+        for page in range(1, site_map.paginator.num_pages + 1):
+            yield section, page
+
+
+def iter_sitemap_urls(site_map, page, site, protocol):
+    if callable(site_map):
+        site_map = site_map()
+    if hasattr(site_map, 'iter_urls'):
+        return site_map.iter_urls(page=page, site=site, protocol=protocol)
+    return site_map.get_urls(page=page, site=site, protocol=protocol)
+
+
+def render_urlset(urls, chunk_size=1000):
+    """
+    Generate the sitemap XML for the urls in chunks of chunk_size urls.
+    """
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for url in urls:
+        line = '<url><loc>%s</loc>' % escape(url['location'])
+        if url['lastmod']:
+            line += '<lastmod>%s</lastmod>' % template_localtime(url['lastmod']).strftime('%Y-%m-%d')
+        if url['changefreq']:
+            line += '<changefreq>%s</changefreq>' % url['changefreq']
+        if url['priority']:
+            line += '<priority>%s</priority>' % url['priority']
+        lines.append(line + '</url>\n')
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    lines.append('</urlset>\n')
+    yield ''.join(lines)
+
+
+def render_sitemap_index(locations):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+    for location in locations:
+        yield '<sitemap><loc>%s</loc></sitemap>\n' % escape(location)
+    yield '</sitemapindex>\n'
+
+
+def sitemap_mark(site_map):
+    """
+    A value that changes whenever the section's urls or lastmods change:
+    the number of items and their latest date, latest modification for
+    sections without dates, or largest pk.
+    """
+    if callable(site_map):
+        site_map = site_map()
+    items = site_map.items()
+    if not hasattr(items, 'aggregate'):
+        return None
+    mark = items.order_by().aggregate(count=Count('pk'),
+                                      latest=Max(getattr(site_map, 'date_field', None) or
+                                                 getattr(site_map, 'mark_field', None) or 'pk'))
+    latest = mark['latest']
+    return [mark['count'], hasattr(latest, 'isoformat') and latest.isoformat() or latest]
+
+
+def write_sitemaps(sitemaps, directory, base_url, site, protocol='http',
+                   force=False):
+    """
+    Write each page of each section to a gzipped file in directory and
+    a sitemap.xml index of them located at base_url. Sections whose
+    sitemap_mark hasn't changed since the last run are not rewritten.
+    Returns the names of the rewritten sections.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    state_path = os.path.join(directory, 'sitemaps.json')
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (IOError, ValueError):
+        state = {}
+
+    written = []
+    for section in sorted(sitemaps):
+        site_map = sitemaps[section]
+        if callable(site_map):
+            site_map = site_map()
+        mark = sitemap_mark(site_map)
+        previous = state.get(section)
+        if not force and mark is not None and previous and previous['mark'] == mark:
+            continue
+        pages = site_map.paginator.num_pages
+        for page in range(1, pages + 1):
+            _write_atomic(os.path.join(directory, _sitemap_filename(section, page)),
+                          render_urlset(iter_sitemap_urls(site_map, page, site, protocol)),
+                          compress=True)
+        # remove pages left over from a larger previous run
+        for page in range(pages + 1, (previous and previous['pages'] or 0) + 1):
+            path = os.path.join(directory, _sitemap_filename(section, page))
+            if os.path.exists(path):
+                os.remove(path)
+        state[section] = {'mark': mark, 'pages': pages}
+        written.append(section)
+
+    for section in list(state):
+        if section not in sitemaps:
+            del state[section]
+    if written or not os.path.exists(os.path.join(directory, 'sitemap.xml')):
+        base_url = base_url.rstrip('/') + '/'
+        locations = [base_url + _sitemap_filename(section, page)
+                     for section in sorted(state)
+                     for page in range(1, state[section]['pages'] + 1)]
+        _write_atomic(os.path.join(directory, 'sitemap.xml'),
+                      render_sitemap_index(locations))
+    with open(state_path, 'w') as f:
+        json.dump(state, f)
+    return written
+
+
+def _sitemap_filename(section, page):
+    return 'sitemap-%s-%d.xml.gz' % (section, page)
+
+
+def _write_atomic(path, chunks, compress=False):
+    # crawlers never see a partially written file
+    temporary = path + '.tmp'
+    f = compress and gzip.open(temporary, 'wb') or open(temporary, 'wb')
+    try:
+        for chunk in chunks:
+            f.write(chunk.encode('utf-8'))
+    finally:
+        f.close()
+    os.rename(temporary, path)
+
+
+@x_robots_tag
+def index(request, sitemaps,
+          sitemap_url_name='periodicals.sitemaps.sitemap'):
+    """
+    Streaming sitemap index listing every page of every section.
+    """
+    protocol = request.is_secure() and 'https' or 'http'
+    site = get_current_site(request)
+
+    def locations():
+        for section, page in sitemap_pages(sitemaps):
+            url = '%s://%s%s' % (protocol,
+                                 site.domain,
+                                 urlresolvers.reverse(sitemap_url_name,
+                                                      kwargs={'section': section}))
+            yield page == 1 and url or '%s?p=%d' % (url, page)
+
+    return StreamingHttpResponse(render_sitemap_index(locations()),
+                                 content_type='application/xml')
+
+
+@x_robots_tag
+def sitemap(request, sitemaps, section):
+    """
+    Streaming sitemap for one page of one section.
+    """
+    if section not in sitemaps:
+        raise Http404("No sitemap available for section: %r" % section)
+    protocol = request.is_secure() and 'https' or 'http'
+    try:
+        urls = iter_sitemap_urls(sitemaps[section],
+                                 request.GET.get('p', 1),
+                                 get_current_site(request),
+                                 protocol)
+    except EmptyPage:
+        raise Http404("Page %s empty" % request.GET.get('p'))
+    except PageNotAnInteger:
+        raise Http404("No page '%s'" % request.GET.get('p'))
+    return StreamingHttpResponse(render_urlset(urls),
+                                 content_type='application/xml')
+
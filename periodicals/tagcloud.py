@@ -0,0 +1,142 @@
+"""
+The Article tag cloud, calculated from counts kept in the cache and
+updated incrementally as Articles' tags change instead of aggregating
+every tagged item on each page view.
+
+Each tag's count is a cache key of its own that is incremented and
+decremented atomically, so concurrent saves don't lose updates. The
+count keys and the names of the tags counted are cached under a version;
+an Article gaining a tag that isn't counted yet replaces it so everything
+is counted again on next use.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from tagging.models import Tag
+from tagging.utils import calculate_cloud, parse_tag_input, LOGARITHMIC
+
+from .models import Article
+from .versions import bump, get_versions
+
+VERSION_KEY = 'periodicals:tag_version'
+NAMES_KEY = 'periodicals:tag_names'
+COUNT_KEY_PREFIX = 'periodicals:tag_count'
+STEPS = 6
+
+
+def tag_counts():
+    """
+    Dictionary of tag name to the number of Articles with the tag.
+    """
+    version, names = _counted()
+    if names is not None:
+        keys = dict((_count_key(version, name), name) for name in names)
+        counts = cache.get_many(list(keys))
+        if len(counts) == len(keys):
+            return dict((keys[key], count)
+                        for key, count in counts.items() if count > 0)
+    return _count(version)
+
+
+def tag_cloud():
+    """
+    Tags used by Articles ordered by name, each with a ``count`` and a
+    ``font_size`` between 1 and STEPS.
+    """
+    counts = tag_counts()
+    tags = []
+    for name in sorted(counts):
+        tag = Tag(name=name)
+        tag.count = counts[name]
+        tags.append(tag)
+    return calculate_cloud(tags, steps=STEPS, distribution=LOGARITHMIC)
+
+
+def update_tag_counts(removed, added):
+    """
+    Adjust the cached counts for an Article losing the ``removed`` tag
+    names and gaining the ``added`` ones.
+    """
+    version, names = _counted()
+    if names is None:
+        # nothing cached, next use will count from the database
+        return
+    if set(added).difference(names):
+        invalidate_tag_cloud()
+        return
+    try:
+        for name in removed:
+            cache.decr(_count_key(version, name))
+        for name in added:
+            cache.incr(_count_key(version, name))
+    except ValueError:
+        # evicted, count them all again
+        invalidate_tag_cloud()
+
+
+def invalidate_tag_cloud():
+    """
+    Discard the cached counts, e.g. after changing tags without saving
+    Articles.
+    """
+    bump([VERSION_KEY])
+
+
+def _counted():
+    # the version and the names of the tags counted under it, if any
+    version = get_versions([VERSION_KEY])[VERSION_KEY]
+    return version, cache.get('%s:%s' % (NAMES_KEY, version))
+
+
+def _count(version):
+    counts = dict((tag.name, tag.count) for tag in
+                  Tag.objects.usage_for_model(Article, counts=True))
+    cache.set_many(dict((_count_key(version, name), count)
+                        for name, count in counts.items()),
+                   settings.PERIODICALS_CACHE_TIMEOUT)
+    cache.set('%s:%s' % (NAMES_KEY, version), sorted(counts),
+              settings.PERIODICALS_CACHE_TIMEOUT)
+    return counts
+
+
+def _count_key(version, name):
+    return '%s:%s:%s' % (COUNT_KEY_PREFIX, version,
+                         hashlib.md5(name.encode('utf-8')).hexdigest())
+
+
+def tag_names(tags):
+    """
+    The set of tag names in the ``tags`` field's text.
+    """
+    names = parse_tag_input(tags or '')
+    if getattr(settings, 'FORCE_LOWERCASE_TAGS', False):
+        names = [name.lower() for name in names]
+    return set(names)
+
+
+@receiver(pre_save, sender=Article)
+def _remember_tags(sender, instance, raw=False, **kwargs):
+    instance._saved_tags = set()
+    if instance.pk and not raw and _counted()[1] is not None:
+        saved = Article.objects.filter(pk=instance.pk).\
+            values_list('tags', flat=True)
+        instance._saved_tags = tag_names(saved and saved[0])
+
+
+@receiver(post_save, sender=Article)
+def _article_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        invalidate_tag_cloud()
+        return
+    saved = getattr(instance, '_saved_tags', set())
+    tags = tag_names(instance.tags)
+    update_tag_counts(saved - tags, tags - saved)
+
+
+@receiver(post_delete, sender=Article)
+def _article_deleted(sender, instance, **kwargs):
+    update_tag_counts(tag_names(instance.tags), [])
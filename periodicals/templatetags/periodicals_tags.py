@@ -3,13 +3,16 @@ from django.utils.html import conditional_escape
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext as _
 
-from periodicals.models import Article
+from periodicals.counters import article_count
+from periodicals.fragments import (cached_article_result,
+                                   prefetch_article_results)
+from periodicals.tagcloud import tag_cloud
 
 
 register = template.Library()
 
 
-def article_result(article, autoescape=None):
+def _render_article_result(article, autoescape):
     if autoescape:
         esc = conditional_escape
     else:
@@ -42,12 +45,45 @@ def article_result(article, autoescape=None):
         result += '''<div class="result-tags">%s: %s</div>''' % (
             _("Tags"), article.tags.replace('"', ''))
     result += "</p>"
-    return mark_safe(result)
+    return result
+
+
+def article_result(article, autoescape=None):
+    return mark_safe(cached_article_result(article, autoescape,
+                                           _render_article_result))
 
 article_result.needs_autoescape = True
 register.filter('article_result', article_result)
 
 
+class PrefetchArticleResultsNode(template.Node):
+    def __init__(self, articles):
+        self.articles = articles
+
+    def render(self, context):
+        prefetch_article_results(self.articles.resolve(context),
+                                 context.autoescape)
+        return ''
+
+
+def do_prefetch_article_results(parser, token):
+    """
+    Looks up the cached article_result of every Article in a list with a
+    single cache request before the list is rendered.
+
+    Usage::
+
+       {% prefetch_article_results article_list %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            "%r tag requires a list of Articles" % bits[0])
+    return PrefetchArticleResultsNode(parser.compile_filter(bits[1]))
+
+register.tag('prefetch_article_results', do_prefetch_article_results)
+
+
 def periodical_copyright(periodical, autoescape=None):
     if autoescape:
         esc = conditional_escape
@@ -64,14 +100,58 @@ register.filter('periodical_copyright', periodical_copyright)
 
 
 class ArticleCountNode(template.Node):
-    def __init__(self):
-        pass
+    def __init__(self, periodical=None):
+        self.periodical = periodical
 
     def render(self, context):
-        return str(Article.objects.count())
+        periodical = None
+        if self.periodical is not None:
+            periodical = self.periodical.resolve(context)
+        return str(article_count(periodical))
 
 
 def do_article_count(parser, token):
+    """
+    Renders the number of Articles, optionally only those in a Periodical.
+
+    Usage::
+
+       {% article_count %}
+       {% article_count periodical %}
+    """
+    bits = token.split_contents()
+    if len(bits) > 2:
+        raise template.TemplateSyntaxError(
+            "%r tag accepts at most one argument" % bits[0])
+    if len(bits) == 2:
+        return ArticleCountNode(parser.compile_filter(bits[1]))
     return ArticleCountNode()
 
 register.tag('article_count', do_article_count)
+
+
+class ArticleTagCloudNode(template.Node):
+    def __init__(self, context_var):
+        self.context_var = context_var
+
+    def render(self, context):
+        context[self.context_var] = tag_cloud()
+        return ''
+
+
+def do_article_tag_cloud(parser, token):
+    """
+    Stores the cached Article tag cloud in a context variable.
+
+    Usage::
+
+       {% article_tag_cloud as tags %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 3 or bits[1] != 'as':
+        raise template.TemplateSyntaxError(
+            "%r tag requires the form: {%% %s as varname %%}" %
+            (bits[0], bits[0]))
+    return ArticleTagCloudNode(bits[2])
+
+register.tag('article_tag_cloud', do_article_tag_cloud)
@@ -2,10 +2,9 @@ from django.contrib import admin
 from django.conf import settings
 from django.conf.urls import patterns, url
 from django.views.generic import TemplateView
-from haystack.views import SearchView
 from haystack.query import SearchQuerySet
 from .views import (AuthorList, AuthorDetail,
-                    ArticleDetail, ArticleTags,
+                    ArticleDetail, ArticleTags, CachedSearchView,
                     IssueYear, IssueDetail,
                     PeriodicalList, PeriodicalDetail,
                     SeriesList, SeriesDetail)
@@ -17,10 +16,10 @@ sqs = SearchQuerySet().order_by('-pub_date')
 urlpatterns = \
     patterns('',
              url(r'^search/',
-                 SearchView(load_all=False,
-                            template="periodicals/search.html",
-                            searchqueryset=sqs,
-                            ),
+                 CachedSearchView(load_all=False,
+                                  template="periodicals/search.html",
+                                  searchqueryset=sqs,
+                                  ),
                  name='haystack_search',
                  ),
              # not in sitemap
@@ -39,6 +38,12 @@ urlpatterns = \
                  name='periodicals_tags',
                  ),
 
+             # catalog download for staff - not in sitemap
+             url(r'^export\.(?P<format>csv|jsonl)$',
+                 'periodicals.exporter.export',
+                 name='periodicals_export'
+                 ),
+
              url(r'^tag/(?P<tag>[^/]+)/$',
                  ArticleTags.as_view(template_name='periodicals/article_tag_detail.html'),
                  name='periodicals_article_tag_detail'
@@ -100,11 +105,17 @@ urlpatterns += \
                  ),
 
              # list of articles in a series - not in sitemap
-             url(r'^(?P<periodical_slug>[-\w]+)/series/(?P<series>.+)/$',
+             url(r'^(?P<periodical_slug>[-\w]+)/series/(?P<series_slug>[-\w]+)/$',
                  SeriesDetail.as_view(),
                  name='periodicals_series_detail'
                  ),
 
+             # series urls of earlier versions using the series name
+             url(r'^(?P<periodical_slug>[-\w]+)/series/(?P<series>.+)/$',
+                 'periodicals.views.series_redirect',
+                 name='periodicals_series_redirect'
+                 ),
+
              # one periodical issue
              url(r'^(?P<periodical_slug>[-\w]+)/(?P<issue_slug>[-\w]+)/$',
                  IssueDetail.as_view(),
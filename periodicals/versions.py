@@ -0,0 +1,54 @@
+"""
+Versions of data cached by the other modules.
+
+Cached entries are stored under keys including the versions of what they
+show, so replacing the versions discards them all without finding their
+keys; the entries left behind simply expire. The versions are taken from
+the time, so a version that was evicted and started again can't collide
+with an earlier one and bring back the entries cached under it.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+def get_versions(keys, timeout=None):
+    """
+    Dictionary of the versions stored under the cache keys, starting
+    new versions for those that aren't cached.
+    """
+    if timeout is None:
+        timeout = settings.PERIODICALS_CACHE_TIMEOUT
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = new_version()
+            cache.add(key, versions[key], timeout)
+    return versions
+
+
+def bump(keys, timeout=None):
+    """
+    Replace the versions stored under the cache keys.
+    """
+    if timeout is None:
+        timeout = settings.PERIODICALS_CACHE_TIMEOUT
+    version = new_version()
+    cache.set_many(dict((key, version) for key in keys), timeout)
+
+
+def new_version():
+    return int(time.time() * 1000000)
+
+
+def version_time(version):
+    """
+    The time the version was started, as a datetime.
+    """
+    if settings.USE_TZ:
+        return datetime.datetime.fromtimestamp(version / 1000000.0,
+                                               timezone.utc)
+    return datetime.datetime.fromtimestamp(version / 1000000.0)
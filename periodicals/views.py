@@ -1,41 +1,53 @@
 from django.views.generic import (ArchiveIndexView, DetailView,
                                   ListView, TemplateView, YearArchiveView)
-from django.db.models import Count
 from django.template import RequestContext
 from django.shortcuts import get_object_or_404, render_to_response
 from django import forms
-from django.http import HttpResponseRedirect
+from django.http import HttpResponsePermanentRedirect, HttpResponseRedirect
 from django.conf import settings
-from django.core.mail import mail_managers
 from django.core import urlresolvers
-from django.core.exceptions import ObjectDoesNotExist
-from django.contrib.sites.models import Site
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.contrib.contenttypes.models import ContentType
+from django.utils.decorators import method_decorator
 
 from tagging.views import TaggedObjectListView
 from captcha.fields import ReCaptchaField
+from haystack.views import SearchView
 
-from .models import Author, Periodical, Issue, Article, LinkItem
+from .models import Author, Periodical, Issue, Article, LinkItem, Series
+from .conditional import (author_modified, conditional_page,
+                          periodical_modified)
+from .notifications import notify_link_added
+from .pagecache import author_pages, cached_page, periodical_pages
+from .pagination import KeysetPaginationMixin
+from .searchcache import SearchHits, cached_hits, search_key
 
 settings.PERIODICALS_PAGINATION = getattr(settings, 'PERIODICALS_PAGINATION', 20)
 settings.PERIODICALS_LINKS_ENABLED = getattr(settings, 'PERIODICALS_LINKS_ENABLED', True)
 settings.PERIODICALS_EMAIL_NOTIFY = getattr(settings, 'PERIODICALS_EMAIL_NOTIFY', True)
 
 
-class AuthorList(ListView):
+class AuthorList(KeysetPaginationMixin, ListView):
     model = Author
     context_object_name = 'author_list'
-    queryset = Author.objects.annotate(Count('articles')).\
-        order_by("last_name", "first_name")
+    queryset = Author.objects.order_by("last_name", "first_name")
     template_name = 'periodicals/author_list.html'
     paginate_by = settings.PERIODICALS_PAGINATION
+    keyset_ordering = ('last_name', 'first_name', 'pk')
 
 
-class AuthorDetail(ListView):
+class AuthorDetail(KeysetPaginationMixin, ListView):
     model = Article
     context_object_name = 'article_list'
     slug_url_kwarg = 'author_slug'
     template_name = 'periodicals/author_detail.html'
     paginate_by = settings.PERIODICALS_PAGINATION
+    keyset_ordering = ('-issue__pub_date', '-pk')
+
+    @method_decorator(cached_page(author_pages))
+    @method_decorator(conditional_page(author_modified))
+    def dispatch(self, *args, **kwargs):
+        return super(AuthorDetail, self).dispatch(*args, **kwargs)
 
     def get_queryset(self):
         self.author = get_object_or_404(Author,
@@ -50,17 +62,22 @@ class AuthorDetail(ListView):
         return context
 
 
-class SeriesList(ListView):
-    model = Article
+class SeriesList(KeysetPaginationMixin, ListView):
+    model = Series
     context_object_name = 'series_list'
     template_name = 'periodicals/series_list.html'
     paginate_by = settings.PERIODICALS_PAGINATION
+    keyset_ordering = ('name', 'pk')
+
+    @method_decorator(cached_page(periodical_pages))
+    def dispatch(self, *args, **kwargs):
+        return super(SeriesList, self).dispatch(*args, **kwargs)
 
     def get_queryset(self):
         self.periodical = get_object_or_404(Periodical,
                                             slug=self.kwargs['periodical_slug'])
-        return Article.objects.filter(issue__periodical=self.periodical).\
-            order_by('series').values('series').annotate(series_count=Count('series'))
+        return Series.objects.filter(periodical=self.periodical).\
+            order_by('name')
 
     def get_context_data(self, **kwargs):
         context = super(SeriesList, self).get_context_data(**kwargs)
@@ -68,18 +85,33 @@ class SeriesList(ListView):
         return context
 
 
-class SeriesDetail(ListView):
+class SeriesDetail(KeysetPaginationMixin, ListView):
     model = Article
     context_object_name = 'article_list'
     template_name = 'periodicals/series_detail.html'
     paginate_by = settings.PERIODICALS_PAGINATION
+    keyset_ordering = ('-issue__pub_date', '-pk')
 
-    def get_queryset(self):
+    @method_decorator(cached_page(periodical_pages))
+    @method_decorator(conditional_page(periodical_modified))
+    def dispatch(self, *args, **kwargs):
+        return super(SeriesDetail, self).dispatch(*args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
         self.periodical = get_object_or_404(Periodical,
-                                            slug=self.kwargs['periodical_slug'])
-        self.series = self.kwargs['series']
+                                            slug=kwargs['periodical_slug'])
+        try:
+            self.series = Series.objects.get(periodical=self.periodical,
+                                             slug=kwargs['series_slug'])
+        except Series.DoesNotExist:
+            # a series name from the urls of earlier versions
+            return series_redirect(request, kwargs['periodical_slug'],
+                                   kwargs['series_slug'])
+        return super(SeriesDetail, self).get(request, *args, **kwargs)
+
+    def get_queryset(self):
         return Article.objects.filter(issue__periodical=self.periodical).\
-            filter(series=self.series).\
+            filter(series=self.series.name).\
             select_related().order_by('-issue__pub_date')
 
     def get_context_data(self, **kwargs):
@@ -89,11 +121,23 @@ class SeriesDetail(ListView):
         return context
 
 
+def series_redirect(request, periodical_slug, series):
+    """
+    Redirects the series urls of earlier versions, made from the series
+    name, to the Series' page.
+    """
+    series = get_object_or_404(Series,
+                               periodical__slug=periodical_slug,
+                               name=series)
+    return HttpResponsePermanentRedirect(series.get_absolute_url())
+
+
 # when related_tags=True can't yet pass a QuerySet:
 # http://code.google.com/p/django-tagging/issues/detail?id=179
-class ArticleTags(TaggedObjectListView):
+class ArticleTags(KeysetPaginationMixin, TaggedObjectListView):
     queryset = Article.objects.order_by('-issue__pub_date').select_related().all()
     paginate_by = settings.PERIODICALS_PAGINATION
+    keyset_ordering = ('-issue__pub_date', '-pk')
 
     def get_queryset(self):
         tag = self.kwargs.get('tag', None)
@@ -117,6 +161,11 @@ class PeriodicalDetail(ArchiveIndexView):
     template_name = 'periodicals/periodical_detail.html'
     slug_url_kwarg = 'periodical_slug'
 
+    @method_decorator(cached_page(periodical_pages))
+    @method_decorator(conditional_page(periodical_modified))
+    def dispatch(self, *args, **kwargs):
+        return super(PeriodicalDetail, self).dispatch(*args, **kwargs)
+
     def get_queryset(self):
         self.periodical_slug = self.kwargs['periodical_slug']
         qs = super(PeriodicalDetail, self).get_queryset()
@@ -137,6 +186,10 @@ class IssueYear(YearArchiveView):
     allow_future = False
     template_name = 'periodicals/issue_year.html'
 
+    @method_decorator(cached_page(periodical_pages))
+    def dispatch(self, *args, **kwargs):
+        return super(IssueYear, self).dispatch(*args, **kwargs)
+
     def get_queryset(self):
         periodical_slug = self.kwargs['periodical_slug']
         periodical = get_object_or_404(Periodical, slug=periodical_slug)
@@ -155,28 +208,40 @@ class IssueDetail(TemplateView):
     # issue_slug is only unique per month so can't use
     # regular DetailView
     template_name = 'periodicals/issue_detail.html'
+    # maximum number of queries needed to render an issue page
+    # regardless of how many articles, authors and links it has
+    query_budget = 10
+
+    @method_decorator(cached_page(periodical_pages))
+    @method_decorator(conditional_page(periodical_modified))
+    def dispatch(self, *args, **kwargs):
+        return super(IssueDetail, self).dispatch(*args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super(IssueDetail, self).get_context_data(**kwargs)
         periodical_slug = kwargs['periodical_slug']
         periodical = get_object_or_404(Periodical,
                                        slug=periodical_slug)
-        issue = get_object_or_404(Issue,
+        issue = get_object_or_404(Issue.objects.
+                                  select_related('previous_issue',
+                                                 'next_issue'),
                                   periodical=periodical,
                                   slug=kwargs['issue_slug'])
-        try:
-            next_month = Issue.objects.filter(periodical=periodical).\
-                filter(pub_date__gt=issue.pub_date).order_by('pub_date')[0:1].get()
-        except ObjectDoesNotExist:
-            next_month = None
-
-        try:
-            previous_month = Issue.objects.filter(periodical=periodical).\
-                filter(pub_date__lt=issue.pub_date).order_by('-pub_date')[0:1].get()
-        except ObjectDoesNotExist:
-            previous_month = None
+        issue.periodical = periodical
+        LinkItem.active.attach([issue])
+        previous_month = issue.previous_issue
+        next_month = issue.next_issue
+        for neighbor in (previous_month, next_month):
+            if neighbor:
+                neighbor.periodical = periodical
+        articles = list(issue.articles.prefetch_related('authors'))
+        for article in articles:
+            # share the loaded issue so get_absolute_url doesn't
+            # fetch the issue and periodical again for every article
+            article.issue = issue
 
         context['issue'] = issue
+        context['articles'] = articles
         context['periodical'] = periodical
         context['previous_month'] = previous_month
         context['next_month'] = next_month
@@ -191,6 +256,11 @@ class ArticleDetail(DetailView):
     slug_url_kwarg = 'article_slug'
     template_name = 'periodicals/article_detail.html'
 
+    @method_decorator(cached_page(periodical_pages))
+    @method_decorator(conditional_page(periodical_modified))
+    def dispatch(self, *args, **kwargs):
+        return super(ArticleDetail, self).dispatch(*args, **kwargs)
+
     def get_queryset(self):
         periodical_slug = self.kwargs['periodical_slug']
         self.periodical = get_object_or_404(Periodical,
@@ -199,37 +269,58 @@ class ArticleDetail(DetailView):
         self.issue = get_object_or_404(Issue,
                                        periodical=self.periodical,
                                        slug=issue_slug)
-        return super(ArticleDetail, self).get_queryset()
+        return super(ArticleDetail, self).get_queryset().\
+            select_related('previous_article', 'next_article')
 
     def get_context_data(self, **kwargs):
         context = super(ArticleDetail, self).get_context_data(**kwargs)
         article = context['article']
-        next_article = previous_article = None
-        if article.page:
-            try:
-                next_article = Article.objects.filter(issue=self.issue).\
-                    filter(page__gt=article.page).order_by('page')[0:1].get()
-            except ObjectDoesNotExist:
-                next_article = None
-            try:
-                previous_article = Article.objects.filter(issue=self.issue).\
-                    filter(page__lt=article.page).order_by('-page')[0:1].get()
-            except ObjectDoesNotExist:
-                previous_article = None
+        self.issue.periodical = self.periodical
+        for neighbor in (article.previous_article, article.next_article):
+            if neighbor:
+                neighbor.issue = self.issue
         context['periodical'] = self.periodical
         context['issue'] = self.issue
-        context['previous_article'] = previous_article
-        context['next_article'] = next_article
+        context['previous_article'] = article.previous_article
+        context['next_article'] = article.next_article
+        series = article.series and list(Series.objects.filter(
+            periodical=self.periodical, name=article.series)[:1])
+        context['series'] = series and series[0] or None
         context['links_enabled'] = settings.PERIODICALS_LINKS_ENABLED
         context['form'] = LinkItemForm()
         return context
 
 
+@cached_page(periodical_pages)
 def read_online(request, periodical_slug):
     periodical = get_object_or_404(Periodical, slug=periodical_slug)
+    # only the Issue fields shown, display_name() reads those its
+    # format names
+    display_fields = Issue.display_fields()
+    issues = Issue.objects.filter(periodical=periodical).\
+        exclude(read_online__exact='').\
+        only('periodical', 'slug', 'printed_cover', 'digital_cover',
+             *display_fields).order_by('-pub_date')
+    articles = Article.objects.filter(issue__periodical=periodical).\
+        exclude(read_online__exact='').select_related('issue').\
+        only('title', 'series', 'description', 'page', 'tags', 'slug',
+             'url_path', 'modified', 'issue', 'issue__periodical',
+             'issue__slug', *['issue__%s' % name for name in display_fields]).\
+        prefetch_related('authors').order_by('-issue__pub_date')
+    issues_page = _paginate(request, issues, 'issues_page')
+    articles_page = _paginate(request, articles, 'articles_page')
+    issues = list(issues_page.object_list)
+    articles = list(articles_page.object_list)
+    for issue in issues:
+        issue.periodical = periodical
+    for article in articles:
+        article.issue.periodical = periodical
+
     return render_to_response('periodicals/read_online.html',
-                              {'articles': Article.objects.exclude(read_online__exact='').select_related().order_by('-issue__pub_date'),
-                               'issues': Issue.objects.exclude(read_online__exact='').select_related().order_by('-pub_date'),
+                              {'articles': articles,
+                               'articles_page': articles_page,
+                               'issues': issues,
+                               'issues_page': issues_page,
                                'periodical': periodical,
                                },
                               context_instance=RequestContext(request)
@@ -265,25 +356,56 @@ def add_issue_link(request, periodical_slug, issue_slug):
                     admin_url=admin_url)
 
 
+@cached_page(periodical_pages)
+@conditional_page(periodical_modified)
 def links(request, periodical_slug):
     periodical = get_object_or_404(Periodical, slug=periodical_slug)
-    # Load all the links and their related Issues/Article instances efficiently
-    articles = Article.objects.filter(issue__periodical=periodical).\
-        filter(links__status='A').distinct().select_related().\
-        order_by('-issue__pub_date')
-    issues = Issue.objects.filter(periodical=periodical).\
-        filter(links__status='A').distinct().select_related().\
+    # page through the Issues/Articles with active links, then load the
+    # links of the ones shown with a single query
+    issues = Issue.objects.filter(periodical=periodical,
+                                  pk__in=_linked_ids(Issue)).\
         order_by('-pub_date')
+    articles = Article.objects.filter(issue__periodical=periodical,
+                                      pk__in=_linked_ids(Article)).\
+        select_related('issue').prefetch_related('authors').\
+        order_by('-issue__pub_date')
+    issues_page = _paginate(request, issues, 'issues_page')
+    articles_page = _paginate(request, articles, 'articles_page')
+    issues = list(issues_page.object_list)
+    articles = list(articles_page.object_list)
+    for issue in issues:
+        issue.periodical = periodical
+    for article in articles:
+        article.issue.periodical = periodical
+    LinkItem.active.attach(issues + articles)
 
     return render_to_response('periodicals/links.html',
                               {'articles': articles,
+                               'articles_page': articles_page,
                                'issues': issues,
+                               'issues_page': issues_page,
                                'periodical': periodical,
                                },
                               context_instance=RequestContext(request)
                               )
 
 
+def _linked_ids(model):
+    return LinkItem.active.filter(
+        content_type=ContentType.objects.get_for_model(model)).\
+        values('object_id')
+
+
+def _paginate(request, object_list, page_kwarg):
+    paginator = Paginator(object_list, settings.PERIODICALS_PAGINATION)
+    try:
+        return paginator.page(request.GET.get(page_kwarg, 1))
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
+
+
 class LinkItemForm(forms.Form):
     title = forms.CharField(widget=forms.TextInput(attrs={'size': '60'}))
     url = forms.URLField(widget=forms.TextInput(attrs={'size': '60'}))
@@ -298,16 +420,12 @@ def add_link(request, instance,
     if request.method == 'POST':
         form = form_class(data=request.POST)
         if form.is_valid():
-            instance.links.create(status=LinkItem.STATUS_SUBMITTED,
-                                  url=form.cleaned_data['url'],
-                                  title=form.cleaned_data['title'])
+            link = instance.links.create(status=LinkItem.STATUS_SUBMITTED,
+                                         url=form.cleaned_data['url'],
+                                         title=form.cleaned_data['title'])
             if settings.PERIODICALS_EMAIL_NOTIFY:
-                email_body = "Link added to: http://%s%s admin: http://%s%s" % (
-                    Site.objects.get_current().domain,
-                    instance.get_absolute_url(),
-                    Site.objects.get_current().domain,
-                    admin_url)
-                mail_managers("New Link Added", email_body)
+                # mailed in a digest by send_link_notifications
+                notify_link_added(link, instance, admin_url)
             return HttpResponseRedirect(success_url)
     else:
         form = form_class()
@@ -317,3 +435,17 @@ def add_link(request, instance,
                                'object_class': instance.__class__.__name__,
                                },
                               context_instance=RequestContext(request))
+
+
+class CachedSearchView(SearchView):
+    """
+    A SearchView caching the ids of the Articles found per normalized
+    query, see periodicals.searchcache.
+    """
+    def get_results(self):
+        results = super(CachedSearchView, self).get_results()
+        if not self.query:
+            return results
+        key = search_key(self.query, self.request.GET.getlist('models'))
+        ids, count = cached_hits(key, results)
+        return SearchHits(ids, count, results)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_commands
+------------
+
+Tests for `django-periodicals` management commands.
+"""
+from datetime import datetime
+from StringIO import StringIO
+from django.test import TestCase
+from django.core import management
+from periodicals import models
+
+
+class TestRebuildNeighbors(TestCase):
+
+    def test_relinks_issues_and_articles(self):
+        periodical = models.Periodical(name="Periodical Name")
+        periodical.save()
+        issue1 = models.Issue(periodical=periodical, volume=1, issue=1,
+                              pub_date=datetime(2013, 1, 1))
+        issue1.save()
+        issue2 = models.Issue(periodical=periodical, volume=1, issue=2,
+                              pub_date=datetime(2013, 2, 1))
+        issue2.save()
+        article1 = models.Article(issue=issue1, title="One", page=1)
+        article1.save()
+        article2 = models.Article(issue=issue1, title="Two", page=2)
+        article2.save()
+        # simulate data loaded without the neighbor links
+        models.Issue.objects.update(previous_issue=None, next_issue=None)
+        models.Article.objects.update(previous_article=None,
+                                      next_article=None)
+        management.call_command('rebuild_neighbors', stdout=StringIO())
+        self.assertEqual(issue2,
+                         models.Issue.objects.get(pk=issue1.pk).next_issue)
+        self.assertEqual(issue1,
+                         models.Issue.objects.get(pk=issue2.pk).previous_issue)
+        self.assertEqual(article2,
+                         models.Article.objects.get(pk=article1.pk).next_article)
+
+
+class TestRebuildUrlPaths(TestCase):
+
+    def test_rebuilds_missing_url_paths(self):
+        periodical = models.Periodical(name="Periodical Name")
+        periodical.save()
+        issue = models.Issue(periodical=periodical, volume=1, issue=1,
+                             pub_date=datetime(2013, 1, 1))
+        issue.save()
+        article = models.Article(issue=issue, title="One")
+        article.save()
+        models.Article.objects.update(url_path='')
+        management.call_command('rebuild_url_paths', stdout=StringIO())
+        self.assertEqual('periodical-name/1-1/one/',
+                         models.Article.objects.get(pk=article.pk).url_path)
+
+
+class TestRecountAuthors(TestCase):
+
+    def test_recounts_articles(self):
+        periodical = models.Periodical(name="Periodical Name")
+        periodical.save()
+        issue = models.Issue(periodical=periodical, volume=1, issue=1,
+                             pub_date=datetime(2013, 1, 1))
+        issue.save()
+        author = models.Author(first_name="Alfred", last_name="Newman")
+        author.save()
+        article = models.Article(issue=issue, title="One")
+        article.save()
+        article.authors.add(author)
+        models.Author.objects.update(article_count=0)
+        out = StringIO()
+        management.call_command('recount_authors', stdout=out)
+        self.assertEqual("Recounted 1 authors", out.getvalue().strip())
+        self.assertEqual(1,
+                         models.Author.objects.get(pk=author.pk).article_count)
+
+
+class TestRebuildSeries(TestCase):
+
+    def test_rebuilds_series(self):
+        periodical = models.Periodical(name="Periodical Name")
+        periodical.save()
+        issue = models.Issue(periodical=periodical, volume=1, issue=1,
+                             pub_date=datetime(2013, 1, 1))
+        issue.save()
+        models.Article(issue=issue, series="Humor", title="One").save()
+        models.Series.objects.all().delete()
+        management.call_command('rebuild_series', stdout=StringIO())
+        self.assertEqual(['Humor'], [s.name for s in
+                                     models.Series.objects.all()])
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_conditional
+------------
+
+Tests for `django-periodicals` conditional module.
+"""
+from datetime import datetime
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.utils.http import http_date
+from django.utils.timezone import utc
+from periodicals.models import Author, Periodical, Issue, Article, LinkItem
+from periodicals.counters import CHANGED_KEY
+from periodicals.signals import pages_changed
+
+
+class TestConditionalViews(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = Author(last_name='Newman', first_name='Alfred')
+        self.author.save()
+        self.periodical = Periodical(name="Mad Magazine")
+        self.periodical.save()
+        self.issue = Issue(periodical=self.periodical, volume=1, issue=10,
+                           pub_date=datetime(2011, 10, 1))
+        self.issue.save()
+        self.article = Article(issue=self.issue, title="What me worry?")
+        self.article.save()
+        self.article.authors.add(self.author)
+        self.issue_url = self.issue.get_absolute_url()
+        self.author_url = reverse('periodicals_author_detail',
+                                  kwargs={'author_slug': self.author.slug})
+
+    def etag(self, url):
+        resp = self.client.get(url)
+        self.assertEqual(200, resp.status_code)
+        self.assertTrue(resp.has_header('Last-Modified'))
+        return resp['ETag']
+
+    def test_not_modified(self):
+        etag = self.etag(self.issue_url)
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.issue_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, resp.status_code)
+        resp = self.client.get(self.article.get_absolute_url(),
+                               HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, resp.status_code)
+
+    def test_missing_periodical(self):
+        resp = self.client.get(reverse('periodicals_links',
+                                       kwargs={'periodical_slug': 'none'}),
+                               HTTP_IF_NONE_MATCH='"anything"')
+        self.assertEqual(404, resp.status_code)
+
+    def test_article_change_modifies_pages(self):
+        issue_etag = self.etag(self.issue_url)
+        author_etag = self.etag(self.author_url)
+        self.article.title = "Worry"
+        self.article.save()
+        self.assertNotEqual(issue_etag, self.etag(self.issue_url))
+        self.assertNotEqual(author_etag, self.etag(self.author_url))
+
+    def test_author_change_modifies_pages(self):
+        issue_etag = self.etag(self.issue_url)
+        self.author.first_name = 'Al'
+        self.author.save()
+        self.assertNotEqual(issue_etag, self.etag(self.issue_url))
+
+    def test_other_periodicals_articles_modify_pages(self):
+        issue_etag = self.etag(self.issue_url)
+        author_etag = self.etag(self.author_url)
+        other = Periodical(name="Cracked")
+        other.save()
+        issue = Issue(periodical=other, volume=1, issue=1,
+                      pub_date=datetime(2011, 10, 1))
+        issue.save()
+        # the article count shown on every page changes
+        article = Article.objects.create(issue=issue, title="Other")
+        self.assertNotEqual(issue_etag, self.etag(self.issue_url))
+        self.assertNotEqual(author_etag, self.etag(self.author_url))
+        issue_etag = self.etag(self.issue_url)
+        article.delete()
+        self.assertNotEqual(issue_etag, self.etag(self.issue_url))
+
+    def test_article_count_change_modifies_last_modified(self):
+        # Last-Modified is only precise to the second
+        Periodical.objects.update(modified=datetime(2011, 1, 1, tzinfo=utc))
+        cache.set(CHANGED_KEY, 1293840000 * 1000000)
+        modified = self.client.get(self.issue_url)['Last-Modified']
+        self.assertEqual(http_date(1293840000), modified)
+        Article.objects.create(issue=self.issue, title="Letters")
+        Periodical.objects.update(modified=datetime(2011, 1, 1, tzinfo=utc))
+        resp = self.client.get(self.issue_url,
+                               HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(200, resp.status_code)
+
+    def test_author_change_touches_each_periodical_once(self):
+        for n in range(3):
+            Article.objects.create(issue=self.issue,
+                                   title="Letters %d" % n).\
+                authors.add(self.author)
+        changed = []
+        receiver = lambda sender, slugs, **kwargs: changed.append(slugs)
+        pages_changed.connect(receiver, sender=Periodical)
+        try:
+            self.author.save()
+        finally:
+            pages_changed.disconnect(receiver, sender=Periodical)
+        self.assertEqual([[self.periodical.slug]], changed)
+
+    def test_only_active_links_modify_pages(self):
+        issue_etag = self.etag(self.issue_url)
+        link = self.issue.links.create(status=LinkItem.STATUS_SUBMITTED,
+                                       url='http://example.com',
+                                       title='Example')
+        self.assertEqual(issue_etag, self.etag(self.issue_url))
+        link.status = LinkItem.STATUS_ACTIVE
+        link.save()
+        self.assertNotEqual(issue_etag, self.etag(self.issue_url))
+
+    def test_moved_issue_modifies_both_periodicals(self):
+        other = Periodical(name="Cracked")
+        other.save()
+        other_url = other.get_absolute_url()
+        etag, other_etag = self.etag(self.issue_url), self.etag(other_url)
+        self.issue.periodical = other
+        self.issue.save()
+        self.assertNotEqual(etag, self.etag(self.periodical.get_absolute_url()))
+        self.assertNotEqual(other_etag, self.etag(other_url))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_exporter
+------------
+
+Tests for `django-periodicals` exporter module.
+"""
+import json
+from datetime import datetime
+from StringIO import StringIO
+from django.contrib.auth.models import AnonymousUser, User
+from django.core import management
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.client import RequestFactory
+from periodicals.exporter import (export, iter_catalog, render_csv,
+                                  render_jsonl)
+from periodicals.importer import import_catalog, read_records
+from periodicals.models import Author, Periodical, Issue, Article, LinkItem
+
+
+class ExportTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        periodical = Periodical(name="Mad Magazine")
+        periodical.save()
+        self.issue = Issue(periodical=periodical, volume=1, issue=2,
+                           pub_date=datetime(2013, 1, 1))
+        self.issue.save()
+        self.author = Author(first_name="Alfred", middle_name="E.",
+                             last_name="Neuman")
+        self.author.save()
+        self.article = Article(issue=self.issue, series="Humor",
+                               title=u"Caf\xe9", page=3, tags="humor")
+        self.article.save()
+        self.article.authors.add(self.author)
+        Article(issue=self.issue, series="Letters", title="Letters",
+                page=1).save()
+        LinkItem(content_object=self.article, url="http://example.com/a",
+                 title="A", status=LinkItem.STATUS_ACTIVE).save()
+        LinkItem(content_object=self.article, url="http://example.com/s",
+                 title="S").save()
+        LinkItem(content_object=self.issue, url="http://example.com/i",
+                 title="I", status=LinkItem.STATUS_ACTIVE).save()
+
+
+class TestIterCatalog(ExportTestCase):
+
+    def test_records(self):
+        records = list(iter_catalog())
+        self.assertEqual([u"Caf\xe9", "Letters"],
+                         [record['title'] for record in records])
+        record = records[0]
+        self.assertEqual("Mad Magazine", record['periodical'])
+        self.assertEqual("1-2", record['issue_slug'])
+        self.assertEqual(3, record['page'])
+        self.assertEqual("humor", record['tags'])
+        self.assertEqual("Neuman", record['authors'][0]['last_name'])
+        self.assertEqual([{'url': "http://example.com/a", 'title': "A"}],
+                         record['links'])
+        self.assertEqual([{'url': "http://example.com/i", 'title': "I"}],
+                         record['issue_links'])
+        self.assertEqual([], records[1]['authors'])
+
+    def test_queries_per_chunk(self):
+        iter_catalog().next()
+        # articles, authors, article and issue links
+        with self.assertNumQueries(4):
+            self.assertEqual(1, len(list(iter_catalog(
+                Article.objects.filter(pk=self.article.pk)))))
+        with self.assertNumQueries(9):
+            self.assertEqual(2, len(list(iter_catalog(chunk_size=1))))
+
+    def test_reimports(self):
+        records = list(read_records(
+            StringIO(''.join(render_jsonl(iter_catalog()))), 'jsonl'))
+        Periodical.objects.all().delete()
+        Author.objects.all().delete()
+        import_catalog(records)
+        article = Article.objects.get(series="Humor")
+        self.assertEqual((u"Caf\xe9", 3, "humor"),
+                         (article.title, article.page, article.tags))
+        self.assertEqual(["Neuman"],
+                         [a.last_name for a in article.authors.all()])
+
+    def test_csv(self):
+        lines = list(render_csv(iter_catalog()))
+        self.assertTrue(lines[0].startswith("periodical,periodical_slug,"))
+        records = list(read_records(StringIO(''.join(lines)), 'csv'))
+        self.assertEqual(u"Caf\xe9", records[0]['title'])
+        self.assertEqual("Neuman, Alfred E.", records[0]['authors'])
+        self.assertEqual("http://example.com/a", records[0]['links'])
+
+
+class TestExportView(ExportTestCase):
+
+    def test_staff_only(self):
+        request = RequestFactory().get('/export.jsonl')
+        request.user = AnonymousUser()
+        self.assertEqual(302, export(request, 'jsonl').status_code)
+        request.user = User(username='staff', is_staff=True)
+        resp = export(request, 'jsonl')
+        self.assertEqual(200, resp.status_code)
+        self.assertTrue(resp.streaming)
+        self.assertEqual('attachment; filename=catalog.jsonl',
+                         resp['Content-Disposition'])
+        lines = ''.join(resp.streaming_content).splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertEqual("Letters", json.loads(lines[1])['title'])
+
+    def test_url(self):
+        self.assertEqual('/export.csv', reverse('periodicals_export',
+                                                kwargs={'format': 'csv'}))
+
+
+class TestExportCatalogCommand(ExportTestCase):
+
+    def test_writes_csv(self):
+        out = StringIO()
+        management.call_command('export_catalog', format='csv', stdout=out)
+        self.assertEqual(3, len(out.getvalue().splitlines()))
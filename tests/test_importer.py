@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_importer
+------------
+
+Tests for `django-periodicals` importer module.
+"""
+import json
+import os
+import tempfile
+from datetime import date, datetime
+from StringIO import StringIO
+from django.core import management
+from django.core.cache import cache
+from django.test import TestCase
+from periodicals.importer import (CatalogError, import_catalog,
+                                  read_records)
+from periodicals.models import Author, Periodical, Issue, Article, Series
+from periodicals.counters import article_count
+from periodicals.tagcloud import tag_counts
+
+
+def record(**fields):
+    defaults = dict(periodical="Mad Magazine", volume=1, issue=1,
+                    pub_date="2013-01-01", title="Spy vs Spy",
+                    series="Humor")
+    defaults.update(fields)
+    return defaults
+
+
+class TestImportCatalog(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_creates_objects(self):
+        counts = import_catalog([
+            record(page=1, authors=["Prohias, Antonio"], tags="humor spies"),
+            record(title="Letters", page=2, series="Letters",
+                   authors=[{'first_name': 'Al', 'last_name': 'Jaffee'},
+                            "Prohias, Antonio"]),
+            record(issue=2, pub_date="2013-02-01", title="Letters", page=1,
+                   series="Letters"),
+        ], batch_size=2)
+        self.assertEqual(dict(periodicals=1, issues=2, authors=2,
+                              articles=3, skipped=0), counts)
+        periodical = Periodical.objects.get()
+        self.assertEqual('mad-magazine', periodical.slug)
+        self.assertEqual(['1-2', '1-1'], [issue.slug for issue in
+                                          Issue.objects.all()])
+        article = Article.objects.get(slug='spy-vs-spy')
+        self.assertEqual('/mad-magazine/1-1/spy-vs-spy/',
+                         article.get_absolute_url())
+        self.assertEqual(['prohias-antonio'],
+                         [a.slug for a in article.authors.all()])
+        self.assertEqual(1, article.page)
+        # numbered like AutoSlugField
+        self.assertEqual(['letters', 'letters-2'],
+                         sorted(Article.objects.filter(title="Letters").
+                                values_list('slug', flat=True)))
+
+    def test_updates_derived_data(self):
+        article_count()
+        tag_counts()
+        import_catalog([
+            record(page=1, authors=["Prohias, Antonio"], tags="humor"),
+            record(title="Two", page=2, authors=["Prohias, Antonio"]),
+            record(issue=2, pub_date="2013-02-01", title="Three"),
+        ])
+        self.assertEqual(3, article_count())
+        self.assertEqual({'humor': 1}, tag_counts())
+        self.assertEqual(2, Author.objects.get().article_count)
+        series = Series.objects.get()
+        self.assertEqual(('Humor', 3, date(2013, 2, 1)),
+                         (series.name, series.article_count,
+                          series.latest_pub_date))
+        first, second = Issue.objects.order_by('pub_date')
+        self.assertEqual(second.pk, first.next_issue_id)
+        one = Article.objects.get(title="Spy vs Spy")
+        self.assertEqual(Article.objects.get(title="Two").pk,
+                         one.next_article_id)
+
+    def test_reuses_existing_objects(self):
+        periodical = Periodical(name="Mad Magazine")
+        periodical.save()
+        issue = Issue(periodical=periodical, volume=1, issue=1,
+                      pub_date=datetime(2013, 1, 1))
+        issue.save()
+        author = Author(first_name="Antonio", last_name="Prohias",
+                        slug="antonio")
+        author.save()
+        Article(issue=issue, title="Spy vs Spy", page=1).save()
+        counts = import_catalog([
+            record(page=1),
+            record(title="Other", authors=["Prohias, Antonio"]),
+        ])
+        self.assertEqual(dict(periodicals=0, issues=0, authors=0,
+                              articles=1, skipped=1), counts)
+        self.assertEqual([author], list(Article.objects.get(title="Other").
+                                        authors.all()))
+
+    def test_unique_slugs(self):
+        Author(first_name="Al", last_name="Jaffee").save()
+        Author(first_name="Al.", last_name="Jaffee", slug="jaffee-al-2").save()
+        import_catalog([record(authors=["Jaffee, Al!"])])
+        self.assertEqual('jaffee-al-3',
+                         Author.objects.get(first_name="Al!").slug)
+
+    def test_invalid_record(self):
+        try:
+            import_catalog([record(), record(volume="one")])
+        except CatalogError as e:
+            self.assertEqual(2, e.line)
+        else:
+            self.fail("CatalogError not raised")
+        self.assertFalse(Article.objects.exists())
+
+    def test_resumed_import(self):
+        records = [record(page=1, authors=["Jaffee, Al"]),
+                   record(title="Two", page=2, authors=["Jaffee, Al"]),
+                   record(issue=2, pub_date="2013-02-01", title="Three",
+                          volume="one", authors=["Prohias, Antonio"])]
+        # the first batch is written before the third record fails
+        self.assertRaises(CatalogError, import_catalog, records,
+                          batch_size=2)
+        self.assertEqual(2, Article.objects.count())
+        self.assertEqual(0, Author.objects.get().article_count)
+        records[2]['volume'] = 1
+        counts = import_catalog(records, batch_size=2)
+        self.assertEqual(dict(periodicals=0, issues=1, authors=1,
+                              articles=1, skipped=2), counts)
+        self.assertEqual({'Jaffee': 2, 'Prohias': 1}, dict(
+            Author.objects.values_list('last_name', 'article_count')))
+        one, two = Article.objects.filter(issue__issue=1).order_by('page')
+        self.assertEqual(two.pk, one.next_article_id)
+
+    def test_same_title_and_page(self):
+        # distinct records, e.g. two letters on one page, across batches
+        records = [record(title="Letters", page=2, description="One"),
+                   record(title="Letters", page=2, description="Two"),
+                   record(title="Letters", page=2, description="Three")]
+        counts = import_catalog(records, batch_size=2)
+        self.assertEqual(3, counts['articles'])
+        self.assertEqual(0, counts['skipped'])
+        self.assertEqual(3, Article.objects.filter(title="Letters").count())
+        # running it again writes none of them a second time
+        counts = import_catalog(records, batch_size=2)
+        self.assertEqual(0, counts['articles'])
+        self.assertEqual(3, counts['skipped'])
+        self.assertEqual(3, Article.objects.filter(title="Letters").count())
+
+    def test_page_zero(self):
+        import_catalog([record(page=0), record(title="Cover", page="0"),
+                        record(title="Unnumbered", page="")])
+        self.assertEqual({'Spy vs Spy': 0, 'Cover': 0, 'Unnumbered': None},
+                         dict(Article.objects.values_list('title', 'page')))
+
+
+class TestReadRecords(TestCase):
+
+    def test_csv(self):
+        data = StringIO("periodical,volume,issue,pub_date,title,authors\n"
+                        "Mad,1,2,2013-01-01,Caf\xc3\xa9,"
+                        "\"Jaffee, Al; Prohias, Antonio\"\n")
+        records = list(read_records(data, 'csv'))
+        self.assertEqual(u'Caf\xe9', records[0]['title'])
+        self.assertEqual("Jaffee, Al; Prohias, Antonio",
+                         records[0]['authors'])
+
+    def test_jsonl(self):
+        data = StringIO(json.dumps(record()) + "\n\n" +
+                        json.dumps(record(title="Two")) + "\n")
+        self.assertEqual(["Spy vs Spy", "Two"],
+                         [r['title'] for r in read_records(data, 'jsonl')])
+
+
+class TestImportCatalogCommand(TestCase):
+
+    def test_imports_file(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.write(fd, json.dumps([record(), record(title="Two")]))
+        os.close(fd)
+        try:
+            out = StringIO()
+            management.call_command('import_catalog', path, stdout=out)
+        finally:
+            os.remove(path)
+        self.assertEqual(2, Article.objects.count())
+        self.assertTrue(out.getvalue().startswith("Imported 2 articles"))
+
+    def test_unknown_format(self):
+        self.assertRaises(management.CommandError,
+                          management.call_command, 'import_catalog',
+                          'catalog.txt')
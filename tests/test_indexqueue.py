@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_indexqueue
+------------
+
+Tests for `django-periodicals` queued search index updates.
+"""
+from datetime import datetime
+from StringIO import StringIO
+import mock
+from django.core import management
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from haystack import connection_router, connections
+from haystack.query import SearchQuerySet
+from periodicals.indexqueue import (QueuedSignalProcessor, process_queue,
+                                   remove_articles)
+from periodicals.models import (Author, Periodical, Issue, Article,
+                                IndexUpdate)
+
+
+class IndexQueueTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        management.call_command('clear_index', interactive=False,
+                                verbosity=0)
+        self.processor = QueuedSignalProcessor(connections, connection_router)
+        self.author = Author(last_name="Neuman", first_name="Alfred")
+        self.author.save()
+        self.periodical = Periodical(name="Mad Magazine")
+        self.periodical.save()
+        self.issue = Issue(periodical=self.periodical, volume=1, issue=2,
+                           pub_date=datetime(2013, 1, 1))
+        self.issue.save()
+        self.article = Article(issue=self.issue, title="Spy vs Spy",
+                               description="wordless")
+        self.article.save()
+        self.article.authors.add(self.author)
+        self.article1 = Article(issue=self.issue, title="Letters")
+        self.article1.save()
+
+    def tearDown(self):
+        self.processor.teardown()
+
+    def queued(self):
+        return sorted(set(IndexUpdate.objects.values_list('article_id',
+                                                          flat=True)))
+
+    def search(self, text):
+        return sorted(int(result.pk) for result in
+                      SearchQuerySet().filter(content=text))
+
+
+class TestQueuedSignalProcessor(IndexQueueTestCase):
+
+    def test_queues_changed_articles(self):
+        self.assertEqual([self.article.pk, self.article1.pk], self.queued())
+        IndexUpdate.objects.all().delete()
+        self.author.save()
+        self.assertEqual([self.article.pk], self.queued())
+        IndexUpdate.objects.all().delete()
+        self.periodical.save()
+        self.assertEqual([self.article.pk, self.article1.pk], self.queued())
+        IndexUpdate.objects.all().delete()
+        self.article1.authors.add(self.author)
+        self.assertEqual([self.article1.pk], self.queued())
+        IndexUpdate.objects.all().delete()
+        self.author.articles.clear()
+        self.assertEqual([self.article.pk, self.article1.pk], self.queued())
+
+    def test_save_leaves_index_alone(self):
+        self.assertEqual([], self.search("wordless"))
+
+
+class TestProcessQueue(IndexQueueTestCase):
+
+    def test_updates_in_batches(self):
+        # the Article is queued when saved and when its author is added
+        self.assertEqual(1, process_queue(batch_size=1))
+        self.assertEqual([self.article.pk, self.article1.pk], self.queued())
+        self.assertEqual(1, process_queue(batch_size=1))
+        self.assertEqual([self.article1.pk], self.queued())
+        self.assertEqual(1, process_queue(batch_size=1))
+        self.assertEqual(0, process_queue(batch_size=1))
+        self.assertEqual([self.article.pk], self.search("wordless"))
+        self.assertEqual([self.article.pk], self.search("Neuman"))
+        self.assertEqual([self.article1.pk], self.search("Letters"))
+
+    def test_author_change(self):
+        process_queue()
+        self.author.last_name = "Newman"
+        self.author.save()
+        process_queue()
+        self.assertEqual([self.article.pk], self.search("Newman"))
+
+    def test_removes_deleted(self):
+        process_queue()
+        self.article.delete()
+        self.assertEqual(1, process_queue())
+        self.assertEqual([], self.search("wordless"))
+        self.assertEqual([], self.queued())
+
+    def generation(self):
+        return connections['default'].get_backend().index.refresh().\
+            latest_generation()
+
+    def test_removes_in_one_commit(self):
+        process_queue()
+        generation = self.generation()
+        self.article.delete()
+        self.article1.delete()
+        self.assertEqual(2, process_queue())
+        self.assertEqual(generation + 1, self.generation())
+        self.assertEqual([], self.search("wordless"))
+
+    def test_absent_not_removed(self):
+        # never indexed, e.g. queued again until their publication date
+        self.article.delete()
+        self.article1.delete()
+        generation = self.generation()
+        self.assertEqual(2, process_queue())
+        self.assertEqual(generation, self.generation())
+
+    def test_remove_other_backends(self):
+        backend = mock.Mock()
+        with mock.patch('periodicals.indexqueue._is_whoosh',
+                        return_value=False):
+            with mock.patch.object(connections['default'], 'get_backend',
+                                   return_value=backend):
+                remove_articles([2, 1])
+        self.assertEqual([mock.call('periodicals.article.1', commit=False),
+                          mock.call('periodicals.article.2')],
+                         backend.remove.call_args_list)
+
+    def test_future_articles_wait(self):
+        process_queue()
+        self.issue.pub_date = datetime(2099, 1, 1)
+        self.issue.save()
+        self.assertEqual(2, process_queue())
+        self.assertEqual([], self.search("wordless"))
+        # kept for their publication date, but not read until then
+        self.assertEqual([self.article.pk, self.article1.pk], self.queued())
+        due = timezone.make_aware(datetime(2099, 1, 1),
+                                  timezone.get_default_timezone())
+        self.assertEqual(set([due]), set(IndexUpdate.objects.
+                                         values_list('due', flat=True)))
+        self.assertEqual(0, process_queue())
+        IndexUpdate.objects.update(due=timezone.now())
+        Issue.objects.filter(pk=self.issue.pk).update(
+            pub_date=datetime(2013, 1, 1))
+        self.assertEqual(2, process_queue())
+        self.assertEqual([self.article.pk], self.search("wordless"))
+        self.assertEqual([], self.queued())
+
+    def test_command(self):
+        out = StringIO()
+        management.call_command('update_index_queue', batch_size=2,
+                                stdout=out)
+        self.assertEqual("Updated 2 articles\n", out.getvalue())
+        self.assertEqual([self.article.pk], self.search("wordless"))
+
+    def test_command_interval_survives_errors(self):
+        out = StringIO()
+        command = 'periodicals.management.commands.update_index_queue.'
+        with mock.patch(command + 'process_queue',
+                        side_effect=[IOError, 2, 0]):
+            with mock.patch(command + 'logger') as logger:
+                # stop the loop on the second sleep
+                with mock.patch(command + 'time.sleep',
+                                side_effect=[None, KeyboardInterrupt]):
+                    self.assertRaises(KeyboardInterrupt,
+                                      management.call_command,
+                                      'update_index_queue', interval=60,
+                                      stdout=out)
+        self.assertEqual(1, logger.exception.call_count)
+        self.assertEqual("Updated 2 articles\n", out.getvalue())
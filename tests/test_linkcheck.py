@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_linkcheck
+------------
+
+Tests for `django-periodicals` link checker against a local HTTP server.
+"""
+import socket
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from datetime import datetime
+from SocketServer import ThreadingMixIn
+from StringIO import StringIO
+from django.core import management
+from django.core.cache import cache
+from django.test import TestCase
+from periodicals.linkcheck import (HostThrottle, check_links, check_url,
+                                   delete_dead_links, link_urls,
+                                   record_check)
+from periodicals.models import Periodical, Issue, Article, LinkItem, LinkCheck
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # path: (status of HEAD, status of GET)
+    responses = {
+        '/ok': (200, 200),
+        '/missing': (404, 404),
+        '/no-head': (405, 200),
+        '/error': (500, 500),
+        '/moved': (301, 301),
+    }
+
+    def do_HEAD(self):
+        self.respond(0)
+
+    def do_GET(self):
+        self.respond(1)
+
+    def respond(self, method):
+        self.server.requests.append((self.command, self.path, time.time()))
+        status = self.responses.get(self.path, (404, 404))[method]
+        self.send_response(status)
+        if status == 301:
+            self.send_header('Location', '/ok')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class LinkCheckTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.server = StubServer(('127.0.0.1', 0), StubHandler)
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.root = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, path):
+        return self.root + path
+
+
+class TestCheckUrl(LinkCheckTestCase):
+
+    def test_statuses(self):
+        self.assertEqual((200, ''), check_url(self.url('/ok')))
+        self.assertEqual((404, ''), check_url(self.url('/missing')))
+        self.assertEqual((500, ''), check_url(self.url('/error')))
+        self.assertEqual((200, ''), check_url(self.url('/moved')))
+
+    def test_get_when_head_not_allowed(self):
+        self.assertEqual((200, ''), check_url(self.url('/no-head')))
+        self.assertEqual(['HEAD', 'GET'],
+                         [request[0] for request in self.server.requests])
+
+    def test_connection_refused(self):
+        unused = socket.socket()
+        unused.bind(('127.0.0.1', 0))
+        port = unused.getsockname()[1]
+        unused.close()
+        status, error = check_url('http://127.0.0.1:%d/' % port, timeout=1)
+        self.assertEqual(None, status)
+        self.assertTrue(error)
+
+
+class TestCheckLinks(LinkCheckTestCase):
+
+    def test_checks_every_url(self):
+        urls = [self.url(path) for path in ('/ok', '/missing', '/no-head')]
+        results = sorted(check_links(urls, workers=2, host_delay=0))
+        self.assertEqual([(self.url('/missing'), 404, ''),
+                          (self.url('/no-head'), 200, ''),
+                          (self.url('/ok'), 200, '')], results)
+
+    def test_host_delay(self):
+        urls = [self.url('/ok'), self.url('/missing')]
+        list(check_links(urls, workers=2, host_delay=0.2))
+        times = sorted(request[2] for request in self.server.requests)
+        self.assertTrue(times[1] - times[0] >= 0.15)
+
+    def test_throttle_per_host(self):
+        throttle = HostThrottle(10)
+        start = time.time()
+        throttle.wait('http://one.example.com/a')
+        throttle.wait('http://two.example.com/a')
+        self.assertTrue(time.time() - start < 1)
+
+
+class TestRecordCheck(LinkCheckTestCase):
+
+    def test_counts_failures_in_a_row(self):
+        url = self.url('/missing')
+        self.assertEqual(1, record_check(url, 404, '').failures)
+        self.assertEqual(2, record_check(url, None, 'timed out').failures)
+        check = record_check(url, 200, '')
+        self.assertEqual((200, 0), (check.status, check.failures))
+        self.assertEqual(1, LinkCheck.objects.count())
+
+
+class TestCheckLinksCommand(LinkCheckTestCase):
+
+    def setUp(self):
+        super(TestCheckLinksCommand, self).setUp()
+        periodical = Periodical(name="Mad Magazine")
+        periodical.save()
+        self.issue = Issue(periodical=periodical, volume=1, issue=2,
+                           pub_date=datetime(2013, 1, 1),
+                           read_online=self.url('/ok'))
+        self.issue.save()
+        Article(issue=self.issue, title="One",
+                buy_print=self.url('/no-head')).save()
+        self.dead = self.issue.links.create(url=self.url('/missing'),
+                                            title="Dead",
+                                            status=LinkItem.STATUS_ACTIVE)
+        self.issue.links.create(url=self.url('/ok'), title="Alive",
+                                status=LinkItem.STATUS_ACTIVE)
+
+    def test_link_urls(self):
+        self.assertEqual([self.url('/missing'), self.url('/no-head'),
+                          self.url('/ok')], link_urls())
+
+    def test_command(self):
+        out = StringIO()
+        management.call_command('check_links', host_delay=0,
+                                delete_dead=True, stdout=out)
+        self.assertEqual("Checked 3 urls, 1 dead\nDeleted 0 dead links\n",
+                         out.getvalue())
+        self.assertEqual(404, LinkCheck.objects.get(
+            url=self.url('/missing')).status)
+        management.call_command('check_links', host_delay=0,
+                                delete_dead=True, failures=2,
+                                stdout=StringIO())
+        self.assertEqual(LinkItem.STATUS_DELETED,
+                         LinkItem.objects.get(pk=self.dead.pk).status)
+        self.assertEqual(1, LinkItem.active.count())
+
+    def test_delete_dead_links(self):
+        record_check(self.url('/missing'), 404, '')
+        self.assertEqual([self.dead], delete_dead_links(failures=1))
+        self.assertEqual([], delete_dead_links(failures=1))
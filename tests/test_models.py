@@ -38,6 +38,52 @@ class TestLinkItem(TestCase):
                            title='title')
         self.assertEqual(1, models.LinkItem.active.count())
 
+    def _issue_with_links(self):
+        periodical = models.Periodical(name="Periodical Name")
+        periodical.save()
+        issue = models.Issue(periodical=periodical,
+                             volume=1,
+                             issue=10,
+                             pub_date=datetime(2013, 11, 1))
+        issue.save()
+        for status, title in ((models.LinkItem.STATUS_ACTIVE, 'b'),
+                              (models.LinkItem.STATUS_DELETED, 'c'),
+                              (models.LinkItem.STATUS_SUBMITTED, 'd'),
+                              (models.LinkItem.STATUS_ACTIVE, 'a')):
+            issue.links.create(status=status, url='http://example.com',
+                               title=title)
+        return issue
+
+    def test_active_links_filtered_and_cached(self):
+        issue = models.Issue.objects.get(pk=self._issue_with_links().pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(['a', 'b'],
+                             [link.title for link in issue.active_links()])
+            issue.active_links()
+
+    def test_active_links_uses_prefetched_links(self):
+        issue = models.Issue.objects.prefetch_related('links').get(
+            pk=self._issue_with_links().pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(['a', 'b'],
+                             [link.title for link in issue.active_links()])
+
+    def test_attach(self):
+        issue = self._issue_with_links()
+        article = models.Article(issue=issue, title="Title")
+        article.save()
+        article.links.create(status=models.LinkItem.STATUS_ACTIVE,
+                             url='http://example.com', title='e')
+        issue = models.Issue.objects.get(pk=issue.pk)
+        article = models.Article.objects.get(pk=article.pk)
+        with self.assertNumQueries(1):
+            models.LinkItem.active.attach([issue, article])
+        with self.assertNumQueries(0):
+            self.assertEqual(['a', 'b'],
+                             [link.title for link in issue.active_links()])
+            self.assertEqual(['e'],
+                             [link.title for link in article.active_links()])
+
 
 class TestAuthor(TestCase):
 
@@ -249,8 +295,276 @@ class TestArticle(TestCase):
         article.save()
         self.assertEqual("this-is-the-article-title-2", article.slug)
 
+    def test_get_absolute_url(self):
+        self.article.title = 'a long title'
+        self.article.save()
+        self.assertEqual('periodical-name/1-10/a-long-title/',
+                         self.article.url_path)
+        self.assertEqual('/periodical-name/1-10/a-long-title/',
+                         self.article.get_absolute_url())
+
+    def test_get_absolute_url_without_url_path(self):
+        self.article.slug = 'unsaved'
+        self.assertEqual('/periodical-name/1-10/unsaved/',
+                         self.article.get_absolute_url())
+
+    def test_get_absolute_url_stored_url_path_used(self):
+        self.article.title = 'a long title'
+        self.article.save()
+        article = models.Article.objects.only('url_path').get(pk=self.article.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual('/periodical-name/1-10/a-long-title/',
+                             article.get_absolute_url())
+
+    def test_url_path_follows_issue_and_periodical_slugs(self):
+        self.article.title = 'a long title'
+        self.article.save()
+        self.issue.slug = 'new-issue'
+        self.issue.save()
+        self.assertEqual('periodical-name/new-issue/a-long-title/',
+                         models.Article.objects.get(pk=self.article.pk).url_path)
+        self.periodical.slug = 'new-periodical'
+        self.periodical.save()
+        self.assertEqual('new-periodical/new-issue/a-long-title/',
+                         models.Article.objects.get(pk=self.article.pk).url_path)
+
     def test_article_upload_image(self):
         self.article.title = 'a long title'
         self.article.save()
         self.assertEqual('periodicalname/articles/a-long-title.jpg',
                          self.article.upload_image('example.jpg'))
+
+
+class TestFormat(TestCase):
+
+    def test_reads_only_used_fields(self):
+        author = models.Author(first_name="Al", last_name="Jaffee")
+        compiled = models._CompiledFormat('%(last_name)s, %(first_name)s')
+        self.assertEqual(('first_name', 'last_name'), compiled.names)
+        self.assertEqual(u"Jaffee, Al", compiled(author))
+        self.assertEqual([('first_name', 'first_name'),
+                          ('last_name', 'last_name')],
+                         compiled.attnames[models.Author])
+
+    def test_relations_are_ids(self):
+        issue = models.Issue(periodical_id=3, volume=1, issue=2)
+        self.assertEqual(u"3 1.2",
+                         models.format_fields(
+                             '%(periodical)s %(volume)s.%(issue)s', issue))
+
+    def test_unknown_field(self):
+        self.assertRaises(KeyError, models.format_fields, '%(nickname)s',
+                          models.Author(last_name="Jaffee"))
+
+    def test_compiled_once(self):
+        format = '%(name)s!'
+        models.format_fields(format, models.Periodical(name="Mad"))
+        compiled = models._formats[format]
+        self.assertEqual(u"Cracked!",
+                         models.format_fields(
+                             format, models.Periodical(name="Cracked")))
+        self.assertTrue(compiled is models._formats[format])
+
+
+class TestNeighbors(TestCase):
+
+    def setUp(self):
+        self.periodical = models.Periodical(name="Periodical Name")
+        self.periodical.save()
+        self.issues = []
+        for month in (3, 1, 2):
+            issue = models.Issue(periodical=self.periodical,
+                                 volume=1,
+                                 issue=month,
+                                 pub_date=datetime(2013, month, 1))
+            issue.save()
+            self.issues.append(issue)
+
+    def neighbors(self, obj, previous_field, next_field):
+        obj = obj.__class__.objects.get(pk=obj.pk)
+        return (getattr(obj, previous_field), getattr(obj, next_field))
+
+    def issue_neighbors(self, issue):
+        return self.neighbors(issue, 'previous_issue', 'next_issue')
+
+    def test_issues_linked_by_pub_date(self):
+        march, january, february = self.issues
+        self.assertEqual((None, february), self.issue_neighbors(january))
+        self.assertEqual((january, march), self.issue_neighbors(february))
+        self.assertEqual((february, None), self.issue_neighbors(march))
+
+    def test_issue_pub_date_change_relinks(self):
+        march, january, february = self.issues
+        january.pub_date = datetime(2013, 4, 1)
+        january.save()
+        self.assertEqual((None, march), self.issue_neighbors(february))
+        self.assertEqual((march, None), self.issue_neighbors(january))
+
+    def test_issue_delete_relinks(self):
+        march, january, february = self.issues
+        february.delete()
+        self.assertEqual((None, march), self.issue_neighbors(january))
+        self.assertEqual((january, None), self.issue_neighbors(march))
+
+    def test_issues_in_other_periodicals_are_not_neighbors(self):
+        other = models.Periodical(name="Other")
+        other.save()
+        issue = models.Issue(periodical=other,
+                             volume=1,
+                             issue=1,
+                             pub_date=datetime(2013, 2, 15))
+        issue.save()
+        self.assertEqual((None, None), self.issue_neighbors(issue))
+        march, january, february = self.issues
+        self.assertEqual((january, march), self.issue_neighbors(february))
+
+    def test_issue_moved_to_other_periodical_relinks_both(self):
+        march, january, february = self.issues
+        other = models.Periodical(name="Other")
+        other.save()
+        february.periodical = other
+        february.save()
+        self.assertEqual((None, march), self.issue_neighbors(january))
+        self.assertEqual((None, None), self.issue_neighbors(february))
+
+    def test_articles_linked_by_page(self):
+        issue = self.issues[0]
+        articles = []
+        for page in (5, None, 1, 3):
+            article = models.Article(issue=issue, title="Page %s" % page,
+                                     page=page)
+            article.save()
+            articles.append(article)
+        five, no_page, one, three = articles
+        link = lambda a: self.neighbors(a, 'previous_article', 'next_article')
+        self.assertEqual((None, three), link(one))
+        self.assertEqual((one, five), link(three))
+        self.assertEqual((three, None), link(five))
+        self.assertEqual((None, None), link(no_page))
+        three.page = None
+        three.save()
+        self.assertEqual((None, five), link(one))
+        self.assertEqual((None, None), link(three))
+
+
+class TestAuthorArticleCount(TestCase):
+
+    def setUp(self):
+        periodical = models.Periodical(name="Periodical Name")
+        periodical.save()
+        self.issue = models.Issue(periodical=periodical, volume=1, issue=1,
+                                  pub_date=datetime(2013, 1, 1))
+        self.issue.save()
+        self.author = models.Author(first_name="Alfred", last_name="Newman")
+        self.author.save()
+        self.author2 = models.Author(first_name="Jane", last_name="Doe")
+        self.author2.save()
+        self.article = models.Article(issue=self.issue, title="One")
+        self.article.save()
+        self.article2 = models.Article(issue=self.issue, title="Two")
+        self.article2.save()
+
+    def counts(self):
+        return dict(models.Author.objects.values_list('last_name',
+                                                      'article_count'))
+
+    def test_add_and_remove(self):
+        self.article.authors.add(self.author, self.author2)
+        self.article2.authors.add(self.author)
+        self.assertEqual({'Newman': 2, 'Doe': 1}, self.counts())
+        self.article.authors.remove(self.author)
+        self.assertEqual({'Newman': 1, 'Doe': 1}, self.counts())
+
+    def test_clear(self):
+        self.article.authors.add(self.author, self.author2)
+        self.article.authors.clear()
+        self.assertEqual({'Newman': 0, 'Doe': 0}, self.counts())
+
+    def test_reverse_changes(self):
+        self.author.articles.add(self.article, self.article2)
+        self.assertEqual({'Newman': 2, 'Doe': 0}, self.counts())
+        self.author.articles.clear()
+        self.assertEqual({'Newman': 0, 'Doe': 0}, self.counts())
+
+    def test_article_delete(self):
+        self.article.authors.add(self.author)
+        self.article2.authors.add(self.author)
+        self.article.delete()
+        self.assertEqual({'Newman': 1, 'Doe': 0}, self.counts())
+
+    def test_saving_author_keeps_count(self):
+        author = models.Author.objects.get(pk=self.author.pk)
+        self.article.authors.add(self.author)
+        author.website = "http://example.com/"
+        author.save()
+        self.assertEqual({'Newman': 1, 'Doe': 0}, self.counts())
+        self.assertEqual("http://example.com/",
+                         models.Author.objects.get(pk=author.pk).website)
+
+    def test_recount_authors(self):
+        self.article.authors.add(self.author)
+        models.Author.objects.update(article_count=5)
+        self.assertEqual(2, models.recount_authors(
+            models.Author.objects.all()))
+        self.assertEqual({'Newman': 1, 'Doe': 0}, self.counts())
+        self.assertEqual(0, models.recount_authors(
+            models.Author.objects.all()))
+
+
+class TestSeries(TestCase):
+
+    def setUp(self):
+        self.periodical = models.Periodical(name="Periodical Name")
+        self.periodical.save()
+        self.issue1 = models.Issue(periodical=self.periodical, volume=1,
+                                   issue=1, pub_date=datetime(2013, 1, 1))
+        self.issue1.save()
+        self.issue2 = models.Issue(periodical=self.periodical, volume=1,
+                                   issue=2, pub_date=datetime(2013, 2, 1))
+        self.issue2.save()
+
+    def article(self, issue, series, title):
+        article = models.Article(issue=issue, series=series, title=title)
+        article.save()
+        return article
+
+    def series(self):
+        return [(s.name, s.slug, s.article_count, s.latest_pub_date.day,
+                 s.latest_pub_date.month) for s in
+                models.Series.objects.filter(periodical=self.periodical)]
+
+    def test_maintained_on_article_changes(self):
+        self.article(self.issue1, "Humor", "One")
+        article = self.article(self.issue2, "Humor", "Two")
+        self.article(self.issue1, "", "Three")
+        self.assertEqual([('Humor', 'humor', 2, 1, 2)], self.series())
+        article.series = "Editorial"
+        article.save()
+        self.assertEqual([('Editorial', 'editorial', 1, 1, 2),
+                          ('Humor', 'humor', 1, 1, 1)], self.series())
+        article.delete()
+        self.assertEqual([('Humor', 'humor', 1, 1, 1)], self.series())
+
+    def test_maintained_on_issue_changes(self):
+        self.article(self.issue1, "Humor", "One")
+        self.issue1.pub_date = datetime(2013, 3, 1)
+        self.issue1.save()
+        self.assertEqual([('Humor', 'humor', 1, 1, 3)], self.series())
+        other = models.Periodical(name="Other")
+        other.save()
+        self.issue1.periodical = other
+        self.issue1.save()
+        self.assertEqual([], self.series())
+        self.assertEqual(1, models.Series.objects.get(periodical=other).
+                         article_count)
+
+    def test_unique_slugs(self):
+        self.article(self.issue1, "Humor", "One")
+        self.article(self.issue1, "Humor!", "Two")
+        self.assertEqual(['humor', 'humor-2'],
+                         [s[1] for s in self.series()])
+
+    def test_get_absolute_url(self):
+        self.article(self.issue1, "Humor", "One")
+        self.assertEqual('/periodical-name/series/humor/',
+                         models.Series.objects.get().get_absolute_url())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_notifications
+------------
+
+Tests for `django-periodicals` link notifications.
+"""
+import os
+from datetime import datetime
+from StringIO import StringIO
+import mock
+from django.core import mail, management
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+from periodicals.models import Periodical, Issue, LinkItem, LinkNotification
+from periodicals.notifications import notify_link_added, send_link_digest
+# sets the defaults of its settings before they are overridden
+from periodicals import views  # noqa
+
+os.environ['RECAPTCHA_TESTING'] = 'True'
+
+
+@override_settings(MANAGERS=(('Manager', 'manager@example.com'),))
+class TestLinkNotifications(TestCase):
+
+    def setUp(self):
+        self.periodical = Periodical(name="Mad Magazine")
+        self.periodical.save()
+        self.issue = Issue(periodical=self.periodical, volume=1, issue=2,
+                           pub_date=datetime(2013, 1, 1))
+        self.issue.save()
+
+    def add_link(self, title):
+        return self.client.post(
+            reverse('periodicals_add_issue_link',
+                    kwargs={'periodical_slug': self.periodical.slug,
+                            'issue_slug': self.issue.slug}),
+            {'title': title,
+             'url': 'http://example.com/%s' % title,
+             'recaptcha_response_field': "PASSED"})
+
+    def test_submission_is_queued(self):
+        self.assertEqual(302, self.add_link('one').status_code)
+        self.assertEqual([], mail.outbox)
+        notification = LinkNotification.objects.get()
+        self.assertEqual('one', notification.link.title)
+        self.assertEqual(self.issue.get_absolute_url(), notification.page_url)
+
+    @override_settings(PERIODICALS_EMAIL_NOTIFY=False)
+    def test_notify_disabled(self):
+        self.add_link('one')
+        self.assertFalse(LinkNotification.objects.exists())
+
+    def test_digest(self):
+        self.add_link('one')
+        self.add_link('two')
+        self.assertEqual(2, send_link_digest())
+        self.assertEqual(1, len(mail.outbox))
+        message = mail.outbox[0]
+        self.assertTrue(message.subject.endswith("2 New Links Added"))
+        self.assertTrue('http://example.com/one' in message.body)
+        self.assertTrue('http://example.com/two' in message.body)
+        self.assertTrue('Link added to: http://example.com%s' %
+                        self.issue.get_absolute_url() in message.body)
+        self.assertFalse(LinkNotification.objects.exists())
+        self.assertEqual(0, send_link_digest())
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_admin_url(self):
+        link = self.issue.links.create(url='http://example.com/',
+                                       title='one')
+        notify_link_added(link, self.issue, '/admin/issue/1/')
+        send_link_digest()
+        self.assertTrue(mail.outbox[0].body.endswith(
+            ' admin: http://example.com/admin/issue/1/'))
+        self.assertTrue(mail.outbox[0].subject.endswith("New Link Added"))
+
+    def test_kept_when_sending_fails(self):
+        self.add_link('one')
+        with mock.patch('periodicals.notifications.mail_managers',
+                        side_effect=IOError):
+            self.assertRaises(IOError, send_link_digest)
+        self.assertEqual(1, LinkNotification.objects.count())
+
+    def test_deleted_link(self):
+        self.add_link('one')
+        LinkItem.objects.all().delete()
+        self.assertEqual(0, send_link_digest())
+
+    def test_command(self):
+        self.add_link('one')
+        out = StringIO()
+        management.call_command('send_link_notifications', stdout=out)
+        self.assertEqual("Sent 1 link notifications\n", out.getvalue())
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_command_interval_survives_errors(self):
+        out = StringIO()
+        command = 'periodicals.management.commands.send_link_notifications.'
+        with mock.patch(command + 'send_link_digest',
+                        side_effect=[IOError, 2]):
+            with mock.patch(command + 'logger') as logger:
+                # stop the loop on the second sleep
+                with mock.patch(command + 'time.sleep',
+                                side_effect=[None, KeyboardInterrupt]):
+                    self.assertRaises(KeyboardInterrupt,
+                                      management.call_command,
+                                      'send_link_notifications', interval=60,
+                                      stdout=out)
+        self.assertEqual(1, logger.exception.call_count)
+        self.assertEqual("Sent 2 link notifications\n", out.getvalue())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_pagecache
+------------
+
+Tests for `django-periodicals` pagecache module.
+"""
+from datetime import datetime
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.client import Client
+from django.test.utils import override_settings
+from periodicals.models import Author, Periodical, Issue, Article, LinkItem
+from periodicals.pagecache import page_cache_stats
+
+
+@override_settings(PERIODICALS_PAGE_CACHE_TIMEOUT=60)
+class TestPageCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = Author(last_name='Newman', first_name='Alfred')
+        self.author.save()
+        self.periodical = Periodical(name="Mad Magazine")
+        self.periodical.save()
+        self.issue = Issue(periodical=self.periodical, volume=1, issue=10,
+                           pub_date=datetime(2011, 10, 1))
+        self.issue.save()
+        self.article = Article(issue=self.issue, title="What me worry?")
+        self.article.save()
+        self.article.authors.add(self.author)
+        self.issue_url = self.issue.get_absolute_url()
+
+    def test_hit(self):
+        first = self.client.get(self.issue_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.issue_url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual({'hits': 1, 'misses': 1}, page_cache_stats())
+
+    def test_hit_not_modified(self):
+        etag = self.client.get(self.issue_url)['ETag']
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.issue_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, resp.status_code)
+
+    def test_hit_not_modified_since(self):
+        last_modified = self.client.get(self.issue_url)['Last-Modified']
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.issue_url,
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(304, resp.status_code)
+        self.assertEqual(last_modified, resp['Last-Modified'])
+
+    def test_hit_modified_since(self):
+        self.client.get(self.issue_url)
+        resp = self.client.get(
+            self.issue_url,
+            HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT')
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(1, page_cache_stats()['hits'])
+
+    def test_other_periodical_article_invalidates(self):
+        # the article count at the top of every page changes
+        self.client.get(self.issue_url)
+        other = Periodical(name="Cracked")
+        other.save()
+        issue = Issue(periodical=other, volume=1, issue=1,
+                      pub_date=datetime(2011, 10, 1))
+        issue.save()
+        Article(issue=issue, title="Wild ride").save()
+        self.client.get(self.issue_url)
+        self.assertEqual(0, page_cache_stats()['hits'])
+
+    def test_article_change_invalidates(self):
+        self.client.get(self.issue_url)
+        self.article.title = "Worry"
+        self.article.save()
+        self.assertTrue("Worry" in self.client.get(self.issue_url).content)
+        self.assertEqual(0, page_cache_stats()['hits'])
+
+    def test_author_change_invalidates(self):
+        author_url = reverse('periodicals_author_detail',
+                             kwargs={'author_slug': self.author.slug})
+        self.client.get(self.issue_url)
+        self.client.get(author_url)
+        self.author.first_name = "Al"
+        self.author.save()
+        self.assertTrue("Newman, Al " in
+                        self.client.get(self.issue_url).content)
+        self.assertTrue("Author: Newman, Al " in
+                        self.client.get(author_url).content)
+        self.assertEqual(0, page_cache_stats()['hits'])
+
+    def test_active_link_invalidates(self):
+        self.client.get(self.issue_url)
+        self.issue.links.create(status=LinkItem.STATUS_ACTIVE,
+                                url='http://example.com',
+                                title='Example Link')
+        self.assertTrue('Example Link' in
+                        self.client.get(self.issue_url).content)
+
+    def test_other_periodical_not_invalidated(self):
+        self.client.get(self.issue_url)
+        other = Periodical(name="Cracked")
+        other.save()
+        self.client.get(self.issue_url)
+        self.assertEqual(1, page_cache_stats()['hits'])
+
+    def test_csrf_token_per_visitor(self):
+        first, second = Client(), Client()
+        first.get(self.issue_url)
+        resp = second.get(self.issue_url)
+        self.assertEqual(1, page_cache_stats()['hits'])
+        token = resp.cookies['csrftoken'].value
+        self.assertTrue(token in resp.content)
+        self.assertFalse(first.cookies['csrftoken'].value in resp.content)
+
+    @override_settings(PERIODICALS_PAGE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        self.client.get(self.issue_url)
+        self.client.get(self.issue_url)
+        self.assertEqual({'hits': 0, 'misses': 0}, page_cache_stats())
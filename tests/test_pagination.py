@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_pagination
+------------
+
+Tests for `django-periodicals` pagination module.
+"""
+from datetime import datetime
+import mock
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from periodicals import models
+from periodicals.pagination import (KeysetPaginator, InvalidCursor,
+                                    encode_cursor)
+from periodicals.views import AuthorList, SeriesDetail
+
+
+class TestKeysetPaginator(TestCase):
+
+    def setUp(self):
+        for last_name, first_name in (('Doe', 'Jane'), ('Doe', 'John'),
+                                      ('Adams', 'Ann'), ('Doe', 'Al'),
+                                      ('Zed', 'Zoe')):
+            models.Author(last_name=last_name, first_name=first_name).save()
+        self.paginator = KeysetPaginator(models.Author.objects.all(), 2,
+                                         ('last_name', 'first_name', 'pk'))
+
+    def names(self, page):
+        return [author.first_name for author in page.object_list]
+
+    def test_pages_forward_and_back(self):
+        page1 = self.paginator.page()
+        self.assertEqual(['Ann', 'Al'], self.names(page1))
+        self.assertFalse(page1.has_previous())
+        self.assertTrue(page1.has_next())
+        page2 = self.paginator.page(page1.next_page_number())
+        self.assertEqual(['Jane', 'John'], self.names(page2))
+        self.assertTrue(page2.has_previous())
+        page3 = self.paginator.page(page2.next_page_number())
+        self.assertEqual(['Zoe'], self.names(page3))
+        self.assertFalse(page3.has_next())
+        back = self.paginator.page(page3.previous_page_number())
+        self.assertEqual(['Jane', 'John'], self.names(back))
+        self.assertTrue(back.has_previous())
+        self.assertTrue(back.has_next())
+        first = self.paginator.page(back.previous_page_number())
+        self.assertEqual(['Ann', 'Al'], self.names(first))
+        self.assertFalse(first.has_previous())
+
+    def test_page_is_one_query(self):
+        cursor = self.paginator.page().next_page_number()
+        with self.assertNumQueries(1):
+            self.paginator.page(cursor)
+
+    def test_invalid_cursor(self):
+        self.assertRaises(InvalidCursor, self.paginator.page, 'garbage')
+        self.assertRaises(InvalidCursor, self.paginator.page,
+                          encode_cursor('n', ['Doe']))
+
+
+class TestKeysetViews(TestCase):
+
+    def setUp(self):
+        periodical = models.Periodical(name="Mad Magazine")
+        periodical.save()
+        self.periodical = periodical
+        for month in range(1, 4):
+            issue = models.Issue(periodical=periodical, volume=1,
+                                 issue=month,
+                                 pub_date=datetime(2011, month, 1))
+            issue.save()
+            models.Article(issue=issue, series="Editorial",
+                           title="Article %d" % month).save()
+        for name in ('Alpha', 'Beta', 'Gamma'):
+            models.Author(last_name=name, first_name="First").save()
+
+    def test_author_list(self):
+        url = reverse('periodicals_authors_list')
+        with self.settings(PERIODICALS_KEYSET_PAGINATION=True):
+            with mock.patch.object(AuthorList, 'paginate_by', 2):
+                resp = self.client.get(url)
+                self.assertEqual(['Alpha', 'Beta'],
+                                 [a.last_name for a in
+                                  resp.context['author_list']])
+                cursor = resp.context['page_obj'].next_page_number()
+                self.assertTrue(cursor in resp.content)
+                resp = self.client.get(url, {'page': cursor})
+                self.assertEqual(['Gamma'],
+                                 [a.last_name for a in
+                                  resp.context['author_list']])
+                self.assertEqual(404, self.client.get(
+                    url, {'page': 'garbage'}).status_code)
+
+    def test_series_detail(self):
+        url = reverse('periodicals_series_detail',
+                      kwargs={'periodical_slug': self.periodical.slug,
+                              'series_slug': 'editorial'})
+        with self.settings(PERIODICALS_KEYSET_PAGINATION=True):
+            with mock.patch.object(SeriesDetail, 'paginate_by', 2):
+                resp = self.client.get(url)
+                self.assertEqual(['Article 3', 'Article 2'],
+                                 [a.title for a in
+                                  resp.context['article_list']])
+                resp = self.client.get(url, {
+                    'page': resp.context['page_obj'].next_page_number()})
+                self.assertEqual(['Article 1'],
+                                 [a.title for a in
+                                  resp.context['article_list']])
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_reindex
+------------
+
+Tests for `django-periodicals` search index rebuilding.
+"""
+import os
+import tempfile
+from datetime import datetime
+from StringIO import StringIO
+from django.core import management
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from haystack import connections as search_connections
+from haystack.query import SearchQuerySet
+from periodicals.models import Author, Periodical, Issue, Article
+from periodicals.reindex import (article_index, id_ranges, prepare_range,
+                                 rebuild_index, stale_ids)
+
+
+class ReindexTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        management.call_command('clear_index', interactive=False,
+                                verbosity=0)
+        author = Author(last_name="Neuman", first_name="Alfred")
+        author.save()
+        periodical = Periodical(name="Mad Magazine")
+        periodical.save()
+        self.articles = []
+        for number, pub_date in ((1, datetime(2013, 1, 1)),
+                                 (2, datetime(2013, 2, 1)),
+                                 (3, datetime(2099, 1, 1))):
+            issue = Issue(periodical=periodical, volume=1, issue=number,
+                          pub_date=pub_date)
+            issue.save()
+            article = Article(issue=issue, title="Spy vs Spy %d" % number,
+                              tags="humor spies")
+            article.save()
+            article.authors.add(author)
+            self.articles.append(article)
+
+    def search(self, text):
+        return sorted(int(result.pk) for result in
+                      SearchQuerySet().filter(content=text))
+
+
+class TestArticleIndex(ReindexTestCase):
+
+    def test_index_queryset_queries(self):
+        index = article_index()
+        cache.clear()
+        # the Articles with their Issue and Periodical, then the Authors
+        with self.assertNumQueries(2):
+            documents = [index.full_prepare(article) for article in
+                         index.index_queryset()]
+        self.assertEqual(2, len(documents))
+        self.assertTrue("Neuman" in documents[0]['text'])
+        self.assertTrue("spies" in documents[0]['text'])
+        self.assertTrue("Mad Magazine" in documents[0]['result_text'])
+
+
+class TestRebuildIndex(ReindexTestCase):
+
+    def test_id_ranges(self):
+        first = self.articles[0].pk
+        self.assertEqual([(first, first + 2), (first + 2, first + 4)],
+                         id_ranges(Article.objects.all(), 2))
+        self.assertEqual([], id_ranges(Article.objects.none(), 2))
+
+    def test_prepare_range(self):
+        first = self.articles[0].pk
+        documents = prepare_range((first + 1, first + 3, 'default'))
+        self.assertEqual(['periodicals.article.%d' % (first + 1)],
+                         [document['id'] for document in documents])
+
+    def test_rebuild(self):
+        article = self.articles[0]
+        management.call_command('update_index', verbosity=0)
+        Article.objects.filter(pk=article.pk).update(title="Letters")
+        calls = []
+        self.assertEqual(2, rebuild_index(workers=1, batch_size=1,
+                                          progress=lambda *args:
+                                          calls.append(args)))
+        self.assertEqual([(1, 2), (2, 2)], calls)
+        self.assertEqual([article.pk], self.search("Letters"))
+        self.assertEqual([self.articles[1].pk], self.search("Spy"))
+
+    def test_stale_documents_removed(self):
+        management.call_command('update_index', verbosity=0)
+        # no longer published, and deleted without updating the index
+        Issue.objects.filter(pk=self.articles[0].issue_id).update(
+            pub_date=datetime(2099, 1, 1))
+        Article.objects.filter(pk=self.articles[1].pk).delete()
+        self.assertEqual(sorted(str(article.pk)
+                                for article in self.articles[:2]),
+                         sorted(stale_ids(set(), batch_size=1)))
+        index = search_connections['default'].get_backend().index
+        generation = index.refresh().latest_generation()
+        self.assertEqual(0, rebuild_index(workers=1, batch_size=1))
+        self.assertEqual([], self.search("Spy"))
+        # both removed with one commit
+        self.assertEqual(generation + 1,
+                         index.refresh().latest_generation())
+
+    def test_command(self):
+        out = StringIO()
+        management.call_command('rebuild_article_index', workers=1,
+                                interactive=False, stdout=out)
+        self.assertEqual("Indexed 2 of 2 articles\nIndexed 2 articles\n",
+                         out.getvalue())
+        self.assertEqual(sorted(article.pk for article in self.articles[:2]),
+                         self.search("humor"))
+
+
+class TestRebuildIndexPool(TransactionTestCase):
+    """
+    The worker processes can't open the in-memory test database, so the
+    Articles are written to a database file for them.
+    """
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.connection = connections['default']
+        self.saved = (self.connection.settings_dict['NAME'],
+                      self.connection.connection)
+        self.connection.connection = None
+        self.connection.settings_dict['NAME'] = self.path
+        management.call_command('syncdb', interactive=False, verbosity=0)
+        management.call_command('clear_index', interactive=False,
+                                verbosity=0)
+        periodical = Periodical(name="Mad Magazine")
+        periodical.save()
+        issue = Issue(periodical=periodical, volume=1, issue=1,
+                      pub_date=datetime(2013, 1, 1))
+        issue.save()
+        self.articles = [Article.objects.create(issue=issue,
+                                                title="Spy vs Spy %d" % n)
+                         for n in range(5)]
+
+    def tearDown(self):
+        self.connection.close()
+        self.connection.settings_dict['NAME'], self.connection.connection = \
+            self.saved
+        os.remove(self.path)
+
+    def test_workers(self):
+        self.assertEqual(5, rebuild_index(workers=2, batch_size=2))
+        self.assertEqual(sorted(article.pk for article in self.articles),
+                         sorted(int(result.pk) for result in
+                                SearchQuerySet().filter(content="Spy")))
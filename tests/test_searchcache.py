@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_searchcache
+------------
+
+Tests for `django-periodicals` search result caching.
+"""
+from datetime import datetime
+from django.core import management
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+from haystack import connections
+from haystack.query import SearchQuerySet
+from periodicals.models import Periodical, Issue, Article
+from periodicals.searchcache import (VERSION_KEY, SearchHits, cached_hits,
+                                     invalidate_search_results,
+                                     normalize_query, search_key)
+from periodicals.signals import search_index_changed
+
+
+class SearchCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        periodical = Periodical(name="Mad Magazine")
+        periodical.save()
+        self.articles = []
+        for number in range(1, 4):
+            issue = Issue(periodical=periodical, volume=1, issue=number,
+                          pub_date=datetime(2013, number, 1))
+            issue.save()
+            article = Article(issue=issue, title="Spy vs Spy %d" % number)
+            article.save()
+            self.articles.append(article)
+        management.call_command('rebuild_index', interactive=False,
+                                verbosity=0)
+
+    def search(self):
+        return SearchQuerySet().order_by('-pub_date').auto_query('spy')
+
+    def newest_first(self):
+        return [article.pk for article in reversed(self.articles)]
+
+
+class TestSearchKey(SearchCacheTestCase):
+
+    def test_normalize_query(self):
+        self.assertEqual(u"spy vs spy", normalize_query(u"  Spy\tVS  spy "))
+
+    def test_key(self):
+        key = search_key(u"Spy vs  Spy")
+        self.assertEqual(key, search_key(u"spy vs spy"))
+        self.assertNotEqual(key, search_key(u"spy vs spy", ['periodicals']))
+        self.assertNotEqual(key, search_key(u"caf\xe9"))
+        invalidate_search_results()
+        self.assertNotEqual(key, search_key(u"spy vs spy"))
+
+    def test_evicted_version_is_not_reused(self):
+        key = search_key(u"spy")
+        cache.delete(VERSION_KEY)
+        self.assertNotEqual(key, search_key(u"spy"))
+
+    def test_article_changes_invalidate(self):
+        key = search_key(u"spy")
+        self.articles[0].save()
+        self.assertNotEqual(key, search_key(u"spy"))
+        key = search_key(u"spy")
+        self.articles[0].delete()
+        self.assertNotEqual(key, search_key(u"spy"))
+
+
+class TestCachedHits(SearchCacheTestCase):
+
+    def test_cached(self):
+        key = search_key(u"spy")
+        self.assertEqual((self.newest_first(), 3),
+                         cached_hits(key, self.search()))
+        connections['default'].get_backend().clear()
+        self.assertEqual((self.newest_first(), 3),
+                         cached_hits(key, self.search()))
+        search_index_changed.send(sender=Article, using='default')
+        self.assertEqual(([], 0), cached_hits(search_key(u"spy"),
+                                              self.search()))
+
+    @override_settings(PERIODICALS_SEARCH_CACHE_HITS=1)
+    def test_pages(self):
+        ids, count = cached_hits(search_key(u"spy"), self.search())
+        self.assertEqual(1, len(ids))
+        hits = SearchHits(ids, count, self.search())
+        self.assertEqual(3, len(hits))
+        with self.assertNumQueries(1):
+            page = hits[0:1]
+            self.assertEqual(self.articles[2].title, page[0].object.title)
+            self.assertEqual("Mad Magazine",
+                             page[0].object.issue.periodical.name)
+        self.assertTrue(page is hits[0:1])
+        # pages past the cached ids are searched for
+        self.assertEqual(self.newest_first()[1:2],
+                         [hit.pk for hit in hits[1:2]])
+        self.assertEqual(self.newest_first()[2:],
+                         [hit.pk for hit in hits[2:3]])
+
+    def test_deleted_articles_left_out(self):
+        ids, count = cached_hits(search_key(u"spy"), self.search())
+        self.articles[1].delete()
+        self.assertEqual([self.articles[2].pk, self.articles[0].pk],
+                         [hit.pk for hit in SearchHits(ids, count,
+                                                       self.search())[0:3]])
+
+
+class TestCachedSearchView(SearchCacheTestCase):
+
+    def test_paged_search(self):
+        resp = self.client.get(reverse('haystack_search'), {'q': 'Spy'})
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual('Spy', resp.context['query'])
+        self.assertEqual(self.newest_first(),
+                         [hit.pk for hit in resp.context['page'].object_list])
+        connections['default'].get_backend().clear()
+        resp = self.client.get(reverse('haystack_search'), {'q': ' spy '})
+        self.assertEqual(3, len(resp.context['page'].object_list))
+        self.assertContains(resp, "Spy vs Spy 3")
+
+    def test_no_query(self):
+        resp = self.client.get(reverse('haystack_search'))
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual([], list(resp.context['page'].object_list))
@@ -6,10 +6,18 @@ test_sitemaps
 
 Tests for `django-periodicals` sitemaps module.
 """
+import gzip
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from StringIO import StringIO
+from django.contrib.sites.models import Site
+from django.core import management
 from django.test import TestCase
 from tagging.models import Tag
-from periodicals.models import Periodical
-from periodicals.sitemaps import (sitemaps, sitemaps_at,
+from periodicals.models import Periodical, Issue, Article
+from periodicals.sitemaps import (sitemaps, sitemaps_at, write_sitemaps,
                                   SlugSitemap, SuffixedSitemap)
 
 
@@ -49,3 +57,157 @@ class TestSuffixedSitemap(TestCase):
     def test_location(self):
         tag = Periodical(slug='clean-run')
         self.assertEqual('/clean-run/online/', self.sitemap.location(tag))
+
+
+class TestPagedSitemaps(TestCase):
+    urls = 'tests.urls'
+
+    def setUp(self):
+        periodical = Periodical(name="Clean Run")
+        periodical.save()
+        issue = Issue(periodical=periodical,
+                      volume=1,
+                      issue=2,
+                      pub_date=datetime(2013, 1, 1))
+        issue.save()
+        self.articles = []
+        for title in ("First", "Second", "Third"):
+            article = Article(issue=issue, title=title)
+            article.save()
+            self.articles.append(article)
+        self.sitemap = sitemaps['periodicals_article_detail']
+        self.limit = self.sitemap.limit
+
+    def tearDown(self):
+        self.sitemap.limit = self.limit
+
+    def test_iter_urls_loads_page_without_related_objects(self):
+        site = Site(domain='example.com')
+        with self.assertNumQueries(2):
+            urls = list(self.sitemap.iter_urls(page=1, site=site))
+        self.assertEqual(['http://example.com/periodicals/clean-run/1-2/first/',
+                          'http://example.com/periodicals/clean-run/1-2/second/',
+                          'http://example.com/periodicals/clean-run/1-2/third/'],
+                         [url['location'] for url in urls])
+        self.assertEqual('0.7', urls[0]['priority'])
+        self.assertEqual(self.articles[0].modified, urls[0]['lastmod'])
+
+    def test_sitemap_section(self):
+        resp = self.client.get('/sitemap-periodicals_article_detail.xml')
+        self.assertEqual(200, resp.status_code)
+        content = ''.join(resp.streaming_content)
+        self.assertTrue(content.startswith('<?xml'))
+        self.assertEqual(3, content.count('<url>'))
+        self.assertTrue('<loc>http://example.com/periodicals/clean-run/1-2/first/</loc>' in content)
+
+    def test_issue_sitemap_section(self):
+        resp = self.client.get('/sitemap-periodicals_issue_detail.xml')
+        content = ''.join(resp.streaming_content)
+        self.assertTrue('<loc>http://example.com/periodicals/clean-run/1-2/</loc>' in content)
+
+    def test_sitemap_section_pages(self):
+        self.sitemap.limit = 2
+        resp = self.client.get('/sitemap-periodicals_article_detail.xml',
+                               {'p': 2})
+        content = ''.join(resp.streaming_content)
+        self.assertEqual(1, content.count('<url>'))
+        self.assertTrue('/third/' in content)
+        resp = self.client.get('/sitemap-periodicals_article_detail.xml',
+                               {'p': 3})
+        self.assertEqual(404, resp.status_code)
+
+    def test_unknown_section(self):
+        resp = self.client.get('/sitemap-unknown.xml')
+        self.assertEqual(404, resp.status_code)
+
+    def test_index_lists_every_page(self):
+        self.sitemap.limit = 2
+        resp = self.client.get('/sitemap.xml')
+        self.assertEqual(200, resp.status_code)
+        content = ''.join(resp.streaming_content)
+        self.assertTrue('<loc>http://example.com/sitemap-periodicals_article_detail.xml</loc>' in content)
+        self.assertTrue('<loc>http://example.com/sitemap-periodicals_article_detail.xml?p=2</loc>' in content)
+        self.assertFalse('p=3' in content)
+        self.assertTrue('<loc>http://example.com/sitemap-periodicals_issue_detail.xml</loc>' in content)
+
+
+class TestWriteSitemaps(TestCase):
+    urls = 'tests.urls'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.site = Site(domain='example.com')
+        periodical = Periodical(name="Clean Run")
+        periodical.save()
+        self.issue = Issue(periodical=periodical,
+                           volume=1,
+                           issue=2,
+                           pub_date=datetime(2013, 1, 1))
+        self.issue.save()
+        Article(issue=self.issue, title="First").save()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self):
+        return write_sitemaps(sitemaps, self.directory,
+                              'http://example.com/sitemaps/', self.site)
+
+    def read(self, filename):
+        f = gzip.open(os.path.join(self.directory, filename))
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def test_writes_gzipped_sections_and_index(self):
+        self.assertEqual(sorted(sitemaps), self.write())
+        self.assertTrue('<loc>http://example.com/periodicals/clean-run/1-2/first/</loc>' in
+                        self.read('sitemap-periodicals_article_detail-1.xml.gz'))
+        with open(os.path.join(self.directory, 'sitemap.xml')) as f:
+            index = f.read()
+        self.assertTrue('<loc>http://example.com/sitemaps/sitemap-periodicals_article_detail-1.xml.gz</loc>' in index)
+        self.assertEqual(len(sitemaps), index.count('<sitemap>'))
+
+    def test_only_changed_sections_are_rewritten(self):
+        self.write()
+        self.assertEqual([], self.write())
+        Article(issue=self.issue, title="Second").save()
+        # the Periodical's pages changed too
+        self.assertEqual(['periodical_detail', 'periodicals_article_detail',
+                          'periodicals_read_online'], self.write())
+        self.assertTrue('/second/' in
+                        self.read('sitemap-periodicals_article_detail-1.xml.gz'))
+
+    def test_renamed_periodical_is_rewritten(self):
+        self.write()
+        periodical = Periodical.objects.get()
+        periodical.slug = 'renamed'
+        periodical.save()
+        self.assertTrue('periodical_detail' in self.write())
+        self.assertTrue('/renamed/' in
+                        self.read('sitemap-periodical_detail-1.xml.gz'))
+
+    def test_removes_pages_no_longer_needed(self):
+        sitemap = sitemaps['periodicals_article_detail']
+        limit = sitemap.limit
+        Article(issue=self.issue, title="Second").save()
+        try:
+            sitemap.limit = 1
+            self.write()
+            self.assertTrue(os.path.exists(os.path.join(
+                self.directory, 'sitemap-periodicals_article_detail-2.xml.gz')))
+            Article.objects.get(title="Second").delete()
+            self.write()
+        finally:
+            sitemap.limit = limit
+        self.assertFalse(os.path.exists(os.path.join(
+            self.directory, 'sitemap-periodicals_article_detail-2.xml.gz')))
+
+    def test_command(self):
+        out = StringIO()
+        management.call_command('generate_sitemaps', self.directory,
+                                'http://example.com/sitemaps/',
+                                root='', stdout=out)
+        self.assertTrue('Wrote %d sitemap sections' % len(sitemaps) in out.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'sitemap.xml')))
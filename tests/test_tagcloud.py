@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_tagcloud
+------------
+
+Tests for `django-periodicals` tagcloud module.
+"""
+from datetime import datetime
+from django.core.cache import cache
+from django.test import TestCase
+from tagging.models import Tag
+from periodicals.models import Periodical, Issue, Article
+from periodicals.tagcloud import (tag_counts, tag_cloud, invalidate_tag_cloud,
+                                  update_tag_counts)
+
+
+class TestTagCloud(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        periodical = Periodical(name="Mad Magazine")
+        periodical.save()
+        issue = Issue(periodical=periodical,
+                      volume=1,
+                      issue=10,
+                      pub_date=datetime(2011, 10, 1))
+        issue.save()
+        self.article = Article.objects.create(issue=issue,
+                                              title="One",
+                                              tags='humor, satire')
+        self.article1 = Article.objects.create(issue=issue,
+                                               title="Two",
+                                               tags='humor')
+        self.issue = issue
+
+    def test_counts(self):
+        self.assertEqual({'humor': 2, 'satire': 1}, tag_counts())
+
+    def test_cloud_is_ordered_and_sized(self):
+        cloud = tag_cloud()
+        self.assertEqual(['humor', 'satire'], [tag.name for tag in cloud])
+        self.assertEqual([6, 1], [tag.font_size for tag in cloud])
+
+    def test_cached_cloud_needs_no_queries(self):
+        tag_cloud()
+        with self.assertNumQueries(0):
+            tag_cloud()
+
+    def test_saving_article_updates_counts(self):
+        tag_cloud()
+        self.article1.tags = 'satire'
+        self.article1.save()
+        Article.objects.create(issue=self.issue, title="Three",
+                               tags='satire')
+        with self.assertNumQueries(0):
+            cloud = tag_cloud()
+        self.assertEqual({'humor': 1, 'satire': 3},
+                         dict((tag.name, tag.count) for tag in cloud))
+
+    def test_concurrent_updates_are_kept(self):
+        tag_counts()
+        # the counts are incremented in the cache rather than written
+        # back whole, so neither update overwrites the other
+        update_tag_counts([], ['satire'])
+        update_tag_counts(['humor'], ['satire'])
+        self.assertEqual({'humor': 1, 'satire': 3}, tag_counts())
+
+    def test_new_tag_recounts(self):
+        tag_cloud()
+        self.article1.tags = 'satire, politics'
+        self.article1.save()
+        self.assertEqual({'humor': 1, 'satire': 2, 'politics': 1},
+                         tag_counts())
+        with self.assertNumQueries(0):
+            tag_cloud()
+
+    def test_deleting_article_updates_counts(self):
+        tag_cloud()
+        self.article.delete()
+        self.assertEqual({'humor': 1}, tag_counts())
+        self.assertEqual(['humor'], [tag.name for tag in tag_cloud()])
+
+    def test_invalidate(self):
+        tag_cloud()
+        Tag.objects.update_tags(self.article, 'satire')
+        self.assertEqual({'humor': 2, 'satire': 1}, tag_counts())
+        invalidate_tag_cloud()
+        self.assertEqual({'humor': 1, 'satire': 1}, tag_counts())
@@ -7,8 +7,12 @@ test_templatetags
 Tests for `django-periodicals` periodical_tags module.
 """
 from datetime import datetime
+import mock
+from django.core.cache import cache
+from django.template import Context, Template
 from django.test import TestCase
 from periodicals import models
+from periodicals.counters import VERSION_KEY
 from periodicals.templatetags.periodicals_tags import (
     article_result,
     periodical_copyright,
@@ -18,6 +22,7 @@ from periodicals.templatetags.periodicals_tags import (
 class TestArticleResult(TestCase):
 
     def setUp(self):
+        cache.clear()
         periodical = models.Periodical(name="Periodical Name",
                                        country="USA")
         periodical.save()
@@ -34,6 +39,68 @@ class TestArticleResult(TestCase):
         self.assertEqual('<p><div><a href="/periodical-name/1-10/article-title/" class="result-title">Article Title</a></div><div class="article-result-series"></div><div class="result-issue-info">Periodical Name 2013 Vol. 1 No. 10 Page: 10</div></p>', 
                          article_result(self.article))
 
+    def test_cached(self):
+        expected = article_result(self.article, autoescape=True)
+        article = models.Article.objects.get(pk=self.article.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(expected,
+                             article_result(article, autoescape=True))
+
+    def test_changed_issue_and_author_invalidate(self):
+        author = models.Author(first_name="Alfred", last_name="Newman")
+        author.save()
+        self.article.authors.add(author)
+        article_result(models.Article.objects.get(pk=self.article.pk))
+        author.last_name = "Oldman"
+        author.save()
+        article = models.Article.objects.get(pk=self.article.pk)
+        self.assertTrue("Oldman, Alfred" in article_result(article))
+        issue = article.issue
+        issue.volume = 2
+        issue.save()
+        article = models.Article.objects.get(pk=self.article.pk)
+        self.assertTrue("Vol. 2 No. 10" in article_result(article))
+
+    def test_changed_periodical_invalidates_without_touching(self):
+        modified = models.Article.objects.get(pk=self.article.pk).modified
+        article_result(self.article)
+        periodical = self.article.issue.periodical
+        periodical.name = "New Name"
+        periodical.save()
+        article = models.Article.objects.get(pk=self.article.pk)
+        self.assertEqual(modified, article.modified)
+        self.assertTrue("New Name" in article_result(article))
+
+    def test_changed_author_invalidates_without_touching(self):
+        author = models.Author(first_name="Alfred", last_name="Newman")
+        author.save()
+        self.article.authors.add(author)
+        modified = models.Article.objects.get(pk=self.article.pk).modified
+        self.assertTrue("Newman, Alfred" in article_result(
+            models.Article.objects.get(pk=self.article.pk)))
+        author.last_name = "Oldman"
+        author.save()
+        article = models.Article.objects.get(pk=self.article.pk)
+        self.assertEqual(modified, article.modified)
+        self.assertTrue("Oldman, Alfred" in article_result(article))
+
+    def test_prefetch(self):
+        article_result(self.article, autoescape=True)
+        template = Template("{% load periodicals_tags %}"
+                            "{% prefetch_article_results articles %}"
+                            "{% for article in articles %}"
+                            "{{ article|article_result }}{% endfor %}")
+        articles = list(models.Article.objects.all())
+        with self.assertNumQueries(0):
+            with mock.patch.object(cache, 'get_many',
+                                   wraps=cache.get_many) as get_many:
+                rendered = template.render(Context({'articles': articles}))
+        # the Issues' and Authors' versions, then the fragments
+        self.assertEqual(2, get_many.call_count)
+        self.assertTrue('Article Title' in rendered)
+        self.assertEqual([rendered], articles[0]._article_results.values())
+
+
 
 class TestPeriodicalCopyright(TestCase):
 
@@ -52,6 +119,9 @@ class TestPeriodicalCopyright(TestCase):
 
 class TestArticleCount(TestCase):
 
+    def setUp(self):
+        cache.clear()
+
     def test_count_is_one_when_one_article(self):
         periodical = models.Periodical(name="Periodical Name",
                                        country="USA")
@@ -69,3 +139,60 @@ class TestArticleCount(TestCase):
     def test_count_is_zero_when_no_articles(self):
         tag = ArticleCountNode()
         self.assertEqual("0", tag.render(None))
+
+    def _periodical_issue(self, name):
+        periodical = models.Periodical(name=name)
+        periodical.save()
+        issue = models.Issue(periodical=periodical,
+                             volume=1,
+                             issue=10,
+                             pub_date=datetime(2013, 11, 1))
+        issue.save()
+        return periodical, issue
+
+    def test_count_is_cached_and_maintained(self):
+        periodical, issue = self._periodical_issue("Periodical Name")
+        models.Article(issue=issue, title="Article 1").save()
+        tag = ArticleCountNode()
+        self.assertEqual("1", tag.render(None))
+        with self.assertNumQueries(0):
+            self.assertEqual("1", tag.render(None))
+        article = models.Article(issue=issue, title="Article 2")
+        article.save()
+        with self.assertNumQueries(0):
+            self.assertEqual("2", tag.render(None))
+        article.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual("1", tag.render(None))
+
+    def test_count_for_periodical(self):
+        periodical, issue = self._periodical_issue("Periodical Name")
+        other, other_issue = self._periodical_issue("Other Name")
+        models.Article(issue=issue, title="Article 3").save()
+        models.Article(issue=other_issue, title="Article 4").save()
+        article = models.Article(issue=other_issue, title="Article 5")
+        article.save()
+        template = Template("{% load periodicals_tags %}"
+                            "{% article_count periodical %}")
+        context = Context({'periodical': other})
+        self.assertEqual("2", template.render(context))
+        with self.assertNumQueries(0):
+            self.assertEqual("2", template.render(context))
+        article.issue = issue
+        article.save()
+        self.assertEqual("1", template.render(context))
+        self.assertEqual("2", template.render(
+            Context({'periodical': periodical})))
+
+    def test_evicted_version_is_not_reused(self):
+        periodical, issue = self._periodical_issue("Periodical Name")
+        other, other_issue = self._periodical_issue("Other Name")
+        models.Article(issue=other_issue, title="Article 6").save()
+        template = Template("{% load periodicals_tags %}"
+                            "{% article_count periodical %}")
+        context = Context({'periodical': other})
+        self.assertEqual("1", template.render(context))
+        # the version is evicted while the counts under it remain
+        cache.delete(VERSION_KEY)
+        models.Article.objects.update(issue=issue)
+        self.assertEqual("0", template.render(context))
@@ -11,10 +11,13 @@ import os
 import urlparse
 from datetime import datetime
 from django.test import TestCase
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.core import management
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 from periodicals.models import Author, Periodical, Issue, Article, LinkItem
+from periodicals.views import IssueDetail
 
 os.environ['RECAPTCHA_TESTING'] = 'True'
 
@@ -22,6 +25,7 @@ os.environ['RECAPTCHA_TESTING'] = 'True'
 class TestSetup(TestCase):
 
     def setUp(self):
+        cache.clear()
         author = Author(last_name='Newman',
                         first_name='Alfred',
                         middle_name='E')
@@ -74,7 +78,7 @@ class TestAuthorViews(TestSetup):
         authors = resp.context['author_list']
         self.assertEqual(1, len(authors))
         self.assertEqual(1, authors[0].pk)
-        self.assertEqual(2, authors[0].articles__count)
+        self.assertEqual(2, authors[0].article_count)
 
     def test_author_detail(self):
         resp = self.client.get(
@@ -101,26 +105,37 @@ class TestSeriesViews(TestSetup):
         self.assertTemplateUsed(resp, 'periodicals/base.html')
         series = resp.context['series_list']
         self.assertEqual(2, len(series))
-        self.assertEqual('Editorial', series[0]['series'])
-        self.assertEqual(1, series[0]['series_count'])
-        self.assertEqual('Humor', series[1]['series'])
-        self.assertEqual(1, series[1]['series_count'])
+        self.assertEqual('Editorial', series[0].name)
+        self.assertEqual(1, series[0].article_count)
+        self.assertEqual('Humor', series[1].name)
+        self.assertEqual(1, series[1].article_count)
 
     def test_series_detail(self):
         resp = self.client.get(
             reverse('periodicals_series_detail',
                     kwargs={'periodical_slug': 'mad-magazine',
-                            'series': 'Editorial'}))
+                            'series_slug': 'editorial'}))
         self.assertEqual(200, resp.status_code)
         self.assertTemplateUsed(resp, 'periodicals/series_detail.html')
         series = resp.context['series']
-        self.assertEqual('Editorial', series)
+        self.assertEqual('Editorial', series.name)
         periodical = resp.context['periodical']
         self.assertEqual(1, periodical.pk)
         article_list = resp.context['article_list']
         self.assertEqual(1, len(article_list))
         self.assertTrue(isinstance(article_list[0], Article))
 
+    def test_series_name_url_redirects(self):
+        resp = self.client.get(
+            reverse('periodicals_series_redirect',
+                    kwargs={'periodical_slug': 'mad-magazine',
+                            'series': 'Editorial'}))
+        self.assertEqual(301, resp.status_code)
+        self.assertTrue(resp['Location'].endswith(
+            reverse('periodicals_series_detail',
+                    kwargs={'periodical_slug': 'mad-magazine',
+                            'series_slug': 'editorial'})))
+
 
 class TestPeriodicalViews(TestSetup):
 
@@ -181,6 +196,47 @@ class TestIssueViews(TestSetup):
         self.assertEqual(self.issue2, next_month)
         self.assertTrue(resp.context['links_enabled'])
 
+    def test_issue_detail_articles_share_issue(self):
+        resp = self.client.get(
+            reverse('periodicals_issue_detail',
+                    kwargs={'periodical_slug': 'mad-magazine',
+                            'issue_slug': '1-10'}))
+        articles = resp.context['articles']
+        self.assertEqual(set([self.article, self.article1]), set(articles))
+        for article in articles:
+            self.assertTrue(article.issue is resp.context['issue'])
+
+    def _issue_detail_queries(self):
+        url = reverse('periodicals_issue_detail',
+                      kwargs={'periodical_slug': 'mad-magazine',
+                              'issue_slug': '1-10'})
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url)
+        self.assertEqual(200, resp.status_code)
+        return len(queries)
+
+    def test_issue_detail_queries_independent_of_issue_size(self):
+        small = self._issue_detail_queries()
+        for page in range(20):
+            article = Article(issue=self.issue1,
+                              series="Humor",
+                              title="Fun %d" % page,
+                              page=page)
+            article.save()
+            author = Author(last_name='Author %d' % page,
+                            first_name='Some')
+            author.save()
+            article.authors.add(author, self.author)
+            article.links.create(status=LinkItem.STATUS_ACTIVE,
+                                 url="http://example.com/%d" % page,
+                                 title="Link %d" % page)
+        self.issue1.links.create(status=LinkItem.STATUS_ACTIVE,
+                                 url="http://example.com/",
+                                 title="Issue Link")
+        large = self._issue_detail_queries()
+        self.assertEqual(small, large)
+        self.assertTrue(large <= IssueDetail.query_budget)
+
     def test_save_with_duplicate_volume_issue_on_same_date_gives_different_slug(self):
         dup_issue1 = Issue(periodical=self.periodical,
                            volume=1,
@@ -340,10 +396,53 @@ class TestReadOnline(TestSetup):
         self.assertEqual(self.periodical, periodical)
         issues = resp.context['issues']
         self.assertEqual(1, len(issues))
-        self.assertEqual(self.issue1, issues[0])
+        # only the columns shown are loaded so compare by pk
+        self.assertEqual(self.issue1.pk, issues[0].pk)
+        self.assertFalse('description' in issues[0].__dict__)
+        with self.assertNumQueries(0):
+            self.assertEqual("2011 Vol. 1 No. 10", "%s %s" % (
+                issues[0].display_year(), issues[0].display_name()))
         articles = resp.context['articles']
         self.assertEqual(1, len(articles))
-        self.assertEqual(self.article1, articles[0])
+        self.assertEqual(self.article1.pk, articles[0].pk)
+
+    def test_read_online_scoped_to_periodical(self):
+        other = Periodical(name="Cracked")
+        other.save()
+        for n in range(3):
+            issue = Issue(periodical=other, volume=2, issue=n + 1,
+                          pub_date=datetime(2012, n + 1, 1),
+                          read_online='http://example.com/%d' % n)
+            issue.save()
+            article = Article(issue=issue, title="Other %d" % n,
+                              read_online='http://example.com/%d' % n)
+            article.save()
+            article.authors.add(self.author)
+        self.issue1.read_online = 'a url'
+        self.issue1.save()
+        self.article1.read_online = 'a url'
+        self.article1.save()
+        url = reverse('periodicals_read_online',
+                      kwargs={'periodical_slug': self.periodical.slug})
+        with self.assertNumQueries(6):
+            resp = self.client.get(url)
+        self.assertEqual([self.issue1.pk],
+                         [i.pk for i in resp.context['issues']])
+        self.assertEqual([self.article1.pk],
+                         [a.pk for a in resp.context['articles']])
+        self.assertEqual(1, resp.context['articles_page'].paginator.count)
+
+        url = reverse('periodicals_read_online',
+                      kwargs={'periodical_slug': other.slug})
+        with self.settings(PERIODICALS_PAGINATION=2):
+            with self.assertNumQueries(6):
+                resp = self.client.get(url, {'articles_page': 2})
+        self.assertEqual(2, len(resp.context['issues']))
+        self.assertEqual(3, resp.context['issues_page'].paginator.count)
+        self.assertEqual(['Other 0'],
+                         [a.title for a in resp.context['articles']])
+        self.assertTrue('Other 0' in resp.content)
+        self.assertFalse('What me worry?' in resp.content)
 
 
 class TestTagViews(TestSetup):
@@ -408,6 +507,42 @@ class TestLinkViews(TestSetup):
         self.assertTrue(links[0].title in resp.content)
         self.assertTrue(links[0].url in resp.content)
 
+    def test_links_queries_independent_of_link_count(self):
+        self.issue0.links.create(status=LinkItem.STATUS_ACTIVE,
+                                 url="http://example.com/issue",
+                                 title="Issue Link")
+        url = reverse('periodicals_links',
+                      kwargs={'periodical_slug': self.periodical.slug})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for obj in (self.article1, self.issue1, self.issue2):
+            for status in (LinkItem.STATUS_ACTIVE, LinkItem.STATUS_DELETED):
+                obj.links.create(status=status,
+                                 url="http://example.com/%s" % status,
+                                 title="Link %s" % status)
+        with self.assertNumQueries(len(queries)):
+            resp = self.client.get(url)
+        self.assertEqual(3, len(resp.context['issues']))
+        self.assertEqual(2, len(resp.context['articles']))
+        self.assertEqual(1, len(resp.context['issues'][0].active_links()))
+
+    def test_links_paginated(self):
+        self.issue0.links.create(status=LinkItem.STATUS_ACTIVE,
+                                 url="http://example.com/issue",
+                                 title="Issue Link")
+        self.article1.links.create(status=LinkItem.STATUS_ACTIVE,
+                                   url="http://example.com/article",
+                                   title="Article Link")
+        url = reverse('periodicals_links',
+                      kwargs={'periodical_slug': self.periodical.slug})
+        with self.settings(PERIODICALS_PAGINATION=1):
+            resp = self.client.get(url, {'articles_page': 2})
+        self.assertEqual(2, resp.context['articles_page'].paginator.count)
+        self.assertEqual(2, resp.context['articles_page'].number)
+        self.assertEqual(1, len(resp.context['articles']))
+        self.assertEqual(1, resp.context['issues_page'].number)
+        self.assertEqual([self.issue0], resp.context['issues'])
+
     def test_get_add_issue_link(self):
         resp = self.client.get(
             reverse('periodicals_add_issue_link',
@@ -0,0 +1,14 @@
+from django.conf.urls import patterns, include, url
+
+from periodicals.sitemaps import sitemaps
+
+urlpatterns = \
+    patterns('',
+             url(r'^sitemap\.xml$',
+                 'periodicals.sitemaps.index',
+                 {'sitemaps': sitemaps}),
+             url(r'^sitemap-(?P<section>.+)\.xml$',
+                 'periodicals.sitemaps.sitemap',
+                 {'sitemaps': sitemaps}),
+             url(r'^periodicals/', include('periodicals.urls')),
+             )